@@ -0,0 +1,88 @@
+"""Benchmark the extra per-query cost of MMR diversification in CustomRAG.retrieve"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add src to path
+project_root = Path(__file__).resolve().parent
+sys.path.insert(0, str(project_root / "src"))
+
+from custom_rag import CustomRAG, maximal_marginal_relevance
+
+TOP_K = 5
+FETCH_KS = [10, 20, 50, 100]
+EMBEDDING_DIMS = [384, 768]
+N_QUERIES = 200
+
+
+def synthetic_candidates(rng: np.random.Generator, n: int, dim: int) -> np.ndarray:
+    """Near-duplicate clusters, mimicking overlapping chunks of one passage"""
+    n_clusters = max(n // 4, 1)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, size=n)
+    return centers[labels] + 0.05 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def bench_selection() -> None:
+    """Time the NumPy MMR selection step alone"""
+    rng = np.random.default_rng(0)
+
+    print(f"MMR selection cost (top_k={TOP_K}, {N_QUERIES} queries)")
+    print(f"{'dim':>6} {'fetch_k':>8} {'median_us':>10} {'p95_us':>10}")
+
+    for dim in EMBEDDING_DIMS:
+        for fetch_k in FETCH_KS:
+            candidates = synthetic_candidates(rng, fetch_k, dim)
+            queries = rng.standard_normal((N_QUERIES, dim)).astype(np.float32)
+
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                maximal_marginal_relevance(query, candidates, top_k=TOP_K, lambda_mult=0.5)
+                timings.append((time.perf_counter() - start) * 1e6)
+
+            print(
+                f"{dim:>6} {fetch_k:>8} "
+                f"{np.median(timings):>10.1f} {np.percentile(timings, 95):>10.1f}"
+            )
+
+
+def bench_retrieve() -> None:
+    """Time CustomRAG.retrieve with and without MMR on an in-memory collection"""
+    rag = CustomRAG(api_key="benchmark-only")
+    rag.create_collection("mmr_benchmark", recreate=True)
+
+    # Repetitive corpus so overlapping chunks are near-duplicates
+    corpus_path = project_root / "politica_hibrida.txt"
+    rag.index_document(corpus_path, chunk_size=128, overlap=64)
+
+    queries = [
+        "¿Qué días debo ir a la oficina?",
+        "¿Cuánto es el bono de equipamiento?",
+        "¿Puedo usar Wi-Fi público?",
+        "¿Es obligatoria la cámara en reuniones?",
+    ] * 25
+
+    print(f"\nCustomRAG.retrieve latency (top_k={TOP_K}, {len(queries)} queries)")
+    print(f"{'mode':>12} {'median_ms':>10} {'p95_ms':>10}")
+
+    modes = [("plain", {})] + [
+        (f"mmr@{fetch_k}", {"mmr": True, "fetch_k": fetch_k}) for fetch_k in FETCH_KS
+    ]
+    for label, kwargs in modes:
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            rag.retrieve(query, top_k=TOP_K, **kwargs)
+            timings.append((time.perf_counter() - start) * 1e3)
+
+        print(f"{label:>12} {np.median(timings):>10.2f} {np.percentile(timings, 95):>10.2f}")
+
+
+if __name__ == "__main__":
+    bench_selection()
+    if "--retrieve" in sys.argv:
+        bench_retrieve()
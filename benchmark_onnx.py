@@ -0,0 +1,92 @@
+"""Benchmark PyTorch vs ONNX (fp32 / int8) CPU embedding backends"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+# Add src to path
+project_root = Path(__file__).resolve().parent
+sys.path.insert(0, str(project_root / "src"))
+
+from custom_rag import CustomRAG
+from embeddings import load_onnx_encoder
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+BATCH_SIZE = 32
+N_LATENCY_QUERIES = 100
+
+
+def load_corpus() -> list:
+    """Chunks from data/raw, falling back to the bundled policy document"""
+    paths = sorted((project_root / "data" / "raw").glob("*.txt")) + sorted(
+        (project_root / "data" / "raw").glob("*.md")
+    )
+    if not paths:
+        paths = [project_root / "politica_hibrida.txt"]
+
+    chunks = []
+    for path in paths:
+        chunks.extend(CustomRAG.chunk_text(path.read_text(encoding="utf-8"), 512, 50))
+
+    # Repeat small corpora so throughput numbers are stable
+    while len(chunks) < 512:
+        chunks = chunks * 2
+    return chunks
+
+
+def bench(name: str, encoder, chunks: list, queries: list) -> np.ndarray:
+    """Print throughput and single-query latency; return the chunk embeddings"""
+    encoder.encode(chunks[:BATCH_SIZE], show_progress_bar=False)  # warm-up
+
+    start = time.perf_counter()
+    embeddings = encoder.encode(chunks, batch_size=BATCH_SIZE, show_progress_bar=False)
+    throughput = len(chunks) / (time.perf_counter() - start)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        encoder.encode([query], show_progress_bar=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    print(
+        f"{name:>12} {throughput:>12.1f} "
+        f"{np.median(latencies):>10.2f} {np.percentile(latencies, 95):>10.2f}"
+    )
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def cosine_drift(reference: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    """Row-wise cosine similarity between two embedding matrices"""
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    return np.sum(reference * candidate, axis=1)
+
+
+def main():
+    chunks = load_corpus()
+    queries = [chunk[:80] for chunk in chunks[:N_LATENCY_QUERIES]]
+
+    backends = {
+        "torch": SentenceTransformer(MODEL_NAME, device="cpu"),
+        "onnx-fp32": load_onnx_encoder(MODEL_NAME, quantization=None),
+        "onnx-int8": load_onnx_encoder(MODEL_NAME, quantization="avx2"),
+    }
+
+    print(f"Model: {MODEL_NAME}, {len(chunks)} chunks, batch size {BATCH_SIZE}")
+    print(f"{'backend':>12} {'chunks/s':>12} {'p50_ms':>10} {'p95_ms':>10}")
+    embeddings = {
+        name: bench(name, encoder, chunks, queries) for name, encoder in backends.items()
+    }
+
+    print("\nCosine similarity to torch embeddings")
+    print(f"{'backend':>12} {'mean':>10} {'min':>10}")
+    for name in ("onnx-fp32", "onnx-int8"):
+        similarity = cosine_drift(embeddings["torch"], embeddings[name])
+        print(f"{name:>12} {similarity.mean():>10.5f} {similarity.min():>10.5f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Load test the CustomRAG HTTP service: throughput and latency vs. concurrency"""
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+project_root = Path(__file__).resolve().parent
+
+DEFAULT_QUERIES = [
+    "¿Qué días debo ir obligado a la oficina?",
+    "¿Cuánto dinero me dan para comprar una silla?",
+    "¿Puedo trabajar desde un Starbucks?",
+    "¿Es obligatorio encender la cámara en reuniones internas?",
+    "¿Cuál es el horario núcleo de coincidencia?",
+]
+
+
+def load_queries(path: Path = None) -> list:
+    """Queries from a JSON file (list of strings or of {"query": ...}), else defaults"""
+    if path is None:
+        return DEFAULT_QUERIES
+    with open(path, "r") as f:
+        items = json.load(f)
+    return [item["query"] if isinstance(item, dict) else item for item in items]
+
+
+async def run_level(
+    client: httpx.AsyncClient,
+    url: str,
+    queries: list,
+    concurrency: int,
+    num_requests: int,
+    top_k: int
+) -> dict:
+    """Send num_requests requests with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    url, json={"query": queries[i % len(queries)], "top_k": top_k}
+                )
+                response.raise_for_status()
+                latencies.append((time.perf_counter() - start) * 1000)
+            except httpx.HTTPError:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(num_requests)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": float(np.median(latencies)) if latencies else float("nan"),
+        "p95_ms": float(np.percentile(latencies, 95)) if latencies else float("nan"),
+        "errors": errors,
+    }
+
+
+async def main_async(args) -> list:
+    queries = load_queries(args.queries)
+    url = f"{args.url.rstrip('/')}/{args.endpoint}"
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        # Warm-up (model load, first Chroma query)
+        await run_level(client, url, queries, 1, min(len(queries), 5), args.top_k)
+
+        print(f"Endpoint: {url}, {args.requests} requests per level")
+        print(f"{'concurrency':>12} {'req/s':>10} {'p50_ms':>10} {'p95_ms':>10} {'errors':>8}")
+        rows = []
+        for concurrency in args.concurrency:
+            row = await run_level(client, url, queries, concurrency, args.requests, args.top_k)
+            rows.append(row)
+            print(
+                f"{row['concurrency']:>12} {row['throughput']:>10.1f} "
+                f"{row['p50_ms']:>10.1f} {row['p95_ms']:>10.1f} {row['errors']:>8}"
+            )
+
+        stats = await client.get(f"{args.url.rstrip('/')}/stats")
+        if stats.status_code == 200:
+            print(f"\nService batching: {stats.json().get('batching')}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", choices=["retrieve", "query"], default="retrieve")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--queries", type=Path, default=None, help="JSON file of queries")
+    parser.add_argument(
+        "--output", type=Path, default=project_root / "reports" / "service_load_test.json"
+    )
+    args = parser.parse_args()
+
+    rows = asyncio.run(main_async(args))
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump({"endpoint": args.endpoint, "results": rows}, f, indent=2)
+    print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
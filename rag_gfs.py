@@ -0,0 +1,250 @@
+"""rag-gfs: ingest, index, query and benchmark GFS and CustomRAG from the command line"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import chromadb
+import numpy as np
+import polars as pl
+from chromadb.config import Settings
+
+# Add src to path
+project_root = Path(__file__).resolve().parent
+sys.path.insert(0, str(project_root / "src"))
+
+from custom_rag import CustomRAG
+from data_loader import check_gfs_compatibility, scan_documents
+from gfs_client import GFSClient
+from parents import ParentStore
+from pipeline import Checkpoint, format_summary, ingest_custom, ingest_gfs
+from rate_limit import PRIORITY_BATCH, RateLimiter, priority
+from results_store import ResultsStore, token_usage
+from store_registry import StoreRegistry
+from utils import load_api_key
+
+DEFAULT_QUERIES = [
+    {"id": "q1", "category": "factual", "query": "¿Qué días debo ir obligado a la oficina?"},
+    {"id": "q2", "category": "factual", "query": "¿Cuánto dinero me dan para comprar una silla?"},
+    {"id": "q3", "category": "reasoning", "query": "¿Puedo trabajar desde un Starbucks?"},
+    {"id": "q4", "category": "out_of_scope", "query": "¿Cuál es la política de mascotas en la oficina?"},
+]
+
+
+def build_backends(args, need_gfs: bool, need_rag: bool):
+    """Create the clients a command needs, sharing one rate limiter."""
+    api_key = load_api_key("GOOGLE_API_KEY", str(project_root / ".env"))
+    rate_limiter = RateLimiter(requests_per_minute=args.rpm)
+
+    gfs = registry = rag = None
+    if need_gfs:
+        gfs = GFSClient(api_key=api_key, model_id=args.llm_model, rate_limiter=rate_limiter)
+        registry = StoreRegistry(gfs, project_root / "models" / "gfs_stores" / "registry.json")
+    if need_rag:
+        args.persist_dir.mkdir(parents=True, exist_ok=True)
+        rag = CustomRAG(
+            api_key=api_key,
+            embedding_model=args.embedding_model,
+            llm_model=args.llm_model,
+            persist_directory=args.persist_dir,
+            # Loaded from persist_dir by create_collection() if previously saved
+            parent_store=ParentStore(),
+            chroma_client=chromadb.PersistentClient(
+                path=str(args.persist_dir),
+                settings=Settings(anonymized_telemetry=False)
+            ),
+            rate_limiter=rate_limiter
+        )
+        rag.create_collection(args.collection, num_shards=args.shards)
+    return gfs, registry, rag
+
+
+def compatible_files(data_dir: Path) -> list:
+    """GFS-compatible files from scan_documents(), as row dicts."""
+    df = scan_documents(data_dir)
+    if df.is_empty():
+        return []
+    return check_gfs_compatibility(df).filter(pl.col("gfs_compatible")).to_dicts()
+
+
+def cmd_ingest(args, backends=("gfs", "custom_rag")) -> None:
+    files = compatible_files(args.data_dir)
+    print(f"Compatible files: {len(files)} in {args.data_dir}")
+    if not files:
+        return
+
+    _, registry, rag = build_backends(args, "gfs" in backends, "custom_rag" in backends)
+    checkpoint = Checkpoint(args.checkpoint)
+
+    jobs = {}
+    start = time.time()
+    # Both backends ingest at the same time; each parallelizes internally
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        if "gfs" in backends:
+            jobs["gfs"] = executor.submit(
+                ingest_gfs, registry, args.store, files, checkpoint, args.workers
+            )
+        if "custom_rag" in backends:
+            jobs["custom_rag"] = executor.submit(
+                ingest_custom,
+                rag,
+                files,
+                checkpoint,
+                cache_dir=project_root / "data" / "processed" / "extraction_cache",
+                max_workers=args.workers,
+                chunk_size=args.chunk_size,
+                overlap=args.overlap
+            )
+        summaries = [job.result() for job in jobs.values()]
+
+    print(f"\nIngestion finished in {time.time() - start:.1f}s")
+    print(format_summary(summaries))
+
+    if rag is not None and getattr(args, "snapshot", None):
+        manifest = rag.export_snapshot(args.snapshot)
+        print(f"Snapshot: {args.snapshot} ({manifest['count']} chunks)")
+
+
+def cmd_index(args) -> None:
+    cmd_ingest(args, backends=("custom_rag",))
+
+
+def cmd_query(args) -> None:
+    use_gfs = args.backend == "gfs"
+    gfs, registry, rag = build_backends(args, use_gfs, not use_gfs)
+
+    start = time.time()
+    if use_gfs:
+        store_name = registry.get_or_create(args.store)
+        response = gfs.query_with_file_search(args.query, [store_name], top_k=args.top_k)
+        answer = response.text
+    else:
+        answer = rag.query(args.query, top_k=args.top_k)["answer"]
+
+    print(answer)
+    print(f"\n[{args.backend}] {time.time() - start:.2f}s")
+
+
+def cmd_bench(args) -> None:
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = json.load(f)
+
+    backends = ("gfs", "custom_rag") if args.backend == "both" else (args.backend,)
+    gfs, registry, rag = build_backends(args, "gfs" in backends, "custom_rag" in backends)
+    store_name = registry.get_or_create(args.store) if gfs else None
+
+    def run(backend: str, item: dict) -> dict:
+        record = {
+            "experiment": "rag_gfs_bench",
+            "backend": backend,
+            "model": args.llm_model,
+            "query_id": item["id"],
+            "category": item.get("category"),
+        }
+        start = time.time()
+        try:
+            with priority(PRIORITY_BATCH):
+                if backend == "gfs":
+                    response = gfs.query_with_file_search(
+                        item["query"], [store_name], top_k=args.top_k
+                    )
+                    citations = gfs.extract_citations(response, [store_name])
+                    record.update(token_usage(response), response_length=len(response.text or ""))
+                else:
+                    result = rag.query(item["query"], top_k=args.top_k)
+                    citations = result["citations"]
+                    metrics = result["metrics"]
+                    record.update(
+                        retrieval_time=metrics["retrieval_time"],
+                        generation_time=metrics["generation_time"],
+                        input_tokens=metrics["input_tokens"],
+                        output_tokens=metrics["output_tokens"],
+                        num_chunks_retrieved=metrics["num_chunks_retrieved"],
+                        response_length=len(result["answer"] or ""),
+                    )
+            record.update(
+                num_citations=len(citations),
+                has_citations=citations.has_citations,
+                status="success"
+            )
+        except Exception as e:
+            record.update(status="failed", error=str(e))
+        record["total_time"] = time.time() - start
+        return record
+
+    print(f"{'backend':>12} {'queries':>8} {'failed':>7} {'q/s':>8} {'p50_s':>8} {'p95_s':>8}")
+    with ResultsStore(project_root / "reports" / "results") as results:
+        for backend in backends:
+            start = time.time()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                records = list(executor.map(lambda item: run(backend, item), queries))
+            elapsed = time.time() - start
+            results.extend(records)
+
+            latencies = [r["total_time"] for r in records if r["status"] == "success"]
+            print(
+                f"{backend:>12} {len(records):>8} {len(records) - len(latencies):>7} "
+                f"{len(latencies) / elapsed:>8.2f} "
+                f"{np.median(latencies) if latencies else float('nan'):>8.2f} "
+                f"{np.percentile(latencies, 95) if latencies else float('nan'):>8.2f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="rag-gfs", description=__doc__)
+    parser.add_argument("--llm-model", default="gemini-2.5-flash")
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--store", default="RAG Corpus", help="GFS store display name")
+    parser.add_argument("--collection", default="custom_rag_baseline")
+    parser.add_argument(
+        "--persist-dir", type=Path, default=project_root / "models" / "custom_rag" / "chroma_db"
+    )
+    parser.add_argument("--rpm", type=float, default=None, help="Gemini requests per minute")
+    parser.add_argument(
+        "--shards", type=int, default=None, help="Hash-partition the collection across N processes"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_ingest_args(sub):
+        sub.add_argument("--data-dir", type=Path, default=project_root / "data" / "raw")
+        sub.add_argument("--workers", type=int, default=8, help="Uploads / extraction processes")
+        sub.add_argument("--chunk-size", type=int, default=512)
+        sub.add_argument("--overlap", type=int, default=50)
+        sub.add_argument(
+            "--checkpoint", type=Path,
+            default=project_root / "models" / "pipeline" / "checkpoint.json"
+        )
+
+    ingest = subparsers.add_parser("ingest", help="Ingest the corpus into GFS and CustomRAG")
+    add_ingest_args(ingest)
+    ingest.set_defaults(func=cmd_ingest)
+
+    index = subparsers.add_parser("index", help="Index the corpus into CustomRAG only")
+    add_ingest_args(index)
+    index.add_argument("--snapshot", type=Path, default=None, help="Export a snapshot bundle")
+    index.set_defaults(func=cmd_index)
+
+    query = subparsers.add_parser("query", help="Answer one query")
+    query.add_argument("query")
+    query.add_argument("--backend", choices=["gfs", "custom_rag"], default="custom_rag")
+    query.add_argument("--top-k", type=int, default=5)
+    query.set_defaults(func=cmd_query)
+
+    bench = subparsers.add_parser("bench", help="Benchmark query throughput and latency")
+    bench.add_argument("--queries", type=Path, default=None, help="JSON list of {id, query, category}")
+    bench.add_argument("--backend", choices=["gfs", "custom_rag", "both"], default="both")
+    bench.add_argument("--concurrency", type=int, default=4)
+    bench.add_argument("--top-k", type=int, default=5)
+    bench.set_defaults(func=cmd_bench)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
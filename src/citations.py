@@ -0,0 +1,410 @@
+"""Typed citation model for GFS grounding metadata and CustomRAG [n] markers"""
+
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import polars as pl
+
+# "[1]", "[2, 3]" or "[1][4]" citation markers in generated answers
+_MARKER = re.compile(r"\[(\d+(?:\s*,\s*\d+)*)\]")
+
+
+class Source:
+    """A cited source: a GFS grounding chunk or a CustomRAG context passage"""
+
+    __slots__ = ("title", "uri", "text", "document_name", "store_name", "metadata")
+
+    def __init__(
+        self,
+        title: Optional[str] = None,
+        uri: Optional[str] = None,
+        text: Optional[str] = None,
+        document_name: Optional[str] = None,
+        store_name: Optional[str] = None,
+        metadata: Optional[Dict] = None
+    ):
+        self.title = title
+        self.uri = uri
+        self.text = text
+        self.document_name = document_name
+        self.store_name = store_name
+        self.metadata = metadata or {}
+
+    def __repr__(self) -> str:
+        return f"Source(title={self.title!r}, document_name={self.document_name!r})"
+
+
+class CitationSet:
+    """
+    Citations of one answer.
+
+    Supported spans are array-backed: span i covers UTF-8 byte offsets
+    [starts[i], ends[i]) of the answer and cites the sources
+    source_indices[source_offsets[i]:source_offsets[i + 1]].
+    """
+
+    __slots__ = (
+        "sources", "starts", "ends", "source_offsets", "source_indices", "scores", "answer_length"
+    )
+
+    def __init__(
+        self,
+        sources: List[Source],
+        starts: np.ndarray,
+        ends: np.ndarray,
+        source_offsets: np.ndarray,
+        source_indices: np.ndarray,
+        scores: np.ndarray,
+        answer_length: int
+    ):
+        self.sources = sources
+        self.starts = starts
+        self.ends = ends
+        self.source_offsets = source_offsets
+        self.source_indices = source_indices
+        self.scores = scores
+        self.answer_length = answer_length
+
+    @classmethod
+    def from_spans(
+        cls,
+        sources: List[Source],
+        spans: Sequence[tuple],
+        answer_length: int
+    ) -> "CitationSet":
+        """
+        Build from (start, end, source indices, score) tuples.
+
+        Args:
+            sources: Cited sources
+            spans: Byte spans of the answer with the sources supporting them
+            answer_length: Answer length in UTF-8 bytes
+
+        Returns:
+            CitationSet
+        """
+        counts = [len(span[2]) for span in spans]
+        return cls(
+            sources=sources,
+            starts=np.fromiter((span[0] for span in spans), np.int32, len(spans)),
+            ends=np.fromiter((span[1] for span in spans), np.int32, len(spans)),
+            source_offsets=np.concatenate(([0], np.cumsum(counts, dtype=np.int32))).astype(np.int32),
+            source_indices=np.fromiter(
+                (index for span in spans for index in span[2]), np.int32, sum(counts)
+            ),
+            scores=np.fromiter(
+                (np.nan if span[3] is None else span[3] for span in spans), np.float32, len(spans)
+            ),
+            answer_length=answer_length
+        )
+
+    @classmethod
+    def empty(cls, answer_length: int = 0) -> "CitationSet":
+        """CitationSet without sources or spans."""
+        return cls.from_spans([], [], answer_length)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @property
+    def has_citations(self) -> bool:
+        """Whether any part of the answer is supported by a source."""
+        return len(self.starts) > 0
+
+    def span_sources(self, span: int) -> List[Source]:
+        """Sources supporting one span."""
+        indices = self.source_indices[self.source_offsets[span]:self.source_offsets[span + 1]]
+        return [self.sources[i] for i in indices]
+
+    def span_text(self, answer: str, span: int) -> str:
+        """Answer text of one span."""
+        return answer.encode("utf-8")[self.starts[span]:self.ends[span]].decode("utf-8", "ignore")
+
+    def cited_sources(self) -> List[Source]:
+        """Sources cited by at least one span, in source order."""
+        return [self.sources[i] for i in np.unique(self.source_indices)]
+
+    def to_records(self, answer: str) -> List[Dict]:
+        """
+        JSON-serializable spans.
+
+        Args:
+            answer: The answer the spans refer to
+
+        Returns:
+            One {"text", "sources", "confidence"} dict per span; "sources"
+            are indices into self.sources
+        """
+        return [
+            {
+                "text": self.span_text(answer, span),
+                "sources": self.source_indices[
+                    self.source_offsets[span]:self.source_offsets[span + 1]
+                ].tolist(),
+                "confidence": None if np.isnan(self.scores[span]) else float(self.scores[span]),
+            }
+            for span in range(len(self.starts))
+        ]
+
+    def coverage(self) -> float:
+        """Fraction of the answer covered by supported spans."""
+        return float(citation_frame([self])["coverage"][0])
+
+    def __repr__(self) -> str:
+        return f"CitationSet(spans={len(self)}, sources={len(self.sources)})"
+
+
+class SourceResolver:
+    """Resolves grounding chunk titles to store documents, cached per store"""
+
+    def __init__(self, list_documents: Callable[[str], Iterable]):
+        """
+        Initialize the resolver.
+
+        Args:
+            list_documents: Returns the documents of a store
+                (e.g. GFSClient.iter_store_documents)
+        """
+        self.list_documents = list_documents
+        self._stores: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def _index(self, store_name: str) -> Dict[str, Dict]:
+        with self._lock:
+            index = self._stores.get(store_name)
+        if index is not None:
+            return index
+
+        index = {}
+        for document in self.list_documents(store_name):
+            entry = {
+                "document_name": document.name,
+                "display_name": document.display_name,
+                "custom_metadata": {
+                    item.key: item.string_value if item.string_value is not None else item.numeric_value
+                    for item in (document.custom_metadata or [])
+                },
+            }
+            index[document.name] = entry
+            if document.display_name:
+                index[document.display_name] = entry
+
+        with self._lock:
+            self._stores[store_name] = index
+        return index
+
+    def resolve(self, store_names: Sequence[str], key: Optional[str]) -> Optional[Dict]:
+        """
+        Find the document a grounding chunk came from.
+
+        Args:
+            store_names: Stores that were searched
+            key: Chunk title (document display name) or document name
+
+        Returns:
+            Document entry with document_name, display_name and custom_metadata, or None
+        """
+        if not key:
+            return None
+        for store_name in store_names:
+            entry = self._index(store_name).get(key)
+            if entry is not None:
+                return {**entry, "store_name": store_name}
+        return None
+
+    def invalidate(self, store_name: Optional[str] = None) -> None:
+        """Forget the cached documents of one store (or of all stores)."""
+        with self._lock:
+            if store_name is None:
+                self._stores.clear()
+            else:
+                self._stores.pop(store_name, None)
+
+
+def parse_grounding(
+    response,
+    store_names: Sequence[str] = (),
+    resolver: Optional[SourceResolver] = None
+) -> CitationSet:
+    """
+    Build a CitationSet from a response's grounding_chunks / grounding_supports.
+
+    Args:
+        response: GenerateContentResponse of a file search query
+        store_names: Stores that were searched (used for source resolution)
+        resolver: Resolves chunk titles to store documents
+
+    Returns:
+        CitationSet (empty if the response is not grounded)
+    """
+    text = getattr(response, "text", None) or ""
+    answer_length = len(text.encode("utf-8"))
+    candidates = getattr(response, "candidates", None)
+    grounding = candidates[0].grounding_metadata if candidates else None
+    if grounding is None:
+        return CitationSet.empty(answer_length)
+
+    sources = []
+    for chunk in grounding.grounding_chunks or []:
+        context = getattr(chunk, "retrieved_context", None)
+        title = getattr(context, "title", None)
+        document_name = getattr(context, "document_name", None)
+        store_name = getattr(context, "file_search_store", None)
+
+        metadata = {}
+        if resolver is not None:
+            searched = [store_name] if store_name else list(store_names)
+            entry = resolver.resolve(searched, document_name or title)
+            if entry is not None:
+                document_name = entry["document_name"]
+                store_name = entry["store_name"]
+                metadata = entry["custom_metadata"]
+
+        sources.append(Source(
+            title=title,
+            uri=getattr(context, "uri", None),
+            text=getattr(context, "text", None),
+            document_name=document_name,
+            store_name=store_name,
+            metadata=metadata
+        ))
+
+    spans = []
+    for support in grounding.grounding_supports or []:
+        segment = support.segment
+        if segment is None or not support.grounding_chunk_indices:
+            continue
+        scores = support.confidence_scores
+        spans.append((
+            segment.start_index or 0,
+            segment.end_index or 0,
+            support.grounding_chunk_indices,
+            max(scores) if scores else None,
+        ))
+
+    return CitationSet.from_spans(sources, spans, answer_length)
+
+
+def parse_markers(
+    answer: str,
+    context: Sequence[str],
+    metadatas: Sequence[Optional[Dict]]
+) -> CitationSet:
+    """
+    Map [n] markers in a CustomRAG answer back to its context passages.
+
+    The sentence each marker closes becomes a span citing the passages
+    numbered in it; markers outside 1..len(context) are ignored.
+
+    Args:
+        answer: Generated answer
+        context: Passages sent to the model, numbered from 1 in the prompt
+        metadatas: Chunk metadata of each passage
+
+    Returns:
+        CitationSet whose sources are the context passages
+    """
+    answer = answer or ""
+    sources = [
+        Source(
+            title=(metadata or {}).get("source_file"),
+            uri=(metadata or {}).get("file_path"),
+            text=passage,
+            metadata=metadata or {}
+        )
+        for passage, metadata in zip(context, metadatas)
+    ]
+
+    spans = []
+    previous_end = 0
+    for marker in _MARKER.finditer(answer):
+        indices = sorted({
+            int(number) - 1
+            for number in marker.group(1).split(",")
+            if 0 < int(number) <= len(sources)
+        })
+        if not indices:
+            continue
+
+        head = answer[previous_end:marker.start()].rstrip()
+        end = len(answer[:marker.end()].encode("utf-8"))
+        if not head and spans:
+            # "[1][2]": adjacent markers cite the same sentence
+            start, _, cited, _ = spans.pop()
+            spans.append((start, end, sorted(set(cited) | set(indices)), None))
+            previous_end = marker.end()
+            continue
+
+        # The span is the sentence the marker closes (a period just before
+        # the marker ends that same sentence)
+        boundary = max(head[:-1].rfind(mark) for mark in ".!?\n") + 1
+        start = previous_end + boundary
+        start += len(answer[start:marker.start()]) - len(answer[start:marker.start()].lstrip())
+        spans.append((len(answer[:start].encode("utf-8")), end, indices, None))
+        previous_end = marker.end()
+
+    return CitationSet.from_spans(sources, spans, len(answer.encode("utf-8")))
+
+
+def citation_frame(citation_sets: Sequence[CitationSet]) -> pl.DataFrame:
+    """
+    Per-answer citation stats for many CitationSets, computed in bulk.
+
+    Args:
+        citation_sets: One CitationSet per answer
+
+    Returns:
+        DataFrame with has_citations, num_citations (spans), num_sources,
+        num_cited_sources, coverage (fraction of answer bytes supported,
+        overlaps counted once) and mean_confidence per answer
+    """
+    n = len(citation_sets)
+    num_spans = np.fromiter((len(c.starts) for c in citation_sets), np.int64, n)
+    lengths = np.fromiter((c.answer_length for c in citation_sets), np.int64, n)
+    rows = np.repeat(np.arange(n), num_spans)
+
+    starts = np.concatenate([c.starts for c in citation_sets] or [np.empty(0, np.int32)]).astype(np.int64)
+    ends = np.concatenate([c.ends for c in citation_sets] or [np.empty(0, np.int32)]).astype(np.int64)
+    scores = np.concatenate([c.scores for c in citation_sets] or [np.empty(0, np.float32)])
+    ends = np.minimum(ends, lengths[rows])
+
+    # Union of spans per answer: shift each answer to its own offset range, sort,
+    # and count only the part of a span beyond the running maximum end
+    width = int(lengths.max(initial=0)) + 1
+    shifted_starts = rows * width + starts
+    shifted_ends = rows * width + ends
+    order = np.lexsort((shifted_ends, shifted_starts))
+    shifted_starts, shifted_ends = shifted_starts[order], shifted_ends[order]
+    reach = np.maximum.accumulate(shifted_ends) if len(order) else shifted_ends
+    previous = np.concatenate(([-1], reach[:-1])) if len(order) else reach
+    covered = np.maximum(shifted_ends - np.maximum(shifted_starts, previous), 0)
+    covered_bytes = np.bincount(rows[order], weights=covered, minlength=n)
+
+    # Distinct cited sources per answer
+    num_sources = np.fromiter((len(c.sources) for c in citation_sets), np.int64, n)
+    source_rows = np.repeat(np.arange(n), [len(c.source_indices) for c in citation_sets])
+    indices = np.concatenate(
+        [c.source_indices for c in citation_sets] or [np.empty(0, np.int32)]
+    ).astype(np.int64)
+    stride = int(num_sources.max(initial=0)) + 1
+    pairs = np.unique(source_rows * stride + indices)
+    num_cited = np.bincount(pairs // stride, minlength=n)
+
+    scored = ~np.isnan(scores)
+    score_sums = np.bincount(rows[scored], weights=scores[scored], minlength=n)
+    score_counts = np.bincount(rows[scored], minlength=n)
+
+    return pl.DataFrame({
+        "has_citations": num_spans > 0,
+        "num_citations": num_spans,
+        "num_sources": num_sources,
+        "num_cited_sources": num_cited,
+        "coverage": np.divide(
+            covered_bytes, lengths, out=np.zeros(n), where=lengths > 0
+        ),
+        "mean_confidence": np.divide(
+            score_sums, score_counts, out=np.full(n, np.nan), where=score_counts > 0
+        ),
+    })
@@ -0,0 +1,251 @@
+"""Single-flight coalescing of identical in-flight RAG and GFS requests"""
+
+import contextvars
+import hashlib
+import json
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from custom_rag import CustomRAG
+from gfs_client import GFSClient
+
+
+def _encode(value: Any) -> Any:
+    """JSON stand-in for values json cannot serialize."""
+    if isinstance(value, np.ndarray):
+        # str() elides the middle of large arrays, so hash the raw buffer
+        data = np.ascontiguousarray(value).tobytes()
+        return ["ndarray", str(value.dtype), value.shape, hashlib.sha256(data).hexdigest()]
+    return str(value)
+
+
+def request_key(operation: str, *args, **kwargs) -> str:
+    """
+    Identify a request by its operation and arguments.
+
+    NumPy arrays (e.g. query embeddings) are identified by dtype, shape and
+    contents.
+
+    Args:
+        operation: Name of the call (e.g. "rag.query")
+        *args: Positional arguments
+        **kwargs: Keyword arguments
+
+    Returns:
+        Hex digest that is equal for identical requests
+    """
+    payload = json.dumps([operation, args, kwargs], sort_keys=True, default=_encode)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """Share one in-flight call between concurrent callers of the same key"""
+
+    def __init__(self, max_workers: int = 32):
+        """
+        Initialize the single-flight group.
+
+        Args:
+            max_workers: Maximum distinct calls running upstream at once
+        """
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="single-flight"
+        )
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "coalesced": 0}
+
+    def _forget(self, key: str, future: Future) -> None:
+        with self._lock:
+            # Only remove our own entry; a newer call may reuse the key
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def do(
+        self,
+        key: str,
+        fn: Callable[..., Any],
+        *args,
+        timeout: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Run fn, or join the identical call already in flight.
+
+        The call is forgotten as soon as it completes, so later requests
+        always start a fresh call and never see stale results. A caller that
+        times out stops waiting without cancelling the shared call. fn runs
+        in a copy of the starting caller's context, so context variables
+        such as the rate limiter priority carry over.
+
+        Args:
+            key: Request identity (see request_key())
+            fn: Function performing the request
+            *args: Positional arguments for fn
+            timeout: Seconds this caller waits (None waits indefinitely)
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The shared result of fn (do not mutate it)
+
+        Raises:
+            TimeoutError: If the result is not ready within timeout
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            future = self._in_flight.get(key)
+            started = future is None
+            if started:
+                context = contextvars.copy_context()
+                future = self._executor.submit(context.run, fn, *args, **kwargs)
+                self._in_flight[key] = future
+            else:
+                self._stats["coalesced"] += 1
+
+        if started:
+            # Outside the lock: an already finished call runs the callback right away
+            future.add_done_callback(lambda done: self._forget(key, done))
+        return future.result(timeout=timeout)
+
+    def get_stats(self) -> Dict:
+        """
+        Get coalescing statistics.
+
+        Returns:
+            Dictionary with calls, coalesced calls, upstream calls and in-flight count
+        """
+        with self._lock:
+            return {
+                **self._stats,
+                "upstream_calls": self._stats["calls"] - self._stats["coalesced"],
+                "in_flight": len(self._in_flight),
+            }
+
+    def close(self) -> None:
+        """Wait for in-flight calls and stop the worker threads."""
+        self._executor.shutdown(wait=True)
+
+
+class CoalescingRAG:
+    """CustomRAG whose identical concurrent queries share one retrieval + generation"""
+
+    def __init__(
+        self,
+        rag: CustomRAG,
+        timeout: Optional[float] = None,
+        single_flight: Optional[SingleFlight] = None
+    ):
+        """
+        Initialize the coalescing wrapper.
+
+        Args:
+            rag: CustomRAG with its collection already created
+            timeout: Default seconds each caller waits
+            single_flight: Shared SingleFlight group (a private one if None)
+        """
+        self.rag = rag
+        self.timeout = timeout
+        self.single_flight = single_flight or SingleFlight()
+
+    def _scope(self) -> str:
+        # Requests against different collections or models never coalesce
+        name = self.rag.collection.name if self.rag.collection is not None else ""
+        return f"{id(self.rag)}:{name}:{self.rag.llm_model}"
+
+    def query(self, query: str, timeout: Optional[float] = None, **kwargs) -> Dict:
+        """
+        End-to-end RAG query, coalesced with identical in-flight queries.
+
+        Args:
+            query: User query
+            timeout: Seconds this caller waits (defaults to the wrapper's timeout)
+            **kwargs: Additional arguments for CustomRAG.query
+
+        Returns:
+            Dictionary with answer, context, and metrics
+        """
+        key = request_key("rag.query", self._scope(), query, **kwargs)
+        return self.single_flight.do(
+            key,
+            self.rag.query,
+            query,
+            timeout=timeout if timeout is not None else self.timeout,
+            **kwargs
+        )
+
+    def retrieve(self, query: str, timeout: Optional[float] = None, **kwargs) -> Dict:
+        """
+        Retrieve chunks, coalesced with identical in-flight retrievals.
+
+        Args:
+            query: User query
+            timeout: Seconds this caller waits (defaults to the wrapper's timeout)
+            **kwargs: Additional arguments for CustomRAG.retrieve
+
+        Returns:
+            Dictionary with documents, distances, and metadatas
+        """
+        key = request_key("rag.retrieve", self._scope(), query, **kwargs)
+        return self.single_flight.do(
+            key,
+            self.rag.retrieve,
+            query,
+            timeout=timeout if timeout is not None else self.timeout,
+            **kwargs
+        )
+
+
+class CoalescingGFS:
+    """GFSClient whose identical concurrent file search queries share one call"""
+
+    def __init__(
+        self,
+        gfs: GFSClient,
+        timeout: Optional[float] = None,
+        single_flight: Optional[SingleFlight] = None
+    ):
+        """
+        Initialize the coalescing wrapper.
+
+        Args:
+            gfs: GFS client
+            timeout: Default seconds each caller waits
+            single_flight: Shared SingleFlight group (a private one if None)
+        """
+        self.gfs = gfs
+        self.timeout = timeout
+        self.single_flight = single_flight or SingleFlight()
+
+    def query_with_file_search(
+        self,
+        query: str,
+        store_names: List[str],
+        timeout: Optional[float] = None,
+        **kwargs
+    ):
+        """
+        Query using file search, coalesced with identical in-flight queries.
+
+        Args:
+            query: User query
+            store_names: List of file search store names to query
+            timeout: Seconds this caller waits (defaults to the wrapper's timeout)
+            **kwargs: Additional arguments for GFSClient.query_with_file_search
+
+        Returns:
+            GenerateContentResponse with answer and grounding
+        """
+        key = request_key(
+            "gfs.query", id(self.gfs), self.gfs.model_id, query, sorted(store_names), **kwargs
+        )
+        return self.single_flight.do(
+            key,
+            self.gfs.query_with_file_search,
+            query=query,
+            store_names=store_names,
+            timeout=timeout if timeout is not None else self.timeout,
+            **kwargs
+        )
@@ -2,73 +2,253 @@
 
 import time
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import Iterator, List, Optional, Dict, Tuple, Union
 import hashlib
 
+import numpy as np
+import polars as pl
 import chromadb
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 from google import genai
 from google.genai import types
 
+from citations import CitationSet, parse_markers
+from data_loader import iter_batches, load_csv_lazy, load_parquet_lazy
+from embeddings import QueryEmbeddingCache
+from extraction import extract_document, render_rows
+from filters import to_chroma_where
+from hnsw import hnsw_configuration, hnsw_params, tune_hnsw
+from parents import ParentStore
+from prompt_cache import PromptCache, prefix_key
+from rate_limit import RateLimiter, estimate_tokens
+from sharding import ShardedCollection
+from snapshot import export_collection, import_collection, load_parents
+
+ANSWER_INSTRUCTIONS = (
+    "You are a helpful assistant. Answer the question based on the provided context. "
+    "Cite the context passages you use with their [n] markers."
+)
+
+
+def maximal_marginal_relevance(
+    query_embedding: np.ndarray,
+    candidate_embeddings: np.ndarray,
+    top_k: int = 5,
+    lambda_mult: float = 0.5
+) -> List[int]:
+    """
+    Select a relevant but diverse subset of candidates with MMR.
+
+    Args:
+        query_embedding: Query vector of shape (dim,) or (1, dim)
+        candidate_embeddings: Candidate vectors of shape (n, dim)
+        top_k: Number of candidates to select
+        lambda_mult: Trade-off between relevance (1.0) and diversity (0.0)
+
+    Returns:
+        Indices into candidate_embeddings, in selection order
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if candidates.ndim != 2 or len(candidates) == 0 or top_k <= 0:
+        return []
+
+    query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+
+    # Cosine similarity through normalized dot products
+    candidates = candidates / np.maximum(
+        np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12
+    )
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    query_sim = candidates @ query
+    top_k = min(top_k, len(candidates))
+
+    selected = [int(np.argmax(query_sim))]
+    # Highest similarity of every candidate to anything already selected
+    redundancy = candidates @ candidates[selected[0]]
+
+    while len(selected) < top_k:
+        scores = lambda_mult * query_sim - (1.0 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        np.maximum(redundancy, candidates @ candidates[best], out=redundancy)
+
+    return selected
+
 
 class CustomRAG:
     """Custom RAG implementation for baseline comparison"""
 
     def __init__(
         self,
-        api_key: str,
+        api_key: Optional[str],
         embedding_model: str = "all-MiniLM-L6-v2",
         llm_model: str = "gemini-2.0-flash-exp",
-        persist_directory: Optional[Path] = None
+        persist_directory: Optional[Path] = None,
+        encoder: Optional[SentenceTransformer] = None,
+        chroma_client: Optional[chromadb.ClientAPI] = None,
+        llm_client: Optional[genai.Client] = None,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+        prompt_cache: Optional[PromptCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        parent_store: Optional[ParentStore] = None
     ):
         """
         Initialize custom RAG system.
 
         Args:
-            api_key: Google API key for LLM
+            api_key: Google API key for LLM (unused when llm_client is given)
             embedding_model: HuggingFace embedding model
             llm_model: Gemini model for generation
-            persist_directory: Directory to persist ChromaDB
+            persist_directory: Directory to persist ChromaDB (and sharded collections)
+            encoder: Shared, already-loaded embedding model to reuse
+                (e.g. an ONNX model from embeddings.load_onnx_encoder())
+            chroma_client: Shared ChromaDB client to reuse
+            llm_client: Shared Gemini client to reuse
+            query_cache: LRU cache of query embeddings (may be shared)
+            prompt_cache: Gemini context cache for the instruction and
+                pinned context prefix (used once context is pinned)
+            rate_limiter: Shared limiter applying quotas and retries to Gemini calls
+            parent_store: Store of parent segments; when set, indexed chunks
+                record their word span so answers can expand to parent windows
         """
         # Initialize embedding model
-        self.embedding_model = SentenceTransformer(embedding_model)
+        self.embedding_model_name = embedding_model
+        self.embedding_model = encoder or SentenceTransformer(embedding_model)
+        self.query_cache = query_cache
         self.embedding_dim = self.embedding_model.get_sentence_embedding_dimension()
 
         # Initialize vector database
-        client_settings = Settings(
-            persist_directory=str(persist_directory) if persist_directory else None,
-            anonymized_telemetry=False
-        )
-        self.chroma_client = chromadb.Client(client_settings)
+        if chroma_client is None:
+            client_settings = Settings(
+                persist_directory=str(persist_directory) if persist_directory else None,
+                anonymized_telemetry=False
+            )
+            chroma_client = chromadb.Client(client_settings)
+        self.chroma_client = chroma_client
+        self.persist_directory = Path(persist_directory) if persist_directory else None
+
+        if prompt_cache is not None and prompt_cache.model != llm_model:
+            raise ValueError(
+                f"prompt_cache is for model {prompt_cache.model}, not llm_model {llm_model}"
+            )
 
         # Initialize LLM client
-        self.llm_client = genai.Client(api_key=api_key)
+        self.llm_client = llm_client or genai.Client(api_key=api_key)
         self.llm_model = llm_model
+        self.prompt_cache = prompt_cache
+        self.rate_limiter = rate_limiter
+        self.parent_store = parent_store
 
         self.collection = None
+        # Bumped on every collection change; invalidates cached prefixes
+        self._revision = 0
+        self._pinned_filter: Optional[Dict] = None
+        self._pinned_documents: Optional[List[str]] = None
+        self._pinned_revision: Optional[int] = None
 
-    def create_collection(self, collection_name: str, recreate: bool = False) -> None:
+    def create_collection(
+        self,
+        collection_name: str,
+        recreate: bool = False,
+        hnsw: Optional[Dict] = None,
+        num_shards: Optional[int] = None
+    ) -> None:
         """
         Create or get ChromaDB collection.
 
         Args:
             collection_name: Name of the collection
             recreate: Whether to delete and recreate existing collection
+            hnsw: HNSW parameters for a new collection (space, M,
+                construction_ef, search_ef); an existing collection keeps its own
+            num_shards: Hash-partition the collection across this many shards,
+                each served by its own process (stored under
+                persist_directory/<collection_name>-shards, or in memory)
+
+        A parent store saved for the collection by save_parents() is loaded
+        unless one with contents was passed in (and deleted on recreate).
         """
-        if recreate:
-            try:
-                self.chroma_client.delete_collection(name=collection_name)
-            except Exception:
-                pass
+        self.close()
+        if num_shards:
+            self.collection = ShardedCollection(
+                collection_name,
+                num_shards,
+                directory=(
+                    self.persist_directory / f"{collection_name}-shards"
+                    if self.persist_directory else None
+                ),
+                hnsw=hnsw,
+                recreate=recreate
+            )
+        else:
+            if recreate:
+                try:
+                    self.chroma_client.delete_collection(name=collection_name)
+                except Exception:
+                    pass
+
+            self.collection = self.chroma_client.get_or_create_collection(
+                name=collection_name,
+                configuration=hnsw_configuration(hnsw)
+            )
+        self._revision += 1
+
+        # Parent segments persisted next to the collection by save_parents()
+        parents_path = self._parents_path()
+        if parents_path is not None and parents_path.exists():
+            if recreate:
+                parents_path.unlink()
+            elif self.parent_store is None or not len(self.parent_store):
+                self.parent_store = ParentStore.load(parents_path)
+
+    def _parents_path(self) -> Optional[Path]:
+        """Where the collection's parent store is persisted (None if in memory)."""
+        if self.persist_directory is None or self.collection is None:
+            return None
+        return self.persist_directory / f"{self.collection.name}-parents.parquet"
+
+    def save_parents(self) -> None:
+        """
+        Persist the parent store next to the collection.
 
-        self.collection = self.chroma_client.get_or_create_collection(
-            name=collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
+        create_collection() loads it back, so parent-window expansion keeps
+        working for a reopened collection. Does nothing without a
+        persist_directory or parent store.
+        """
+        parents_path = self._parents_path()
+        if parents_path is not None and self.parent_store is not None:
+            self.parent_store.save(parents_path)
 
+    @staticmethod
+    def chunk_spans(
+        num_words: int,
+        chunk_size: int = 512,
+        overlap: int = 50
+    ) -> List[Tuple[int, int]]:
+        """
+        Word spans of the chunks chunk_text() produces.
+
+        Args:
+            num_words: Number of words in the text
+            chunk_size: Approximate characters per chunk
+            overlap: Overlap between chunks
+
+        Returns:
+            List of [start, end) word index pairs
+        """
+        # Approximate words per chunk
+        words_per_chunk = chunk_size // 5  # Rough estimate
+
+        return [
+            (i, min(i + words_per_chunk, num_words))
+            for i in range(0, num_words, words_per_chunk - overlap // 5)
+        ]
+
+    @staticmethod
     def chunk_text(
-        self,
         text: str,
         chunk_size: int = 512,
         overlap: int = 50
@@ -85,33 +265,28 @@ class CustomRAG:
             List of text chunks
         """
         words = text.split()
-        chunks = []
-
-        # Approximate words per chunk
-        words_per_chunk = chunk_size // 5  # Rough estimate
-
-        for i in range(0, len(words), words_per_chunk - overlap // 5):
-            chunk = " ".join(words[i:i + words_per_chunk])
-            if chunk:
-                chunks.append(chunk)
-
-        return chunks
+        return [
+            " ".join(words[start:end])
+            for start, end in CustomRAG.chunk_spans(len(words), chunk_size, overlap)
+        ]
 
     def index_document(
         self,
         file_path: Path,
         chunk_size: int = 512,
         overlap: int = 50,
-        metadata: Optional[Dict] = None
+        metadata: Optional[Dict] = None,
+        segments: Optional[List[Dict]] = None
     ) -> int:
         """
         Index a document into the vector database.
 
         Args:
-            file_path: Path to document
+            file_path: Path to document (any format supported by extraction)
             chunk_size: Characters per chunk
             overlap: Overlap between chunks
             metadata: Additional metadata
+            segments: Pre-extracted segments from extraction.extract_documents()
 
         Returns:
             Number of chunks indexed
@@ -119,12 +294,37 @@ class CustomRAG:
         if self.collection is None:
             raise ValueError("Collection not created. Call create_collection() first.")
 
-        # Read file
-        with open(file_path, "r", encoding="utf-8") as f:
-            text = f.read()
+        # Extract text segments with page/sheet/row provenance
+        if segments is None:
+            segments = extract_document(file_path)
 
-        # Chunk text
-        chunks = self.chunk_text(text, chunk_size, overlap)
+        # Create unique IDs for chunks
+        file_hash = hashlib.md5(str(file_path).encode()).hexdigest()[:8]
+
+        # Chunk text, keeping each chunk's segment provenance
+        chunks = []
+        chunk_provenance = []
+        for segment_index, segment in enumerate(segments):
+            words = segment["text"].split()
+            spans = self.chunk_spans(len(words), chunk_size, overlap)
+            if self.parent_store is not None and spans:
+                # The segment is the parent; children point into it by word span
+                parent_id = f"{file_hash}_p{segment_index}"
+                self.parent_store.add(parent_id, " ".join(words))
+            for start, end in spans:
+                chunks.append(" ".join(words[start:end]))
+                provenance = segment.get("metadata", {})
+                if self.parent_store is not None:
+                    provenance = {
+                        **provenance,
+                        "parent_id": parent_id,
+                        "word_start": start,
+                        "word_end": end,
+                    }
+                chunk_provenance.append(provenance)
+
+        if not chunks:
+            return 0
 
         # Generate embeddings
         embeddings = self.embedding_model.encode(chunks, show_progress_bar=False)
@@ -134,23 +334,164 @@ class CustomRAG:
         file_metadata["source_file"] = file_path.name
         file_metadata["file_path"] = str(file_path)
 
-        # Create unique IDs for chunks
-        file_hash = hashlib.md5(str(file_path).encode()).hexdigest()[:8]
-
         # Add to collection
         self.collection.add(
             documents=chunks,
             embeddings=embeddings.tolist(),
-            metadatas=[{**file_metadata, "chunk_id": i} for i in range(len(chunks))],
+            metadatas=[
+                {**file_metadata, **provenance, "chunk_id": i}
+                for i, provenance in enumerate(chunk_provenance)
+            ],
             ids=[f"{file_hash}_{i}" for i in range(len(chunks))]
         )
+        self._revision += 1
 
         return len(chunks)
 
+    def index_table(
+        self,
+        source: Union[Path, pl.LazyFrame],
+        source_name: Optional[str] = None,
+        rows_per_chunk: int = 20,
+        batch_size: int = 10_000,
+        columns: Optional[List[str]] = None,
+        metadata: Optional[Dict] = None
+    ) -> int:
+        """
+        Index a CSV/Parquet table by streaming it in row batches.
+
+        Rows are rendered as "column: value" lines, grouped rows_per_chunk at a
+        time, and embedded batch by batch, so memory stays bounded by
+        batch_size regardless of table size. Each chunk records its
+        row_start / row_end in metadata.
+
+        Args:
+            source: Path to a .csv/.parquet file, or a LazyFrame
+                (e.g. from data_loader.load_csv_lazy)
+            source_name: Name stored as source_file (required for LazyFrames)
+            rows_per_chunk: Table rows per chunk
+            batch_size: Rows collected, embedded and added per batch
+            columns: Subset of columns to index (all if None)
+            metadata: Additional metadata
+
+        Returns:
+            Number of chunks indexed
+        """
+        if self.collection is None:
+            raise ValueError("Collection not created. Call create_collection() first.")
+
+        if isinstance(source, pl.LazyFrame):
+            if not source_name:
+                raise ValueError("source_name is required when indexing a LazyFrame")
+            lf = source
+        else:
+            source = Path(source)
+            suffix = source.suffix.lower()
+            if suffix == ".csv":
+                lf = load_csv_lazy(source, infer_schema=False)
+            elif suffix == ".parquet":
+                lf = load_parquet_lazy(source)
+            else:
+                raise ValueError(f"Unsupported table format: {suffix}")
+            source_name = source_name or source.name
+
+        if columns:
+            lf = lf.select(columns)
+
+        # Prepare metadata
+        table_metadata = metadata or {}
+        table_metadata["source_file"] = source_name
+        if not isinstance(source, pl.LazyFrame):
+            table_metadata["file_path"] = str(source)
+
+        source_hash = hashlib.md5(source_name.encode()).hexdigest()[:8]
+        # Request whole row groups; shorter batches are re-buffered below
+        batch_size = max(batch_size // rows_per_chunk, 1) * rows_per_chunk
+
+        row_offset = 0
+        num_chunks = 0
+
+        def add_rows(rows: pl.DataFrame) -> None:
+            nonlocal row_offset, num_chunks
+            segments = render_rows(rows, rows_per_chunk, row_offset=row_offset)
+            row_offset += rows.height
+            if not segments:
+                return
+
+            chunks = [segment["text"] for segment in segments]
+            embeddings = self.embedding_model.encode(chunks, show_progress_bar=False)
+
+            self.collection.add(
+                documents=chunks,
+                embeddings=embeddings.tolist(),
+                metadatas=[
+                    {**table_metadata, **segment["metadata"], "chunk_id": num_chunks + i}
+                    for i, segment in enumerate(segments)
+                ],
+                ids=[
+                    f"{source_hash}_r{segment['metadata']['row_start']}"
+                    for segment in segments
+                ]
+            )
+            num_chunks += len(chunks)
+            self._revision += 1
+
+        # Batches may not be whole row groups: carry the remainder into the next
+        leftover = None
+        for batch in iter_batches(lf, batch_size):
+            if leftover is not None:
+                batch = pl.concat([leftover, batch])
+            whole = batch.height // rows_per_chunk * rows_per_chunk
+            leftover = batch.slice(whole) if whole < batch.height else None
+            if whole:
+                add_rows(batch.slice(0, whole))
+        if leftover is not None:
+            add_rows(leftover)
+
+        return num_chunks
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embed queries, going through the query cache when one is configured.
+
+        Args:
+            queries: Query texts
+
+        Returns:
+            Array of shape (len(queries), embedding_dim)
+        """
+        if self.query_cache is None:
+            return self.embedding_model.encode(queries, show_progress_bar=False)
+        return self.query_cache.get_or_encode(
+            self.embedding_model_name, queries, self.embedding_model
+        )
+
+    def preload_queries(self, queries: List[str], batch_size: int = 256) -> int:
+        """
+        Embed a known query set once so later retrievals skip the encoder.
+
+        Args:
+            queries: Query texts (e.g. an evaluation set)
+            batch_size: Queries encoded per call
+
+        Returns:
+            Number of queries held in the cache
+        """
+        if self.query_cache is None:
+            self.query_cache = QueryEmbeddingCache()
+        return self.query_cache.preload(
+            self.embedding_model_name, queries, self.embedding_model, batch_size
+        )
+
     def retrieve(
         self,
         query: str,
-        top_k: int = 5
+        top_k: int = 5,
+        mmr: bool = False,
+        mmr_lambda: float = 0.5,
+        fetch_k: Optional[int] = None,
+        metadata_filter: Optional[Union[str, Dict]] = None,
+        query_embedding: Optional[np.ndarray] = None
     ) -> Dict:
         """
         Retrieve relevant chunks for a query.
@@ -158,6 +499,13 @@ class CustomRAG:
         Args:
             query: User query
             top_k: Number of chunks to retrieve
+            mmr: Whether to diversify results with maximal marginal relevance
+            mmr_lambda: MMR trade-off between relevance (1.0) and diversity (0.0)
+            fetch_k: Candidates fetched before MMR selection (default 4 * top_k)
+            metadata_filter: GFS-style filter expression (e.g. 'department = "hr"')
+                or a Chroma where dict, restricting the search to matching chunks
+            query_embedding: Precomputed embedding of the query (e.g. from a
+                batched encode), skipping the encoder
 
         Returns:
             Dictionary with chunks, distances, and metadata
@@ -165,19 +513,139 @@ class CustomRAG:
         if self.collection is None:
             raise ValueError("Collection not created.")
 
+        where = to_chroma_where(metadata_filter)
+
         # Encode query
-        query_embedding = self.embedding_model.encode([query], show_progress_bar=False)
+        if query_embedding is None:
+            query_embedding = self.encode_queries([query])
+        else:
+            query_embedding = np.asarray(query_embedding).reshape(1, -1)
+
+        if not mmr:
+            # Query collection
+            results = self.collection.query(
+                query_embeddings=query_embedding.tolist(),
+                n_results=top_k,
+                where=where
+            )
+
+            return {
+                "documents": results["documents"][0] if results["documents"] else [],
+                "distances": results["distances"][0] if results["distances"] else [],
+                "metadatas": results["metadatas"][0] if results["metadatas"] else [],
+            }
 
-        # Query collection
+        # Over-fetch candidates with their embeddings, then diversify
         results = self.collection.query(
             query_embeddings=query_embedding.tolist(),
-            n_results=top_k
+            n_results=max(fetch_k or 4 * top_k, top_k),
+            where=where,
+            include=["documents", "distances", "metadatas", "embeddings"]
+        )
+
+        if not results["documents"] or not results["documents"][0]:
+            return {"documents": [], "distances": [], "metadatas": []}
+
+        selected = maximal_marginal_relevance(
+            query_embedding[0],
+            np.asarray(results["embeddings"][0]),
+            top_k=top_k,
+            lambda_mult=mmr_lambda
         )
 
         return {
-            "documents": results["documents"][0] if results["documents"] else [],
-            "distances": results["distances"][0] if results["distances"] else [],
-            "metadatas": results["metadatas"][0] if results["metadatas"] else [],
+            "documents": [results["documents"][0][i] for i in selected],
+            "distances": [results["distances"][0][i] for i in selected],
+            "metadatas": [results["metadatas"][0][i] for i in selected],
+        }
+
+    def pin_context(
+        self,
+        metadata_filter: Optional[Union[str, Dict]] = None,
+        documents: Optional[List[str]] = None
+    ) -> None:
+        """
+        Pin a hot document set that every answer is generated against.
+
+        Pinned chunks are sent once as part of the cached prompt prefix
+        instead of with every request. Chunks selected by metadata_filter are
+        re-read from the collection whenever it changes.
+
+        Args:
+            metadata_filter: Filter expression or where dict selecting chunks
+            documents: Explicit texts to pin (used as-is)
+        """
+        self._pinned_filter = to_chroma_where(metadata_filter)
+        self._pinned_documents = list(documents) if documents else None
+        self._pinned_revision = None
+
+    def _pinned_context(self) -> List[str]:
+        """Pinned texts, reloaded from the collection after it changes."""
+        if self._pinned_filter is None:
+            return self._pinned_documents or []
+
+        if self._pinned_revision != self._revision:
+            if self.collection is None:
+                raise ValueError("Collection not created.")
+            pinned = self.collection.get(where=self._pinned_filter, include=["documents"])
+            self._pinned_documents = pinned["documents"]
+            self._pinned_revision = self._revision
+        return self._pinned_documents
+
+    def _cached_prefix(self, pinned: List[str]) -> Optional[str]:
+        """Cached content name for the instruction + pinned prefix, if cacheable."""
+        # The instruction alone is far below Gemini's minimum cacheable size
+        if self.prompt_cache is None or not pinned:
+            return None
+
+        # One handle per collection, replaced when its contents change
+        collection_name = self.collection.name if self.collection is not None else ""
+        return self.prompt_cache.get(
+            prefix_key(self.llm_model, collection_name),
+            system_instruction=ANSWER_INSTRUCTIONS,
+            contents=pinned,
+            version=prefix_key(ANSWER_INSTRUCTIONS, pinned),
+            model=self.llm_model
+        )
+
+    def _generation_request(
+        self,
+        query: str,
+        context: List[str],
+        temperature: float
+    ) -> Dict:
+        """Build contents, config and token estimate for an answer request."""
+        pinned = self._pinned_context()
+        cached_content = self._cached_prefix(pinned)
+
+        # Build prompt with context
+        context_str = "\n\n".join([f"[{i+1}] {chunk}" for i, chunk in enumerate(context)])
+
+        prompt = f"""Context:
+{context_str}
+
+Question: {query}
+
+Answer:"""
+
+        if cached_content:
+            config = types.GenerateContentConfig(
+                temperature=temperature,
+                cached_content=cached_content
+            )
+            contents = prompt
+        else:
+            config = types.GenerateContentConfig(
+                temperature=temperature,
+                system_instruction=ANSWER_INSTRUCTIONS
+            )
+            contents = [*pinned, prompt]
+
+        return {
+            "model": self.llm_model,
+            "contents": contents,
+            "config": config,
+            "tokens": estimate_tokens(ANSWER_INSTRUCTIONS, *pinned, prompt),
         }
 
     def generate_answer(
@@ -189,6 +657,10 @@ class CustomRAG:
         """
         Generate answer using retrieved context.
 
+        The instruction (and any pinned context) is sent as a stable prefix:
+        from the prompt cache when one is configured, otherwise as the system
+        instruction so it can benefit from implicit prefix caching.
+
         Args:
             query: User query
             context: Retrieved text chunks
@@ -197,31 +669,79 @@ class CustomRAG:
         Returns:
             GenerateContentResponse
         """
-        # Build prompt with context
-        context_str = "\n\n".join([f"[{i+1}] {chunk}" for i, chunk in enumerate(context)])
+        request = self._generation_request(query, context, temperature)
+        tokens = request.pop("tokens")
+
+        generate = self.llm_client.models.generate_content
+        if self.rate_limiter is None:
+            return generate(**request)
+
+        return self.rate_limiter.call(
+            generate,
+            **request,
+            quota_key=self.llm_model,
+            tokens=tokens
+        )
+
+    def stream_answer(
+        self,
+        query: str,
+        context: List[str],
+        temperature: float = 0.0
+    ) -> Iterator[types.GenerateContentResponse]:
+        """
+        Generate an answer as a stream of partial responses.
 
-        prompt = f"""You are a helpful assistant. Answer the question based on the provided context.
+        Streams are not retried; with a rate limiter the call only waits
+        for quota before starting.
 
-Context:
-{context_str}
+        Args:
+            query: User query
+            context: Retrieved text chunks
+            temperature: Generation temperature
 
-Question: {query}
+        Yields:
+            Partial GenerateContentResponse chunks (text in .text; the last
+            one carries usage_metadata)
+        """
+        request = self._generation_request(query, context, temperature)
+        tokens = request.pop("tokens")
 
-Answer:"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(self.llm_model, tokens)
 
-        response = self.llm_client.models.generate_content(
-            model=self.llm_model,
-            contents=prompt,
-            config=types.GenerateContentConfig(temperature=temperature)
-        )
+        yield from self.llm_client.models.generate_content_stream(**request)
+
+    @staticmethod
+    def extract_citations(
+        answer: Optional[str],
+        context: List[str],
+        metadatas: List[Dict]
+    ) -> CitationSet:
+        """
+        Map [n] markers in an answer to the chunk metadata of its context.
+
+        Args:
+            answer: Generated answer
+            context: Passages sent to the model, in prompt order
+            metadatas: Chunk metadata of each passage
 
-        return response
+        Returns:
+            CitationSet whose sources are the context passages
+        """
+        return parse_markers(answer, context, metadatas)
 
     def query(
         self,
         query: str,
         top_k: int = 5,
-        temperature: float = 0.0
+        temperature: float = 0.0,
+        mmr: bool = False,
+        mmr_lambda: float = 0.5,
+        metadata_filter: Optional[Union[str, Dict]] = None,
+        query_embedding: Optional[np.ndarray] = None,
+        parent_window: Optional[int] = None,
+        context_token_budget: Optional[int] = None
     ) -> Dict:
         """
         End-to-end RAG query.
@@ -230,41 +750,177 @@ Answer:"""
             query: User query
             top_k: Number of chunks to retrieve
             temperature: Generation temperature
+            mmr: Whether to diversify retrieved chunks with MMR
+            mmr_lambda: MMR trade-off between relevance and diversity
+            metadata_filter: Filter expression or where dict scoping retrieval
+            query_embedding: Precomputed embedding of the query
+            parent_window: Expand hits to parent windows of this many words
+                (requires a parent_store; None sends the chunks as retrieved)
+            context_token_budget: Maximum estimated tokens of expanded context
 
         Returns:
-            Dictionary with answer, context, and metrics
+            Dictionary with answer, context, citations, and metrics
         """
         start_time = time.time()
 
         # Retrieve
         retrieval_start = time.time()
-        retrieval_results = self.retrieve(query, top_k)
+        retrieval_results = self.retrieve(
+            query,
+            top_k,
+            mmr=mmr,
+            mmr_lambda=mmr_lambda,
+            metadata_filter=metadata_filter,
+            query_embedding=query_embedding
+        )
         retrieval_time = time.time() - retrieval_start
 
+        context = retrieval_results["documents"]
+        context_metadatas = retrieval_results["metadatas"]
+        if parent_window and self.parent_store is not None:
+            # Small-to-big: send deduplicated parent windows around the hits
+            ranked = self.parent_store.expand_ranked(
+                retrieval_results["metadatas"],
+                context,
+                window_words=parent_window,
+                token_budget=context_token_budget
+            )
+            context = [passage for _, passage in ranked]
+            context_metadatas = [retrieval_results["metadatas"][rank] for rank, _ in ranked]
+
         # Generate
         generation_start = time.time()
         response = self.generate_answer(
             query=query,
-            context=retrieval_results["documents"],
+            context=context,
             temperature=temperature
         )
         generation_time = time.time() - generation_start
 
         total_time = time.time() - start_time
+        usage = response.usage_metadata
 
         return {
             "answer": response.text,
-            "context": retrieval_results["documents"],
+            "context": context,
+            "citations": self.extract_citations(response.text, context, context_metadatas),
             "distances": retrieval_results["distances"],
             "metadatas": retrieval_results["metadatas"],
             "metrics": {
                 "retrieval_time": retrieval_time,
                 "generation_time": generation_time,
                 "total_time": total_time,
-                "num_chunks_retrieved": len(retrieval_results["documents"])
+                "num_chunks_retrieved": len(retrieval_results["documents"]),
+                "context_tokens": estimate_tokens(*context),
+                "input_tokens": usage.prompt_token_count if usage else None,
+                "output_tokens": usage.candidates_token_count if usage else None,
+                "cached_tokens": usage.cached_content_token_count if usage else None
             }
         }
 
+    def tune_index(
+        self,
+        queries: List[str],
+        k: int = 10,
+        target_recall: float = 0.95,
+        **kwargs
+    ) -> Dict:
+        """
+        Auto-tune the collection's HNSW M and search_ef for a recall@k target.
+
+        Args:
+            queries: Held-out query sample
+            k: Neighbours per query for recall@k
+            target_recall: Required recall@k against exact search
+            **kwargs: m_values, ef_values, batch_size for hnsw.tune_hnsw
+
+        Returns:
+            Tuning report (chosen params, recall, p95_ms, target_met, trials)
+        """
+        if self.collection is None:
+            raise ValueError("Collection not created. Call create_collection() first.")
+        if isinstance(self.collection, ShardedCollection):
+            raise ValueError("Auto-tuning works on a single collection; tune before sharding")
+
+        report = tune_hnsw(
+            self.chroma_client,
+            self.collection,
+            self.encode_queries(queries),
+            k=k,
+            target_recall=target_recall,
+            **kwargs
+        )
+        self.collection = report.pop("collection")
+        self._revision += 1
+        return report
+
+    def index_params(self) -> Dict:
+        """Effective HNSW parameters of the collection."""
+        if self.collection is None:
+            raise ValueError("Collection not created. Call create_collection() first.")
+        return hnsw_params(self.collection)
+
+    def export_snapshot(self, output_path: Path, batch_size: int = 5000) -> Dict:
+        """
+        Export the collection (chunks, metadata, embeddings) to a Parquet bundle.
+
+        The parent store, if any, is exported alongside it.
+
+        Args:
+            output_path: Bundle path
+            batch_size: Chunks read per batch
+
+        Returns:
+            Bundle manifest
+        """
+        if self.collection is None:
+            raise ValueError("Collection not created.")
+        return export_collection(
+            self.collection,
+            output_path,
+            self.embedding_model_name,
+            batch_size,
+            parent_store=self.parent_store
+        )
+
+    def load_snapshot(
+        self,
+        bundle_path: Path,
+        collection_name: Optional[str] = None,
+        batch_size: int = 5000
+    ) -> int:
+        """
+        Load a bundle into a fresh collection without re-embedding.
+
+        A parent store exported with the bundle replaces the current one and
+        is saved next to the collection.
+
+        Args:
+            bundle_path: Bundle written by export_snapshot()
+            collection_name: Target collection (defaults to the exported name)
+            batch_size: Chunks added per batch
+
+        Returns:
+            Number of chunks loaded
+        """
+        # Verified before the import, which replaces the collection
+        parent_store = load_parents(bundle_path)
+
+        # Stop the shard workers of a sharded collection being replaced
+        self.close()
+        self.collection = import_collection(
+            bundle_path,
+            self.chroma_client,
+            collection_name=collection_name,
+            batch_size=batch_size,
+            expected_embedding_model=self.embedding_model_name
+        )
+        self._revision += 1
+        if parent_store is not None:
+            self.parent_store = parent_store
+            self.save_parents()
+        return self.collection.count()
+
     def get_stats(self) -> Dict:
         """
         Get collection statistics.
@@ -279,5 +935,13 @@ Answer:"""
         return {
             "collection_name": self.collection.name,
             "total_chunks": count,
-            "embedding_dimension": self.embedding_dim
+            "embedding_dimension": self.embedding_dim,
+            "hnsw": hnsw_params(self.collection),
+            "num_shards": getattr(self.collection, "num_shards", 1)
         }
+
+    def close(self) -> None:
+        """Stop the worker processes of a sharded collection, if any."""
+        if isinstance(self.collection, ShardedCollection):
+            self.collection.close()
+            self.collection = None
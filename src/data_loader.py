@@ -2,7 +2,7 @@
 
 import hashlib
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 import polars as pl
 import pandas as pd
@@ -71,6 +71,50 @@ def load_csv_lazy(file_path: Path, **kwargs) -> pl.LazyFrame:
     return pl.scan_csv(file_path, **kwargs)
 
 
+def load_parquet_lazy(file_path: Path, **kwargs) -> pl.LazyFrame:
+    """
+    Lazy-load large Parquet files using Polars.
+
+    Args:
+        file_path: Path to Parquet file
+        **kwargs: Additional arguments for pl.scan_parquet
+
+    Returns:
+        LazyFrame for deferred execution
+    """
+    return pl.scan_parquet(file_path, **kwargs)
+
+
+def iter_batches(lf: pl.LazyFrame, batch_size: int = 10_000) -> Iterator[pl.DataFrame]:
+    """
+    Stream a LazyFrame as DataFrames of at most batch_size rows.
+
+    Uses the streaming engine's collect_batches() when available (Polars >= 1.33),
+    otherwise falls back to collecting successive slices.
+
+    Args:
+        lf: LazyFrame to stream
+        batch_size: Maximum rows per batch
+
+    Yields:
+        DataFrame batches in row order
+    """
+    if hasattr(lf, "collect_batches"):
+        for batch in lf.collect_batches(chunk_size=batch_size, maintain_order=True):
+            # Batches may be smaller or larger than requested; re-split to the bound
+            for offset in range(0, batch.height, batch_size):
+                yield batch.slice(offset, batch_size)
+        return
+
+    offset = 0
+    while True:
+        batch = lf.slice(offset, batch_size).collect()
+        if batch.height == 0:
+            return
+        yield batch
+        offset += batch.height
+
+
 def load_text_file(file_path: Path, encoding: str = "utf-8") -> str:
     """
     Load text file content.
@@ -0,0 +1,374 @@
+"""Embedding encoders that plug into CustomRAG behind the encode() interface"""
+
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+
+def text_key(text: str) -> str:
+    """Content hash used to key cached embeddings."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class CachedEncoder:
+    """Encoder wrapper that embeds each distinct text at most once"""
+
+    def __init__(
+        self,
+        model: Union[str, SentenceTransformer],
+        cache_dir: Optional[Path] = None,
+        model_name: Optional[str] = None
+    ):
+        """
+        Initialize the cached encoder.
+
+        Args:
+            model: Model name or an already-loaded SentenceTransformer
+            cache_dir: Directory to persist embeddings across runs (memory only if None)
+            model_name: Name used to key the cache (defaults to the model name;
+                required when persisting embeddings of an already-loaded model)
+        """
+        if isinstance(model, str):
+            model_name = model_name or model
+            model = SentenceTransformer(model)
+        elif cache_dir and not model_name:
+            raise ValueError("model_name is required to persist embeddings of a loaded model")
+
+        self.model = model
+        self.model_name = model_name or type(model).__name__
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+
+        self._index: Dict[str, int] = {}
+        self._vectors: List[np.ndarray] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.cache_path and self.cache_path.exists():
+            data = np.load(self.cache_path)
+            self._vectors = list(data["vectors"])
+            self._index = {str(key): i for i, key in enumerate(data["keys"])}
+
+    @property
+    def cache_path(self) -> Optional[Path]:
+        """File holding this model's persisted embeddings."""
+        if self.cache_dir is None:
+            return None
+        slug = re.sub(r"[^a-zA-Z0-9._-]", "_", self.model_name)
+        return self.cache_dir / f"{slug}.npz"
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, sentences: Union[str, List[str]], **kwargs) -> np.ndarray:
+        """
+        Encode texts, reusing cached embeddings for texts seen before.
+
+        Args:
+            sentences: Text or list of texts
+            **kwargs: Passed to the wrapped model's encode() for cache misses;
+                cache entries are keyed by text only, so keep these consistent
+
+        Returns:
+            Array of shape (len(sentences), dim), or (dim,) for a single string
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        keys = [text_key(text) for text in texts]
+
+        with self._lock:
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in self._index and key not in missing:
+                    missing[key] = text
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            encoded = np.asarray(self.model.encode(list(missing.values()), **kwargs))
+            with self._lock:
+                for key, vector in zip(missing, encoded):
+                    if key not in self._index:
+                        self._index[key] = len(self._vectors)
+                        self._vectors.append(vector)
+
+        with self._lock:
+            if not texts:
+                return np.empty((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+            result = np.stack([self._vectors[self._index[key]] for key in keys])
+
+        return result[0] if single else result
+
+    def save(self) -> Optional[Path]:
+        """
+        Persist cached embeddings to cache_dir.
+
+        Returns:
+            Path written, or None if no cache_dir is configured
+        """
+        if self.cache_path is None:
+            return None
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            keys = np.array(list(self._index), dtype="U40")
+            vectors = (
+                np.stack([self._vectors[i] for i in self._index.values()])
+                if self._vectors else np.empty((0, 0), dtype=np.float32)
+            )
+
+        tmp_path = self.cache_path.with_suffix(".tmp.npz")
+        np.savez(tmp_path, keys=keys, vectors=vectors)
+        tmp_path.replace(self.cache_path)
+        return self.cache_path
+
+    def get_stats(self) -> Dict:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with cached entries, hits, misses and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "model_name": self.model_name,
+            "cached_embeddings": len(self._index),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache of query embeddings keyed by (model, normalized text)"""
+
+    def __init__(self, max_size: int = 10_000, casefold: bool = False):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of cached query embeddings
+            casefold: Also case-fold queries when normalizing (for uncased models)
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+
+        self.max_size = max_size
+        self.casefold = casefold
+
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def normalize(self, text: str) -> str:
+        """Unicode-normalize, collapse whitespace and optionally case-fold a query."""
+        text = " ".join(unicodedata.normalize("NFC", text).split())
+        return text.casefold() if self.casefold else text
+
+    def _put(self, key: Tuple[str, str], vector: np.ndarray) -> None:
+        """Insert under the lock held by the caller, evicting the LRU entry."""
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_encode(self, model_name: str, queries: List[str], encoder) -> np.ndarray:
+        """
+        Get embeddings for queries, encoding only the cache misses in one call.
+
+        Args:
+            model_name: Name of the embedding model (part of the cache key)
+            queries: Query texts
+            encoder: Object with encode(texts, show_progress_bar=False)
+
+        Returns:
+            Array of shape (len(queries), dim)
+        """
+        keys = [(model_name, self.normalize(query)) for query in queries]
+        vectors: List[Optional[np.ndarray]] = [None] * len(keys)
+        missing: Dict[Tuple[str, str], List[int]] = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._entries.move_to_end(key)
+                    vectors[i] = vector
+            self.hits += len(keys) - sum(len(rows) for rows in missing.values())
+            self.misses += sum(len(rows) for rows in missing.values())
+
+        if missing:
+            encoded = np.asarray(encoder.encode(
+                [key[1] for key in missing], show_progress_bar=False
+            ))
+            with self._lock:
+                for (key, rows), vector in zip(missing.items(), encoded):
+                    self._put(key, vector)
+                    for i in rows:
+                        vectors[i] = vector
+
+        return np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+    def preload(
+        self,
+        model_name: str,
+        queries: Iterable[str],
+        encoder,
+        batch_size: int = 256
+    ) -> int:
+        """
+        Embed a known query set up front (e.g. an evaluation set).
+
+        Args:
+            model_name: Name of the embedding model
+            queries: Query texts
+            encoder: Object with encode(texts, show_progress_bar=False)
+            batch_size: Queries encoded per call
+
+        Returns:
+            Number of queries now cached
+        """
+        queries = list(queries)
+        for start in range(0, len(queries), batch_size):
+            self.get_or_encode(model_name, queries[start:start + batch_size], encoder)
+        return len(self._entries)
+
+    def save(self, path: Path) -> Path:
+        """
+        Persist cached embeddings so query sets can be reused across runs.
+
+        Args:
+            path: .npz file to write
+
+        Returns:
+            Path written
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            keys = list(self._entries)
+            vectors = list(self._entries.values())
+
+        np.savez(
+            path,
+            models=np.array([k[0] for k in keys], dtype=str),
+            queries=np.array([k[1] for k in keys], dtype=str),
+            vectors=np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+        )
+        return path
+
+    def load(self, path: Path) -> int:
+        """
+        Load embeddings written by save().
+
+        Args:
+            path: .npz file to read
+
+        Returns:
+            Number of entries loaded
+        """
+        data = np.load(path)
+        with self._lock:
+            for model_name, query, vector in zip(data["models"], data["queries"], data["vectors"]):
+                self._put((str(model_name), str(query)), vector)
+        return len(data["queries"])
+
+    def get_stats(self) -> Dict:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with size, hits, misses, evictions and hit rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def load_onnx_encoder(
+    model_name: str,
+    quantization: Optional[str] = "avx2",
+    intra_op_threads: Optional[int] = None,
+    export_dir: Optional[Path] = None
+) -> SentenceTransformer:
+    """
+    Load a SentenceTransformer running on ONNX Runtime, optionally int8-quantized.
+
+    The model is exported to ONNX (and dynamically quantized) on first use and
+    reused from export_dir afterwards. The result keeps the SentenceTransformer
+    encode() interface, so it can be passed to CustomRAG(encoder=...).
+
+    Requires the optional "onnx" extra (optimum[onnxruntime]).
+
+    Args:
+        model_name: HuggingFace embedding model
+        quantization: Dynamic int8 quantization target ("arm64", "avx2",
+            "avx512" or "avx512_vnni"), or None for fp32 ONNX
+        intra_op_threads: ONNX Runtime intra-op threads (defaults to the CPU count)
+        export_dir: Directory holding the exported model
+            (defaults to models/custom_rag/onnx/<model>)
+
+    Returns:
+        SentenceTransformer using the ONNX backend
+    """
+    try:
+        import onnxruntime as ort
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+    except ImportError as e:
+        raise ImportError(
+            "ONNX encoding requires optimum[onnxruntime]: uv sync --extra onnx"
+        ) from e
+
+    slug = re.sub(r"[^a-zA-Z0-9._-]", "_", model_name.split("/")[-1])
+    export_dir = Path(export_dir) if export_dir else Path("models") / "custom_rag" / "onnx" / slug
+    fp32_file = export_dir / "onnx" / "model.onnx"
+
+    if not fp32_file.exists():
+        # Loading with backend="onnx" exports the PyTorch weights when needed
+        SentenceTransformer(model_name, backend="onnx").save_pretrained(str(export_dir))
+
+    file_name = "onnx/model.onnx"
+    if quantization:
+        file_name = f"onnx/model_qint8_{quantization}.onnx"
+        if not (export_dir / file_name).exists():
+            export_dynamic_quantized_onnx_model(
+                SentenceTransformer(str(export_dir), backend="onnx"),
+                quantization_config=quantization,
+                model_name_or_path=str(export_dir)
+            )
+
+    session_options = ort.SessionOptions()
+    session_options.intra_op_num_threads = intra_op_threads or os.cpu_count() or 1
+    session_options.inter_op_num_threads = 1
+    session_options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    return SentenceTransformer(
+        str(export_dir),
+        backend="onnx",
+        model_kwargs={
+            "file_name": file_name,
+            "provider": "CPUExecutionProvider",
+            "session_options": session_options,
+        }
+    )
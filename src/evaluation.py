@@ -0,0 +1,304 @@
+"""Vectorized retrieval and grounding quality metrics"""
+
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import polars as pl
+
+from citations import CitationSet
+from filters import to_chroma_where
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def relevance_matrix(
+    retrieved: Sequence[Sequence[str]],
+    relevant: Sequence[Iterable[str]],
+    k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Build a binary hit matrix from ranked retrieval labels.
+
+    Only the first occurrence of each relevant label counts as a hit, so
+    several chunks of one relevant document do not inflate recall.
+
+    Args:
+        retrieved: Per query, ranked labels of retrieved items (e.g. source_file)
+        relevant: Per query, the set of relevant labels
+        k: Rank cutoff (rows are padded/truncated to k)
+
+    Returns:
+        Tuple of (hits of shape (n_queries, k), n_relevant of shape (n_queries,))
+    """
+    hits = np.zeros((len(retrieved), k), dtype=bool)
+    n_relevant = np.zeros(len(retrieved), dtype=np.int64)
+
+    for row, (ranked, labels) in enumerate(zip(retrieved, relevant)):
+        labels = set(labels)
+        n_relevant[row] = len(labels)
+        seen = set()
+        for rank, label in enumerate(ranked[:k]):
+            if label in labels and label not in seen:
+                hits[row, rank] = True
+                seen.add(label)
+
+    return hits, n_relevant
+
+
+def per_query_metrics(
+    hits: np.ndarray,
+    n_relevant: np.ndarray,
+    ks: Sequence[int] = (1, 3, 5, 10)
+) -> Dict[str, np.ndarray]:
+    """
+    Compute recall@k, precision@k, nDCG@k and MRR for every query at once.
+
+    Args:
+        hits: Binary hit matrix of shape (n_queries, max_k)
+        n_relevant: Number of relevant labels per query
+        ks: Rank cutoffs (clipped to the hit matrix width)
+
+    Returns:
+        Dictionary mapping metric name to an array of shape (n_queries,)
+    """
+    hits = np.asarray(hits, dtype=np.float64)
+    n_relevant = np.asarray(n_relevant, dtype=np.float64)
+    n_queries, max_k = hits.shape
+    safe_relevant = np.maximum(n_relevant, 1.0)
+
+    cumulative_hits = np.cumsum(hits, axis=1)
+    discounts = 1.0 / np.log2(np.arange(2, max_k + 2))
+    dcg = np.cumsum(hits * discounts, axis=1)
+    ideal_dcg = np.cumsum(discounts)
+
+    metrics = {}
+    for k in sorted({min(k, max_k) for k in ks if k > 0}):
+        metrics[f"recall@{k}"] = cumulative_hits[:, k - 1] / safe_relevant
+        metrics[f"precision@{k}"] = cumulative_hits[:, k - 1] / k
+        # Ideal ranking puts min(n_relevant, k) hits first
+        n_ideal = np.clip(n_relevant, 0, k).astype(np.int64)
+        idcg = np.where(n_ideal > 0, ideal_dcg[np.maximum(n_ideal - 1, 0)], 1.0)
+        metrics[f"ndcg@{k}"] = dcg[:, k - 1] / idcg
+
+    first_hit = np.argmax(hits > 0, axis=1)
+    any_hit = hits.any(axis=1) if max_k else np.zeros(n_queries, dtype=bool)
+    metrics["mrr"] = np.where(any_hit, 1.0 / (first_hit + 1), 0.0)
+
+    return metrics
+
+
+def retrieval_metrics(
+    retrieved: Sequence[Sequence[str]],
+    relevant: Sequence[Iterable[str]],
+    ks: Sequence[int] = (1, 3, 5, 10)
+) -> Dict[str, float]:
+    """
+    Mean retrieval metrics over a labelled query set.
+
+    Args:
+        retrieved: Per query, ranked labels of retrieved items
+        relevant: Per query, the set of relevant labels
+        ks: Rank cutoffs
+
+    Returns:
+        Dictionary mapping metric name to its mean across queries
+    """
+    hits, n_relevant = relevance_matrix(retrieved, relevant, max(ks))
+    # Queries without any relevant label cannot be scored
+    labelled = n_relevant > 0
+    metrics = per_query_metrics(hits[labelled], n_relevant[labelled], ks)
+    return {name: float(values.mean()) if len(values) else 0.0 for name, values in metrics.items()}
+
+
+def grounding_overlap(
+    answers: Sequence[str],
+    contexts: Sequence[Sequence[str]]
+) -> np.ndarray:
+    """
+    Fraction of each answer's distinct tokens that appear in its grounding context.
+
+    All responses are scored in one pass: tokens are mapped to integer ids and
+    membership is resolved with a single np.isin over (response, token) pairs.
+
+    Args:
+        answers: Answer texts
+        contexts: Per answer, the retrieved or cited context texts
+
+    Returns:
+        Array of overlap scores in [0, 1] (0 for empty answers)
+    """
+    vocabulary: Dict[str, int] = {}
+
+    def token_ids(text: str) -> List[int]:
+        return [
+            vocabulary.setdefault(token, len(vocabulary))
+            for token in _TOKEN_PATTERN.findall(text.lower())
+        ]
+
+    answer_rows, answer_tokens = [], []
+    context_rows, context_tokens = [], []
+    for row, (answer, context) in enumerate(zip(answers, contexts)):
+        ids = token_ids(answer or "")
+        answer_rows.extend([row] * len(ids))
+        answer_tokens.extend(ids)
+        ids = token_ids(" ".join(context or []))
+        context_rows.extend([row] * len(ids))
+        context_tokens.extend(ids)
+
+    n_answers = len(answers)
+    width = max(len(vocabulary), 1)
+    answer_pairs = np.unique(np.asarray(answer_rows, dtype=np.int64) * width +
+                             np.asarray(answer_tokens, dtype=np.int64))
+    context_pairs = np.unique(np.asarray(context_rows, dtype=np.int64) * width +
+                              np.asarray(context_tokens, dtype=np.int64))
+
+    covered = np.isin(answer_pairs, context_pairs, assume_unique=True)
+    rows = answer_pairs // width
+    totals = np.bincount(rows, minlength=n_answers)
+    hits = np.bincount(rows, weights=covered, minlength=n_answers)
+
+    return np.divide(hits, totals, out=np.zeros(n_answers), where=totals > 0)
+
+
+def gfs_grounding_texts(citations: Optional[CitationSet]) -> List[str]:
+    """
+    Collect grounding chunk texts from GFSClient.extract_citations() output.
+
+    Args:
+        citations: CitationSet returned by extract_citations (or None)
+
+    Returns:
+        List of retrieved context texts
+    """
+    if citations is None:
+        return []
+    return [source.text for source in citations.sources if source.text]
+
+
+def evaluate_collection(
+    collection,
+    encoder,
+    query_set: Sequence[Dict],
+    top_k: int = 10,
+    relevance_key: str = "source_file",
+    ks: Sequence[int] = (1, 3, 5, 10),
+    batch_size: int = 256,
+    metadata_filter: Optional[Union[str, Dict]] = None,
+    query_embeddings: Optional[np.ndarray] = None
+) -> Dict:
+    """
+    Evaluate retrieval quality of a Chroma collection against a labelled query set.
+
+    Queries are embedded in one encode() call (use a CachedEncoder so sweeps
+    reuse embeddings) and searched in batches of batch_size.
+
+    Args:
+        collection: Chroma collection to search
+        encoder: Object with encode(texts, show_progress_bar=False)
+        query_set: Items with "query_id", "query" and "relevant" (labels)
+        top_k: Results retrieved per query
+        relevance_key: Metadata field compared with labels, or "id" for chunk IDs
+        ks: Rank cutoffs (clipped to top_k)
+        batch_size: Queries per Chroma query call (1 gives exact per-query latency)
+        metadata_filter: Filter expression or Chroma where dict
+        query_embeddings: Precomputed query embeddings (skips the encoder)
+
+    Returns:
+        Dictionary with mean "metrics", "per_query" arrays, "query_ids" and
+        search "latency" (mean and p95 milliseconds per query)
+    """
+    queries = [item["query"] for item in query_set]
+    if query_embeddings is None:
+        query_embeddings = encoder.encode(queries, show_progress_bar=False)
+    embeddings = np.asarray(query_embeddings)
+    where = to_chroma_where(metadata_filter)
+
+    include = [] if relevance_key == "id" else ["metadatas"]
+    retrieved: List[List[str]] = []
+    query_ms = np.zeros(len(queries))
+    for start in range(0, len(queries), batch_size):
+        batch = embeddings[start:start + batch_size]
+        batch_start = time.perf_counter()
+        results = collection.query(
+            query_embeddings=batch.tolist(),
+            n_results=top_k,
+            where=where,
+            include=include
+        )
+        query_ms[start:start + len(batch)] = (
+            (time.perf_counter() - batch_start) * 1000 / len(batch)
+        )
+
+        if relevance_key == "id":
+            retrieved.extend(results["ids"])
+        else:
+            retrieved.extend(
+                [str(m.get(relevance_key)) for m in metadatas]
+                for metadatas in results["metadatas"]
+            )
+
+    ks = [k for k in ks if k <= top_k] or [top_k]
+    hits, n_relevant = relevance_matrix(
+        retrieved, [[str(label) for label in item["relevant"]] for item in query_set], top_k
+    )
+    per_query = per_query_metrics(hits, n_relevant, ks)
+    labelled = n_relevant > 0
+
+    return {
+        "metrics": {
+            name: float(values[labelled].mean()) if labelled.any() else 0.0
+            for name, values in per_query.items()
+        },
+        "per_query": per_query,
+        "query_ids": [item.get("query_id") for item in query_set],
+        "latency": {
+            "mean_query_ms": float(query_ms.mean()) if len(query_ms) else 0.0,
+            "p95_query_ms": float(np.percentile(query_ms, 95)) if len(query_ms) else 0.0,
+        },
+    }
+
+
+def evaluate_retrieval(rag, query_set: Sequence[Dict], **kwargs) -> Dict:
+    """
+    Evaluate CustomRAG retrieval quality against a labelled query set.
+
+    Args:
+        rag: CustomRAG instance with a collection
+        query_set: Items with "query_id", "query" and "relevant" (labels)
+        **kwargs: Additional arguments for evaluate_collection(); a given
+            query_embeddings is used instead of encoding the queries
+
+    Returns:
+        Dictionary with mean "metrics", "per_query" arrays, "query_ids" and "latency"
+    """
+    if rag.collection is None:
+        raise ValueError("Collection not created.")
+    query_embeddings = kwargs.pop("query_embeddings", None)
+    if query_embeddings is None:
+        query_embeddings = rag.encode_queries([item["query"] for item in query_set])
+    return evaluate_collection(
+        rag.collection,
+        rag.embedding_model,
+        query_set,
+        query_embeddings=query_embeddings,
+        **kwargs
+    )
+
+
+def metrics_table(evaluations: Dict[str, Dict], **columns) -> pl.DataFrame:
+    """
+    Tabulate mean metrics of several configurations side by side.
+
+    Args:
+        evaluations: Mapping of configuration label to evaluate_retrieval() output
+        **columns: Extra constant columns (e.g. model="all-MiniLM-L6-v2")
+
+    Returns:
+        DataFrame with one row per configuration
+    """
+    return pl.DataFrame([
+        {"config": label, **columns, **evaluation["metrics"]}
+        for label, evaluation in evaluations.items()
+    ])
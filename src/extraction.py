@@ -0,0 +1,317 @@
+"""Multi-format document extraction into text segments with provenance"""
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import polars as pl
+
+from data_loader import compute_file_hash, load_text_file
+
+# Bump when extractor output changes so cached segments are not reused
+EXTRACTOR_VERSION = 1
+
+
+def _segment(text: str, **provenance) -> Dict:
+    """Build a segment dict, dropping empty provenance fields."""
+    return {
+        "text": text,
+        "metadata": {k: v for k, v in provenance.items() if v is not None},
+    }
+
+
+def render_rows(
+    df: pl.DataFrame,
+    rows_per_segment: int,
+    row_offset: int = 0,
+    **provenance
+) -> List[Dict]:
+    """
+    Render table rows as "column: value" lines, grouped into segments.
+
+    Rendering is done with Polars expressions, so large batches never
+    round-trip through Python row tuples.
+
+    Args:
+        df: Table to render
+        rows_per_segment: Rows grouped into each segment
+        row_offset: Row number of the first row of df in the source table
+        **provenance: Extra metadata added to every segment (e.g. sheet)
+
+    Returns:
+        Segments with "row_start" / "row_end" provenance
+    """
+    if df.height == 0 or not df.columns:
+        return []
+
+    cells = [
+        pl.when(pl.col(column).cast(pl.String).str.len_chars() > 0)
+        .then(pl.lit(f"{column}: ") + pl.col(column).cast(pl.String))
+        for column in df.columns
+    ]
+    grouped = (
+        df.lazy()
+        .select(
+            (pl.int_range(pl.len()) // rows_per_segment).alias("_group"),
+            pl.concat_str(cells, separator="; ", ignore_nulls=True).alias("_line"),
+        )
+        .group_by("_group", maintain_order=True)
+        .agg(
+            pl.col("_line").filter(pl.col("_line").str.len_chars() > 0).str.join("\n"),
+            pl.len().alias("_rows"),
+        )
+        .collect()
+    )
+
+    segments = []
+    for group, text, rows in grouped.iter_rows():
+        if text:
+            start = row_offset + group * rows_per_segment
+            segments.append(_segment(
+                text,
+                row_start=start,
+                row_end=start + rows - 1,
+                **provenance
+            ))
+
+    return segments
+
+
+def _extract_text(file_path: Path, rows_per_segment: int) -> List[Dict]:
+    return [_segment(load_text_file(file_path))]
+
+
+def _extract_pdf(file_path: Path, rows_per_segment: int) -> List[Dict]:
+    try:
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise ImportError("PDF extraction requires pypdf: uv add pypdf") from e
+
+    reader = PdfReader(str(file_path))
+    return [
+        _segment(text, page=page_number)
+        for page_number, page in enumerate(reader.pages, start=1)
+        if (text := (page.extract_text() or "").strip())
+    ]
+
+
+def _unique_columns(header: List[str]) -> List[str]:
+    """Fill blank column names and suffix repeats (_2, _3, ...) so they are unique."""
+    columns: List[str] = []
+    for i, name in enumerate(header):
+        base = name or f"column_{i}"
+        column, n = base, 1
+        while column in columns:
+            n += 1
+            column = f"{base}_{n}"
+        columns.append(column)
+    return columns
+
+
+def _extract_docx(file_path: Path, rows_per_segment: int) -> List[Dict]:
+    try:
+        import docx
+    except ImportError as e:
+        raise ImportError("DOCX extraction requires python-docx: uv add python-docx") from e
+
+    document = docx.Document(str(file_path))
+    segments = []
+
+    paragraphs = [p.text for p in document.paragraphs if p.text.strip()]
+    if paragraphs:
+        segments.append(_segment("\n".join(paragraphs), section="body"))
+
+    for table_index, table in enumerate(document.tables):
+        rows = [[cell.text.strip() for cell in row.cells] for row in table.rows]
+        if len(rows) < 2:
+            continue
+        # Merged header cells repeat their text in every cell they span
+        header = _unique_columns(rows[0])
+        df = pl.DataFrame(rows[1:], schema=header, orient="row")
+        segments.extend(render_rows(df, rows_per_segment, table=table_index))
+
+    return segments
+
+
+def _extract_excel(file_path: Path, rows_per_segment: int) -> List[Dict]:
+    # sheet_id=0 loads every sheet as {sheet_name: DataFrame}
+    sheets = pl.read_excel(file_path, sheet_id=0)
+    segments = []
+    for sheet_name, df in sheets.items():
+        segments.extend(render_rows(df, rows_per_segment, sheet=sheet_name))
+    return segments
+
+
+def _extract_csv(file_path: Path, rows_per_segment: int) -> List[Dict]:
+    df = pl.read_csv(file_path, infer_schema=False)
+    return render_rows(df, rows_per_segment)
+
+
+def _extract_json(file_path: Path, rows_per_segment: int) -> List[Dict]:
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    # Arrays of flat records are tabular; anything else is kept as text
+    if isinstance(data, list) and data and all(isinstance(r, dict) for r in data):
+        records = [
+            {k: v if isinstance(v, (str, int, float, bool)) or v is None
+             else json.dumps(v, ensure_ascii=False)
+             for k, v in record.items()}
+            for record in data
+        ]
+        df = pl.DataFrame(records, infer_schema_length=None).cast(pl.String)
+        return render_rows(df, rows_per_segment)
+
+    return [_segment(json.dumps(data, indent=1, ensure_ascii=False))]
+
+
+EXTRACTORS: Dict[str, Callable[[Path, int], List[Dict]]] = {
+    ".txt": _extract_text,
+    ".md": _extract_text,
+    ".pdf": _extract_pdf,
+    ".docx": _extract_docx,
+    ".xlsx": _extract_excel,
+    ".xls": _extract_excel,
+    ".csv": _extract_csv,
+    ".json": _extract_json,
+}
+
+
+def extract_document(file_path: Path, rows_per_segment: int = 50) -> List[Dict]:
+    """
+    Extract a document into text segments carrying provenance.
+
+    Each segment is {"text": str, "metadata": {...}} where metadata holds
+    "page" (PDF), "sheet" (Excel), "table" (DOCX) and/or "row_start" /
+    "row_end" (tabular formats), as applicable.
+
+    Args:
+        file_path: Path to document
+        rows_per_segment: Table rows rendered per segment
+
+    Returns:
+        List of segments in document order
+
+    Raises:
+        ValueError: If the file format is not supported
+    """
+    file_path = Path(file_path)
+    extractor = EXTRACTORS.get(file_path.suffix.lower())
+    if extractor is None:
+        raise ValueError(f"Unsupported format for extraction: {file_path.suffix}")
+    return extractor(file_path, rows_per_segment)
+
+
+class ExtractionCache:
+    """On-disk cache of extracted segments keyed by file content hash"""
+
+    def __init__(self, cache_dir: Path):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding one JSON file per extracted document
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, file_hash: str, rows_per_segment: int) -> Path:
+        return self.cache_dir / f"{file_hash}_v{EXTRACTOR_VERSION}_r{rows_per_segment}.json"
+
+    def get(self, file_hash: str, rows_per_segment: int) -> Optional[List[Dict]]:
+        """
+        Get cached segments for a file hash.
+
+        Args:
+            file_hash: SHA-256 from compute_file_hash()
+            rows_per_segment: Table rows per segment used at extraction
+
+        Returns:
+            Cached segments, or None on a miss
+        """
+        path = self._path(file_hash, rows_per_segment)
+        if not path.exists():
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, file_hash: str, rows_per_segment: int, segments: List[Dict]) -> None:
+        """
+        Store extracted segments for a file hash.
+
+        Args:
+            file_hash: SHA-256 from compute_file_hash()
+            rows_per_segment: Table rows per segment used at extraction
+            segments: Segments returned by extract_document()
+        """
+        path = self._path(file_hash, rows_per_segment)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(segments, f, ensure_ascii=False)
+        tmp_path.replace(path)
+
+
+def _extract_worker(file_path: str, rows_per_segment: int) -> Dict:
+    """Process-pool entry point; returns errors instead of raising."""
+    try:
+        return {"segments": extract_document(Path(file_path), rows_per_segment)}
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def extract_documents(
+    file_paths: Iterable[Path],
+    cache_dir: Optional[Path] = None,
+    max_workers: Optional[int] = None,
+    rows_per_segment: int = 50
+) -> Dict[str, Dict]:
+    """
+    Extract many documents across a process pool, reusing cached results.
+
+    Args:
+        file_paths: Paths to documents
+        cache_dir: Directory for the extraction cache (no caching if None)
+        max_workers: Worker processes (defaults to the CPU count)
+        rows_per_segment: Table rows rendered per segment
+
+    Returns:
+        Dictionary mapping file path to {"segments", "file_hash", "cached"}
+        on success or {"error", "file_hash"} on failure
+    """
+    cache = ExtractionCache(cache_dir) if cache_dir else None
+    results = {}
+    pending = {}
+
+    for file_path in file_paths:
+        file_path = str(file_path)
+        file_hash = compute_file_hash(Path(file_path))
+        cached = cache.get(file_hash, rows_per_segment) if cache else None
+
+        if cached is not None:
+            results[file_path] = {"segments": cached, "file_hash": file_hash, "cached": True}
+        else:
+            pending[file_path] = file_hash
+
+    if pending:
+        workers = min(max_workers or os.cpu_count() or 1, len(pending))
+        # Spawned, not forked: callers already run Chroma and upload threads
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            outputs = executor.map(
+                _extract_worker,
+                list(pending),
+                [rows_per_segment] * len(pending)
+            )
+            for file_path, output in zip(pending, outputs):
+                file_hash = pending[file_path]
+                if "segments" in output:
+                    if cache:
+                        cache.put(file_hash, rows_per_segment, output["segments"])
+                    output["cached"] = False
+                results[file_path] = {**output, "file_hash": file_hash}
+
+    return results
@@ -0,0 +1,151 @@
+"""Metadata filter expressions shared by the GFS and custom RAG backends"""
+
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+# Comparison operators of the GFS filter syntax and their Chroma equivalents
+_OPERATORS = {
+    "=": "$eq",
+    "!=": "$ne",
+    "<": "$lt",
+    "<=": "$lte",
+    ">": "$gt",
+    ">=": "$gte",
+}
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<op><=|>=|!=|=|<|>)
+      | (?P<paren>[()])
+      | (?P<word>[A-Za-z_][A-Za-z0-9_.\-]*)
+    )
+    """,
+    re.VERBOSE,
+)
+
+Token = Tuple[str, Union[str, int, float]]
+
+
+def _tokenize(expression: str) -> List[Token]:
+    """Split a filter expression into (kind, value) tokens."""
+    tokens = []
+    position = 0
+    expression = expression.strip()
+
+    while position < len(expression):
+        match = _TOKEN_PATTERN.match(expression, position)
+        if not match or match.end() == position:
+            raise ValueError(
+                f"Invalid metadata filter near: {expression[position:position + 20]!r}"
+            )
+        position = match.end()
+
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "string":
+            tokens.append(("value", re.sub(r"\\(.)", r"\1", text[1:-1])))
+        elif kind == "number":
+            tokens.append(("value", float(text) if "." in text else int(text)))
+        elif kind == "word" and text.upper() in ("AND", "OR"):
+            tokens.append(("logic", text.upper()))
+        elif kind == "word" and text.lower() in ("true", "false"):
+            tokens.append(("value", text.lower() == "true"))
+        else:
+            tokens.append((kind, text))
+
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser producing a Chroma ``where`` clause."""
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Optional[Token]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, kind: str) -> Union[str, int, float]:
+        token = self.peek()
+        if token is None or token[0] != kind:
+            raise ValueError(f"Invalid metadata filter: expected {kind}, got {token}")
+        self.position += 1
+        return token[1]
+
+    def parse(self) -> Dict:
+        clause = self.parse_logic("OR")
+        if self.peek() is not None:
+            raise ValueError(f"Invalid metadata filter: unexpected {self.peek()}")
+        return clause
+
+    def parse_logic(self, operator: str) -> Dict:
+        # AND binds tighter than OR
+        parse_operand = self.parse_logic_and if operator == "OR" else self.parse_comparison
+        clauses = [parse_operand()]
+
+        while self.peek() == ("logic", operator):
+            self.position += 1
+            clauses.append(parse_operand())
+
+        if len(clauses) == 1:
+            return clauses[0]
+        return {f"${operator.lower()}": clauses}
+
+    def parse_logic_and(self) -> Dict:
+        return self.parse_logic("AND")
+
+    def parse_comparison(self) -> Dict:
+        if self.peek() == ("paren", "("):
+            self.position += 1
+            clause = self.parse_logic("OR")
+            if self.peek() != ("paren", ")"):
+                raise ValueError(f"Invalid metadata filter: expected ')', got {self.peek()}")
+            self.position += 1
+            return clause
+
+        key = self.take("word")
+        operator = self.take("op")
+        value = self.take("value")
+        return {key: {_OPERATORS[operator]: value}}
+
+
+def parse_metadata_filter(expression: str) -> Dict:
+    """
+    Translate a GFS metadata filter expression into a Chroma ``where`` clause.
+
+    Supports comparisons (=, !=, <, <=, >, >=) between a metadata key and a
+    quoted string, number or boolean, combined with AND / OR and parentheses,
+    e.g. ``department = "hr" AND (year >= 2024 OR source_file = "faq.md")``.
+
+    Args:
+        expression: Filter expression in GFS syntax
+
+    Returns:
+        Equivalent Chroma where dictionary
+
+    Raises:
+        ValueError: If the expression cannot be parsed
+    """
+    tokens = _tokenize(expression)
+    if not tokens:
+        raise ValueError("Metadata filter expression is empty")
+    return _Parser(tokens).parse()
+
+
+def to_chroma_where(metadata_filter: Optional[Union[str, Dict]]) -> Optional[Dict]:
+    """
+    Normalize a metadata filter for Chroma queries.
+
+    Args:
+        metadata_filter: GFS filter expression, Chroma where dict, or None
+
+    Returns:
+        Chroma where dict, or None for no filtering
+    """
+    if metadata_filter is None or isinstance(metadata_filter, dict):
+        return metadata_filter or None
+    return parse_metadata_filter(metadata_filter)
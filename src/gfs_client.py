@@ -1,26 +1,75 @@
 """Google Generative File Search (GFS) client wrapper"""
 
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, List
+from typing import Callable, Iterable, Iterator, Optional, List, Dict, Tuple, Union
 
 from google import genai
-from google.genai import types
+from google.genai import pagers, types
+
+from citations import CitationSet, SourceResolver, parse_grounding
+from prompt_cache import PromptCache, prefix_key
+from rate_limit import PRIORITY_BULK, RateLimiter, estimate_tokens
+
+# Quota key for store management and uploads (generation uses the model name)
+FILE_SEARCH_QUOTA_KEY = "file_search"
 
 
 class GFSClient:
     """Wrapper for Google Generative File Search API"""
 
-    def __init__(self, api_key: str, model_id: str = "gemini-2.5-flash"):
+    def __init__(
+        self,
+        api_key: Optional[str],
+        model_id: str = "gemini-2.5-flash",
+        client: Optional[genai.Client] = None,
+        prompt_cache: Optional[PromptCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_tools: int = 256
+    ):
         """
         Initialize GFS client.
 
         Args:
-            api_key: Google API key
+            api_key: Google API key (unused when client is given)
             model_id: Gemini model to use
+            client: Shared genai.Client to reuse
+            prompt_cache: Gemini context cache for system instruction + tool prefixes
+            rate_limiter: Shared limiter applying quotas and retries to API calls
+            max_tools: File search tool configs kept (least recently used evicted)
         """
-        self.client = genai.Client(api_key=api_key)
+        if prompt_cache is not None and prompt_cache.model != model_id:
+            raise ValueError(f"prompt_cache is for model {prompt_cache.model}, not {model_id}")
+
+        self.client = client or genai.Client(api_key=api_key)
         self.model_id = model_id
+        self.prompt_cache = prompt_cache
+        self.rate_limiter = rate_limiter
+        self.max_tools = max_tools
+        # Shared by query threads and bulk deletes
+        self._tools: "OrderedDict[Tuple, types.Tool]" = OrderedDict()
+        self._tools_lock = threading.Lock()
+        # Grounding chunk title -> store document, listed once per store
+        self.sources = SourceResolver(self.iter_store_documents)
+
+    def _call(
+        self,
+        fn: Callable,
+        *args,
+        quota_key: str = FILE_SEARCH_QUOTA_KEY,
+        tokens: int = 0,
+        priority: Optional[int] = None,
+        **kwargs
+    ):
+        """Run an API call through the rate limiter, if one is configured."""
+        if self.rate_limiter is None:
+            return fn(*args, **kwargs)
+        return self.rate_limiter.call(
+            fn, *args, quota_key=quota_key, tokens=tokens, priority=priority, **kwargs
+        )
 
     def create_file_search_store(self, display_name: str) -> types.FileSearchStore:
         """
@@ -32,7 +81,8 @@ class GFSClient:
         Returns:
             FileSearchStore object
         """
-        store = self.client.file_search_stores.create(
+        store = self._call(
+            self.client.file_search_stores.create,
             config=types.CreateFileSearchStoreConfig(display_name=display_name)
         )
         return store
@@ -61,15 +111,17 @@ class GFSClient:
             mime_type=mime_type
         )
 
-        file_obj = self.client.files.upload(
+        file_obj = self._call(
+            self.client.files.upload,
             file=str(file_path),
-            config=config
+            config=config,
+            priority=PRIORITY_BULK
         )
 
         # Wait for processing
         while file_obj.state.name == "PROCESSING":
             time.sleep(2)
-            file_obj = self.client.files.get(name=file_obj.name)
+            file_obj = self._call(self.client.files.get, name=file_obj.name, priority=PRIORITY_BULK)
 
         return file_obj
 
@@ -77,7 +129,8 @@ class GFSClient:
         self,
         store_name: str,
         file_path: Path,
-        wait_for_completion: bool = True
+        wait_for_completion: bool = True,
+        custom_metadata: Optional[Dict[str, Union[str, int, float]]] = None
     ) -> types.Operation:
         """
         Upload file to a file search store.
@@ -86,15 +139,30 @@ class GFSClient:
             store_name: Name of the store
             file_path: Path to file
             wait_for_completion: Whether to wait for upload to complete
+            custom_metadata: Key/value metadata usable in query metadata filters
 
         Returns:
             Operation object
         """
+        config = None
+        if custom_metadata:
+            config = types.UploadToFileSearchStoreConfig(
+                custom_metadata=[
+                    types.CustomMetadata(key=key, numeric_value=value)
+                    if isinstance(value, (int, float)) and not isinstance(value, bool)
+                    else types.CustomMetadata(key=key, string_value=str(value))
+                    for key, value in custom_metadata.items()
+                ]
+            )
+
         # Directly upload to the store using the file path
         # This handles both uploading to File API and adding to Store
-        operation = self.client.file_search_stores.upload_to_file_search_store(
+        operation = self._call(
+            self.client.file_search_stores.upload_to_file_search_store,
             file_search_store_name=store_name,
-            file=str(file_path)
+            file=str(file_path),
+            config=config,
+            priority=PRIORITY_BULK
         )
 
         if wait_for_completion:
@@ -104,13 +172,16 @@ class GFSClient:
             while not operation.done and attempts < max_attempts:
                 time.sleep(2)
                 attempts += 1
-                operation = self.client.operations.get(operation)
+                operation = self._call(
+                    self.client.operations.get, operation, priority=PRIORITY_BULK
+                )
 
             if not operation.done:
                 raise TimeoutError(
                     f"Timeout esperando indexación después de {max_attempts * 2} segundos"
                 )
 
+        self.sources.invalidate(store_name)
         return operation
 
     def query_with_file_search(
@@ -119,58 +190,197 @@ class GFSClient:
         store_names: List[str],
         temperature: float = 0.0,
         top_k: Optional[int] = None,
-        metadata_filter: Optional[str] = None
+        metadata_filter: Optional[str] = None,
+        system_instruction: Optional[str] = None
     ) -> types.GenerateContentResponse:
         """
         Query using file search tool.
 
+        With a prompt cache, the system instruction and tool config are sent
+        once as cached content and reused by later queries with the same setup.
+
         Args:
             query: User query
             store_names: List of file search store names to query
             temperature: Generation temperature (0.0 for factual)
-            top_k: Maximum number of results to return
-            metadata_filter: Filter expression for metadata
+            top_k: Maximum number of retrieved chunks passed to the model
+            metadata_filter: Filter expression for metadata, e.g.
+                'department = "hr" AND year >= 2024' (same syntax as CustomRAG)
+            system_instruction: Instruction prepended to every query
 
         Returns:
             GenerateContentResponse with answer and grounding
         """
         if not store_names:
             raise ValueError("At least one store name must be provided")
-        
-        # Configure the tool correctly using types.Tool and types.FileSearch
-        tool = types.Tool(
-            file_search=types.FileSearch(
-                file_search_store_names=store_names
+
+        tool_key = (tuple(store_names), top_k, metadata_filter)
+        with self._tools_lock:
+            tool = self._tools.get(tool_key)
+            if tool is None:
+                # Configure the tool correctly using types.Tool and types.FileSearch
+                tool = types.Tool(
+                    file_search=types.FileSearch(
+                        file_search_store_names=store_names,
+                        top_k=top_k,
+                        metadata_filter=metadata_filter
+                    )
+                )
+                self._tools[tool_key] = tool
+                while len(self._tools) > self.max_tools:
+                    self._tools.popitem(last=False)
+            else:
+                self._tools.move_to_end(tool_key)
+
+        cached_content = None
+        if self.prompt_cache is not None and system_instruction:
+            cached_content = self.prompt_cache.get(
+                prefix_key(self.model_id, system_instruction, *map(str, tool_key)),
+                system_instruction=system_instruction,
+                tools=[tool],
+                model=self.model_id
+            )
+
+        if cached_content:
+            config = types.GenerateContentConfig(
+                temperature=temperature,
+                cached_content=cached_content
+            )
+        else:
+            config = types.GenerateContentConfig(
+                tools=[tool],
+                temperature=temperature,
+                system_instruction=system_instruction
             )
-        )
 
         # Generate response
-        response = self.client.models.generate_content(
+        response = self._call(
+            self.client.models.generate_content,
             model=self.model_id,
             contents=query,
-            config=types.GenerateContentConfig(
-                tools=[tool],
-                temperature=temperature
-            )
+            config=config,
+            quota_key=self.model_id,
+            tokens=estimate_tokens(system_instruction, query)
         )
 
         return response
 
+    def _iter_pages(
+        self,
+        list_page: Callable[[Dict], "pagers.Pager"],
+        page_size: int,
+        limit: Optional[int],
+        prefetch: bool
+    ) -> Iterator:
+        """
+        Lazily yield items from a paginated list call.
+
+        Args:
+            list_page: Function taking a list config and returning a Pager
+            page_size: Items requested per page
+            limit: Stop after this many items (None for all)
+            prefetch: Fetch the next page in the background while the
+                current one is being consumed
+
+        Yields:
+            Items in API order
+        """
+        if limit is not None and limit <= 0:
+            return
+
+        pager = self._call(list_page, {"page_size": page_size})
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        yielded = 0
+
+        try:
+            while True:
+                page = list(pager.page)
+                has_next = bool(pager.config.get("page_token"))
+
+                next_page = None
+                if has_next and executor is not None:
+                    next_page = executor.submit(self._call, pager.next_page)
+
+                for item in page:
+                    yield item
+                    yielded += 1
+                    if limit is not None and yielded >= limit:
+                        return
+
+                if not has_next:
+                    return
+
+                if next_page is not None:
+                    next_page.result()
+                else:
+                    self._call(pager.next_page)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_stores(
+        self,
+        page_size: int = 20,
+        limit: Optional[int] = None,
+        prefetch: bool = False
+    ) -> Iterator[types.FileSearchStore]:
+        """
+        Lazily iterate over file search stores, one page at a time.
+
+        Args:
+            page_size: Stores requested per page (API maximum is 20)
+            limit: Stop after this many stores (None for all)
+            prefetch: Fetch the next page while the current one is consumed
+
+        Yields:
+            FileSearchStore objects
+        """
+        return self._iter_pages(
+            lambda config: self.client.file_search_stores.list(config=config),
+            page_size,
+            limit,
+            prefetch
+        )
+
+    def iter_store_documents(
+        self,
+        store_name: str,
+        page_size: int = 20,
+        limit: Optional[int] = None,
+        prefetch: bool = False
+    ) -> Iterator[types.Document]:
+        """
+        Lazily iterate over the documents of a file search store.
+
+        Args:
+            store_name: Name of the store
+            page_size: Documents requested per page (API maximum is 20)
+            limit: Stop after this many documents (None for all)
+            prefetch: Fetch the next page while the current one is consumed
+
+        Yields:
+            Document objects
+        """
+        return self._iter_pages(
+            lambda config: self.client.file_search_stores.documents.list(
+                parent=store_name,
+                config=config
+            ),
+            page_size,
+            limit,
+            prefetch
+        )
+
     def list_stores(self) -> List[types.FileSearchStore]:
         """
         List all file search stores.
 
+        Prefer iter_stores() for large accounts; this materializes every page.
+
         Returns:
             List of FileSearchStore objects
         """
-        stores = []
-        # list() returns an iterator/generator
-        response = self.client.file_search_stores.list()
-
-        for store in response:
-            stores.append(store)
-
-        return stores
+        return list(self.iter_stores())
 
     def get_store_info(self, store_name: str) -> types.FileSearchStore:
         """
@@ -182,41 +392,130 @@ class GFSClient:
         Returns:
             FileSearchStore object with metadata
         """
-        return self.client.file_search_stores.get(name=store_name)
+        return self._call(self.client.file_search_stores.get, name=store_name)
 
-    def delete_store(self, store_name: str) -> None:
+    def delete_store(self, store_name: str, force: bool = False) -> None:
         """
         Delete a file search store.
 
         Args:
             store_name: Name of the store to delete
+            force: Also delete the documents the store still contains
         """
-        self.client.file_search_stores.delete(name=store_name)
+        config = types.DeleteFileSearchStoreConfig(force=True) if force else None
+        self._call(
+            self.client.file_search_stores.delete,
+            name=store_name,
+            config=config,
+            priority=PRIORITY_BULK
+        )
 
-    def extract_citations(
+        # Forget tool configs naming the deleted store
+        with self._tools_lock:
+            for tool_key in [key for key in self._tools if store_name in key[0]]:
+                del self._tools[tool_key]
+        self.sources.invalidate(store_name)
+
+    def delete_document(self, document_name: str, force: bool = True) -> None:
+        """
+        Delete a document from its file search store.
+
+        Args:
+            document_name: Full document name (fileSearchStores/*/documents/*)
+            force: Also delete the document's chunks
+        """
+        self._call(
+            self.client.file_search_stores.documents.delete,
+            name=document_name,
+            config=types.DeleteDocumentConfig(force=force),
+            priority=PRIORITY_BULK
+        )
+        self.sources.invalidate(document_name.split("/documents/")[0])
+
+    def _bulk(
+        self,
+        action: Callable[[str], None],
+        names: Iterable[str],
+        max_workers: int
+    ) -> Dict[str, Optional[str]]:
+        """Apply action to each name with bounded concurrency, collecting errors."""
+        def run(name: str) -> Optional[str]:
+            try:
+                action(name)
+                return None
+            except Exception as e:
+                return str(e)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            names = list(names)
+            return dict(zip(names, executor.map(run, names)))
+
+    def bulk_delete_documents(
         self,
-        response: types.GenerateContentResponse
-    ) -> Optional[dict]:
+        document_names: Iterable[str],
+        max_workers: int = 8,
+        force: bool = True
+    ) -> Dict[str, Optional[str]]:
         """
-        Extract grounding/citation information from response.
+        Delete many documents concurrently.
 
         Args:
-            response: GenerateContentResponse
+            document_names: Full document names to delete
+            max_workers: Maximum concurrent delete requests
+            force: Also delete each document's chunks
 
         Returns:
-            Dictionary with citation info or None
+            Dictionary mapping document name to error message (None on success)
         """
-        if not response.candidates:
-            return None
+        return self._bulk(
+            lambda name: self.delete_document(name, force=force),
+            document_names,
+            max_workers
+        )
 
-        candidate = response.candidates[0]
-        grounding = candidate.grounding_metadata
+    def bulk_delete_stores(
+        self,
+        store_names: Iterable[str],
+        max_workers: int = 4,
+        force: bool = True
+    ) -> Dict[str, Optional[str]]:
+        """
+        Delete many file search stores concurrently.
+
+        Args:
+            store_names: Names of the stores to delete
+            max_workers: Maximum concurrent delete requests
+            force: Also delete the documents each store contains
 
-        if not grounding:
-            return None
+        Returns:
+            Dictionary mapping store name to error message (None on success)
+        """
+        return self._bulk(
+            lambda name: self.delete_store(name, force=force),
+            store_names,
+            max_workers
+        )
 
-        return {
-            "search_entry_point": grounding.search_entry_point,
-            "grounding_chunks": grounding.grounding_chunks if hasattr(grounding, "grounding_chunks") else None,
-            "grounding_supports": grounding.grounding_supports if hasattr(grounding, "grounding_supports") else None,
-        }
+    def extract_citations(
+        self,
+        response: types.GenerateContentResponse,
+        store_names: Optional[List[str]] = None,
+        resolve: bool = False
+    ) -> CitationSet:
+        """
+        Extract grounding/citation information from response.
+
+        Args:
+            response: GenerateContentResponse
+            store_names: Stores that were searched
+            resolve: Resolve cited chunks to store documents (lists each
+                store's documents once, then serves them from cache)
+
+        Returns:
+            CitationSet; empty (falsy) when the answer is not grounded
+        """
+        return parse_grounding(
+            response,
+            store_names=store_names or (),
+            resolver=self.sources if resolve else None
+        )
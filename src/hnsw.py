@@ -0,0 +1,301 @@
+"""HNSW index parameters for Chroma collections and recall/latency auto-tuning"""
+
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Chroma's defaults; "M" and "construction_ef" are fixed once a collection is built
+DEFAULT_HNSW = {"space": "cosine", "M": 16, "construction_ef": 100, "search_ef": 100}
+
+# Parameter name -> Chroma HNSW configuration key
+_CONFIG_KEYS = {
+    "space": "space",
+    "M": "max_neighbors",
+    "construction_ef": "ef_construction",
+    "search_ef": "ef_search",
+}
+# Collection metadata keys written by tune_hnsw()
+TUNED_PREFIX = "hnsw_tuned_"
+
+
+def hnsw_configuration(params: Optional[Dict] = None) -> Dict:
+    """
+    Build a Chroma collection configuration from HNSW parameters.
+
+    Args:
+        params: Any of space, M, construction_ef, search_ef (others default)
+
+    Returns:
+        Configuration for create_collection(configuration=...)
+
+    Raises:
+        ValueError: On unknown parameter names
+    """
+    params = {**DEFAULT_HNSW, **(params or {})}
+    unknown = set(params) - set(_CONFIG_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown HNSW parameters: {sorted(unknown)}")
+    return {"hnsw": {_CONFIG_KEYS[name]: value for name, value in params.items()}}
+
+
+def hnsw_params(collection) -> Dict:
+    """
+    Read a collection's effective HNSW parameters.
+
+    Args:
+        collection: Chroma collection
+
+    Returns:
+        Dictionary with space, M, construction_ef and search_ef
+    """
+    configuration = (getattr(collection, "configuration", None) or {}).get("hnsw") or {}
+    metadata = collection.metadata or {}
+    params = {}
+    for name, key in _CONFIG_KEYS.items():
+        # Collections created with legacy "hnsw:*" metadata keep it there
+        value = configuration.get(key, metadata.get(f"hnsw:{name}"))
+        params[name] = DEFAULT_HNSW[name] if value is None else value
+    return params
+
+
+def exact_top_k(
+    embeddings: np.ndarray,
+    query_embeddings: np.ndarray,
+    k: int,
+    space: str = "cosine",
+    batch_size: int = 256
+) -> np.ndarray:
+    """
+    Brute-force nearest neighbours, the ground truth for recall.
+
+    Args:
+        embeddings: Indexed vectors, shape (n, dim)
+        query_embeddings: Query vectors, shape (q, dim)
+        k: Neighbours per query
+        space: "cosine", "l2" or "ip"
+        batch_size: Queries scored per matrix product
+
+    Returns:
+        Row indices into embeddings, shape (q, min(k, n)), nearest first
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+    if space == "cosine":
+        embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        query_embeddings = query_embeddings / np.maximum(
+            np.linalg.norm(query_embeddings, axis=1, keepdims=True), 1e-12
+        )
+    squared_norms = (embeddings ** 2).sum(axis=1) if space == "l2" else None
+
+    k = min(k, len(embeddings))
+    neighbours = []
+    for start in range(0, len(query_embeddings), batch_size):
+        scores = query_embeddings[start:start + batch_size] @ embeddings.T
+        if space == "l2":
+            # Rank by -||e||^2 + 2 q.e, equivalent to ascending L2 distance
+            scores = 2 * scores - squared_norms
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+        neighbours.append(np.take_along_axis(top, order, axis=1))
+    return np.concatenate(neighbours) if neighbours else np.empty((0, k), dtype=np.int64)
+
+
+def measure(
+    collection,
+    query_embeddings: np.ndarray,
+    truth: Sequence[set],
+    k: int
+) -> Tuple[float, float]:
+    """
+    Measure recall@k against exact search and per-query latency.
+
+    Args:
+        collection: Chroma collection to query
+        query_embeddings: Query vectors
+        truth: Exact top-k IDs of each query
+        k: Neighbours per query
+
+    Returns:
+        (mean recall@k, p95 latency in milliseconds)
+    """
+    # Warm-up: load the index before timing
+    collection.query(query_embeddings=query_embeddings[:1].tolist(), n_results=k, include=[])
+
+    recalls, latencies = [], []
+    for embedding, expected in zip(query_embeddings, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[embedding.tolist()], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(expected.intersection(result["ids"][0])) / max(len(expected), 1))
+    return float(np.mean(recalls)), float(np.percentile(latencies, 95))
+
+
+def _read_collection(collection, batch_size: int, include: List[str]) -> Dict[str, list]:
+    """Page through a whole collection."""
+    columns: Dict[str, list] = {"ids": [], **{name: [] for name in include}}
+    offset = 0
+    while True:
+        page = collection.get(limit=batch_size, offset=offset, include=include)
+        if not len(page["ids"]):
+            return columns
+        for name in columns:
+            columns[name].extend(page[name])
+        offset += len(page["ids"])
+
+
+def copy_collection(
+    chroma_client,
+    source,
+    name: str,
+    params: Dict,
+    metadata: Optional[Dict] = None,
+    batch_size: int = 5000,
+    include: Sequence[str] = ("documents", "metadatas", "embeddings")
+):
+    """
+    Rebuild a collection's vectors into a new collection with other HNSW parameters.
+
+    Args:
+        chroma_client: Chroma client
+        source: Collection to copy
+        name: Name of the new collection (replaced if it exists)
+        params: HNSW parameters of the new collection
+        metadata: Metadata of the new collection
+        batch_size: Chunks copied per call
+        include: Fields copied besides IDs (embeddings are always copied)
+
+    Returns:
+        The new collection
+    """
+    include = sorted(set(include) | {"embeddings"})
+    try:
+        chroma_client.delete_collection(name=name)
+    except Exception:
+        pass
+    target = chroma_client.create_collection(
+        name=name,
+        metadata=metadata or None,
+        configuration=hnsw_configuration(params)
+    )
+
+    offset = 0
+    while True:
+        page = source.get(limit=batch_size, offset=offset, include=include)
+        if not len(page["ids"]):
+            return target
+        target.add(ids=page["ids"], **{field: page[field] for field in include})
+        offset += len(page["ids"])
+
+
+def tune_hnsw(
+    chroma_client,
+    collection,
+    query_embeddings: np.ndarray,
+    k: int = 10,
+    target_recall: float = 0.95,
+    m_values: Sequence[int] = (8, 16, 32, 48),
+    ef_values: Sequence[int] = (16, 32, 64, 128, 256, 512),
+    batch_size: int = 5000
+) -> Dict:
+    """
+    Find the cheapest (M, search_ef) reaching a recall@k target and apply it.
+
+    Recall is measured against exact search over the collection's own
+    embeddings. search_ef is changed in place; every other M is measured on a
+    temporary vectors-only copy. For each M the smallest search_ef reaching
+    the target is kept, and the setting with the lowest p95 latency wins (ties
+    go to the smaller M, which uses less memory). If no setting reaches the
+    target, the one with the highest recall is used.
+
+    The collection is rebuilt under its own name only when the chosen M
+    differs from its current M. The chosen settings, measured recall and p95
+    are recorded in its metadata under "hnsw_tuned_*" keys.
+
+    Args:
+        chroma_client: Chroma client owning the collection
+        collection: Collection to tune
+        query_embeddings: Held-out query sample, shape (q, dim)
+        k: Neighbours per query for recall@k
+        target_recall: Required mean recall@k
+        m_values: Candidate M values
+        ef_values: Candidate search_ef values (tried in ascending order)
+        batch_size: Chunks read or copied per call
+
+    Returns:
+        Dictionary with the chosen params, recall, p95_ms, target_met and
+        the measured "trials", plus the (possibly rebuilt) "collection"
+    """
+    query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+    current = hnsw_params(collection)
+
+    vectors = _read_collection(collection, batch_size, ["embeddings"])
+    ids = np.asarray(vectors["ids"])
+    neighbours = exact_top_k(np.asarray(vectors["embeddings"]), query_embeddings, k, current["space"])
+    truth = [set(row) for row in ids[neighbours]]
+    del vectors
+
+    trials = []
+    for m in sorted(set(m_values)):
+        params = {**current, "M": m}
+        if m == current["M"]:
+            candidate = collection
+        else:
+            candidate = copy_collection(
+                chroma_client, collection, f"{collection.name}-tune-m{m}", params,
+                batch_size=batch_size, include=()
+            )
+        try:
+            for ef in sorted(set(ef_values)):
+                candidate.modify(configuration={"hnsw": {"ef_search": ef}})
+                recall, p95_ms = measure(candidate, query_embeddings, truth, k)
+                trials.append({"M": m, "search_ef": ef, "recall": recall, "p95_ms": p95_ms})
+                if recall >= target_recall:
+                    break
+        finally:
+            if candidate is not collection:
+                chroma_client.delete_collection(name=candidate.name)
+
+    passing = [t for t in trials if t["recall"] >= target_recall]
+    if passing:
+        best = min(passing, key=lambda t: (t["p95_ms"], t["M"], t["search_ef"]))
+    else:
+        best = max(trials, key=lambda t: (t["recall"], -t["p95_ms"]))
+
+    chosen = {**current, "M": best["M"], "search_ef": best["search_ef"]}
+    metadata = {
+        key: value for key, value in (collection.metadata or {}).items()
+        # Legacy "hnsw:*" keys cannot be rewritten; the configuration holds them
+        if not key.startswith("hnsw:") and not key.startswith(TUNED_PREFIX)
+    }
+    metadata.update({
+        f"{TUNED_PREFIX}M": best["M"],
+        f"{TUNED_PREFIX}search_ef": best["search_ef"],
+        f"{TUNED_PREFIX}k": k,
+        f"{TUNED_PREFIX}target_recall": target_recall,
+        f"{TUNED_PREFIX}recall": best["recall"],
+        f"{TUNED_PREFIX}p95_ms": best["p95_ms"],
+        f"{TUNED_PREFIX}num_queries": len(query_embeddings),
+        f"{TUNED_PREFIX}at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    })
+
+    if best["M"] != current["M"]:
+        # M is fixed at build time: rebuild, then swap the copy in under the same name
+        name = collection.name
+        rebuilt = copy_collection(
+            chroma_client, collection, f"{name}-tune-build", chosen, metadata, batch_size
+        )
+        chroma_client.delete_collection(name=name)
+        rebuilt.modify(name=name)
+        collection = chroma_client.get_collection(name=name)
+    else:
+        collection.modify(metadata=metadata, configuration={"hnsw": {"ef_search": best["search_ef"]}})
+
+    return {
+        "params": chosen,
+        "recall": best["recall"],
+        "p95_ms": best["p95_ms"],
+        "target_met": bool(passing),
+        "trials": trials,
+        "collection": collection,
+    }
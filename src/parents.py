@@ -0,0 +1,205 @@
+"""Parent-span store for small-to-big (parent-document) retrieval"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import polars as pl
+
+from rate_limit import estimate_tokens
+
+
+def merge_windows(windows: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Merge overlapping or touching [start, end) windows.
+
+    Args:
+        windows: Word windows
+
+    Returns:
+        Disjoint windows in ascending order
+    """
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def word_offsets(text: str) -> np.ndarray:
+    """Character offset of every word of a single-space-separated text."""
+    lengths = np.fromiter((len(word) + 1 for word in text.split(" ") if word), np.int64)
+    return np.concatenate(([0], np.cumsum(lengths[:-1]))) if len(lengths) else lengths
+
+
+class ParentStore:
+    """Parent segment texts addressed by parent_id; children hold word spans into them"""
+
+    def __init__(self):
+        """Initialize an empty store."""
+        # parent_id -> (whitespace-normalized text, character offset of each word)
+        self._parents: Dict[str, Tuple[str, np.ndarray]] = {}
+
+    def add(self, parent_id: str, text: str) -> None:
+        """
+        Store (or replace) a parent segment.
+
+        Args:
+            parent_id: Parent identifier referenced by child chunk metadata
+            text: Segment text (whitespace is normalized to single spaces)
+        """
+        text = " ".join(text.split())
+        self._parents[parent_id] = (text, word_offsets(text))
+
+    def get(self, parent_id: str) -> Optional[str]:
+        """Text of a parent segment, or None if unknown."""
+        parent = self._parents.get(parent_id)
+        return parent[0] if parent is not None else None
+
+    def window(self, parent_id: str, start: int, end: int) -> str:
+        """
+        Words [start, end) of a parent segment, sliced via word offsets.
+
+        Costs O(end - start) regardless of the parent's length.
+
+        Args:
+            parent_id: Parent identifier
+            start: First word index
+            end: Word index past the last word (clipped to the parent)
+
+        Returns:
+            The words joined by single spaces
+        """
+        text, offsets = self._parents[parent_id]
+        start, end = max(start, 0), min(end, len(offsets))
+        if start >= end:
+            return ""
+        stop = offsets[end] - 1 if end < len(offsets) else len(text)
+        return text[offsets[start]:stop]
+
+    def __len__(self) -> int:
+        return len(self._parents)
+
+    def expand(
+        self,
+        metadatas: List[Dict],
+        documents: List[str],
+        window_words: int = 300,
+        token_budget: Optional[int] = None
+    ) -> List[str]:
+        """
+        Replace retrieved child chunks with deduplicated parent windows.
+
+        See expand_ranked(); this returns the passages only.
+        """
+        return [
+            passage
+            for _, passage in self.expand_ranked(metadatas, documents, window_words, token_budget)
+        ]
+
+    def expand_ranked(
+        self,
+        metadatas: List[Dict],
+        documents: List[str],
+        window_words: int = 300,
+        token_budget: Optional[int] = None
+    ) -> List[Tuple[int, str]]:
+        """
+        Replace retrieved child chunks with deduplicated parent windows.
+
+        Each hit is widened to about window_words words of its parent. Windows
+        of the same parent that overlap are merged, so neighbouring hits
+        share one passage. Passages are returned in rank order of their best
+        hit; once token_budget is reached a hit falls back to its own chunk
+        if that still fits, otherwise expansion stops.
+
+        Args:
+            metadatas: Metadata of retrieved chunks, in rank order
+            documents: Texts of retrieved chunks, in rank order
+            window_words: Target window size around each hit, in words
+            token_budget: Maximum estimated tokens of all passages (None = no limit)
+
+        Returns:
+            (rank of the passage's best hit, passage) pairs for the prompt
+        """
+        # parent_id -> [(rank, start, end, window_start, window_end)]
+        hits: Dict[str, List[Tuple[int, int, int, int, int]]] = {}
+        standalone: List[Tuple[int, str]] = []
+
+        for rank, (metadata, document) in enumerate(zip(metadatas, documents)):
+            parent_id = (metadata or {}).get("parent_id")
+            if parent_id not in self._parents:
+                # Chunks without a parent (e.g. table rows) keep their own text
+                standalone.append((rank, document))
+                continue
+
+            start, end = metadata["word_start"], metadata["word_end"]
+            pad = max(window_words - (end - start), 0) // 2
+            hits.setdefault(parent_id, []).append(
+                (rank, start, end, max(start - pad, 0), end + pad)
+            )
+
+        # (rank of best hit, passage, best hit's own chunk)
+        passages: List[Tuple[int, str, str]] = []
+        for parent_id, parent_hits in hits.items():
+            for start, end in merge_windows([(hit[3], hit[4]) for hit in parent_hits]):
+                rank, child_start, child_end = min(
+                    hit for hit in parent_hits if start <= hit[3] < end
+                )[:3]
+                passages.append((
+                    rank,
+                    self.window(parent_id, start, end),
+                    self.window(parent_id, child_start, child_end),
+                ))
+        passages.extend((rank, document, document) for rank, document in standalone)
+        passages.sort(key=lambda passage: passage[0])
+
+        context, used = [], 0
+        for rank, passage, child in passages:
+            if token_budget is None:
+                context.append((rank, passage))
+                continue
+            for text in (passage, child):
+                tokens = estimate_tokens(text)
+                if used + tokens <= token_budget:
+                    context.append((rank, text))
+                    used += tokens
+                    break
+            else:
+                break
+        return context
+
+    def save(self, path: Path) -> None:
+        """
+        Write the store to a Parquet file.
+
+        Args:
+            path: Output path
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pl.DataFrame(
+            {"parent_id": list(self._parents), "text": [text for text, _ in self._parents.values()]},
+            schema={"parent_id": pl.String, "text": pl.String}
+        ).write_parquet(path, compression="zstd")
+
+    @classmethod
+    def load(cls, path: Path) -> "ParentStore":
+        """
+        Read a store written by save().
+
+        Args:
+            path: Parquet file path
+
+        Returns:
+            ParentStore
+        """
+        store = cls()
+        df = pl.read_parquet(path)
+        store._parents = {
+            parent_id: (text, word_offsets(text))
+            for parent_id, text in zip(df["parent_id"].to_list(), df["text"].to_list())
+        }
+        return store
@@ -0,0 +1,263 @@
+"""Resumable, parallel corpus ingestion into GFS and CustomRAG"""
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from custom_rag import CustomRAG
+from data_loader import compute_file_hash
+from extraction import extract_documents
+from store_registry import StoreRegistry
+
+
+class Checkpoint:
+    """Per-backend record of ingested files, persisted after every file"""
+
+    def __init__(self, path: Path):
+        """
+        Initialize the checkpoint, loading previous progress if present.
+
+        Args:
+            path: JSON checkpoint file
+        """
+        self.path = Path(path)
+        self._entries: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+
+    def get(self, backend: str, file_path: str) -> Optional[Dict]:
+        """Checkpoint entry of a file, or None."""
+        with self._lock:
+            return self._entries.get(backend, {}).get(file_path)
+
+    def is_done(self, backend: str, file_path: str, file_hash: str) -> bool:
+        """Whether this exact file content was already ingested by a backend."""
+        entry = self.get(backend, file_path)
+        return entry is not None and entry["status"] == "done" and entry["file_hash"] == file_hash
+
+    def record(self, backend: str, file_path: str, entry: Dict) -> None:
+        """
+        Record a file's outcome and persist the checkpoint.
+
+        Args:
+            backend: "gfs" or "custom_rag"
+            file_path: Ingested file
+            entry: Outcome with at least "status" and "file_hash"
+        """
+        with self._lock:
+            self._entries.setdefault(backend, {})[file_path] = entry
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=2)
+            tmp_path.replace(self.path)
+
+
+class ProgressReporter:
+    """Thread-safe one-line-per-file progress output"""
+
+    def __init__(self, backend: str, total: int):
+        self.backend = backend
+        self.total = total
+        self.done = 0
+        self._lock = threading.Lock()
+
+    def update(self, file_name: str, status: str, detail: str = "") -> None:
+        with self._lock:
+            self.done += 1
+            mark = {"done": "✓", "skipped": "=", "failed": "✗"}.get(status, "?")
+            print(f"[{self.backend} {self.done}/{self.total}] {mark} {file_name} {detail}".rstrip())
+
+
+def _summary(backend: str, outcomes: List[Dict], seconds: float) -> Dict:
+    """Throughput summary of one backend's ingestion."""
+    done = [o for o in outcomes if o["status"] == "done"]
+    megabytes = sum(o["size_mb"] for o in done)
+    return {
+        "backend": backend,
+        "files": len(outcomes),
+        "succeeded": len(done),
+        "skipped": sum(o["status"] == "skipped" for o in outcomes),
+        "failed": sum(o["status"] == "failed" for o in outcomes),
+        "chunks": sum(o.get("num_chunks") or 0 for o in done),
+        "megabytes": round(megabytes, 2),
+        "seconds": round(seconds, 2),
+        "files_per_second": len(done) / seconds if seconds else 0.0,
+        "mb_per_second": megabytes / seconds if seconds else 0.0,
+    }
+
+
+def ingest_gfs(
+    registry: StoreRegistry,
+    store_display_name: str,
+    files: List[Dict],
+    checkpoint: Checkpoint,
+    max_workers: int = 8
+) -> Dict:
+    """
+    Upload files to a GFS store in parallel, skipping checkpointed content.
+
+    Args:
+        registry: Store registry (also deduplicates by content hash)
+        store_display_name: Display name of the target store (created if needed)
+        files: Rows from scan_documents() with file_path and size_mb
+        checkpoint: Checkpoint shared with other backends
+        max_workers: Concurrent uploads
+
+    Returns:
+        Throughput summary
+    """
+    start = time.time()
+    store_name = registry.get_or_create(store_display_name)
+    progress = ProgressReporter("gfs", len(files))
+
+    def upload(row: Dict) -> Dict:
+        file_path = Path(row["file_path"])
+        file_hash = compute_file_hash(file_path)
+        outcome = {"file_hash": file_hash, "size_mb": row["size_mb"]}
+
+        if checkpoint.is_done("gfs", row["file_path"], file_hash):
+            progress.update(file_path.name, "skipped")
+            return {**outcome, "status": "skipped"}
+
+        file_start = time.time()
+        try:
+            operation = registry.upload_if_new(store_name, file_path, wait_for_completion=True)
+            if operation is None:
+                # Identical content is already in the store
+                outcome.update(status="skipped", store_name=store_name)
+            elif getattr(operation, "error", None) or not operation.done:
+                error = getattr(operation, "error", None) or "upload did not complete"
+                outcome.update(status="failed", error=str(error))
+            else:
+                outcome.update(status="done", seconds=time.time() - file_start, store_name=store_name)
+        except Exception as e:
+            outcome.update(status="failed", error=str(e))
+
+        checkpoint.record("gfs", row["file_path"], outcome)
+        progress.update(
+            file_path.name,
+            outcome["status"],
+            f"{outcome['seconds']:.1f}s" if "seconds" in outcome else outcome.get("error", "")
+        )
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        outcomes = [future.result() for future in as_completed(
+            executor.submit(upload, row) for row in files
+        )]
+    return _summary("gfs", outcomes, time.time() - start)
+
+
+def ingest_custom(
+    rag: CustomRAG,
+    files: List[Dict],
+    checkpoint: Checkpoint,
+    cache_dir: Optional[Path] = None,
+    max_workers: Optional[int] = None,
+    chunk_size: int = 512,
+    overlap: int = 50
+) -> Dict:
+    """
+    Extract files in parallel processes and index them into CustomRAG.
+
+    A file whose content changed since its checkpoint has its old chunks
+    deleted before re-indexing.
+
+    Args:
+        rag: CustomRAG with its collection already created
+        files: Rows from scan_documents() with file_path and size_mb
+        checkpoint: Checkpoint shared with other backends
+        cache_dir: Extraction cache directory
+        max_workers: Extraction processes (None for CPU count)
+        chunk_size: Characters per chunk
+        overlap: Overlap between chunks
+
+    Returns:
+        Throughput summary
+    """
+    start = time.time()
+    progress = ProgressReporter("custom_rag", len(files))
+    outcomes, pending = [], []
+
+    for row in files:
+        file_hash = compute_file_hash(Path(row["file_path"]))
+        if checkpoint.is_done("custom_rag", row["file_path"], file_hash):
+            progress.update(Path(row["file_path"]).name, "skipped")
+            outcomes.append({"status": "skipped", "size_mb": row["size_mb"]})
+        else:
+            pending.append((row, file_hash))
+
+    extracted = extract_documents(
+        [row["file_path"] for row, _ in pending],
+        cache_dir=cache_dir,
+        max_workers=max_workers
+    )
+
+    try:
+        for row, file_hash in pending:
+            file_path = Path(row["file_path"])
+            outcome = {"file_hash": file_hash, "size_mb": row["size_mb"]}
+            extraction = extracted[row["file_path"]]
+
+            file_start = time.time()
+            try:
+                if "error" in extraction:
+                    raise ValueError(extraction["error"])
+                if checkpoint.get("custom_rag", row["file_path"]) is not None:
+                    # Content changed: drop the previous version's chunks
+                    rag.collection.delete(where={"file_path": str(file_path)})
+                num_chunks = rag.index_document(
+                    file_path=file_path,
+                    chunk_size=chunk_size,
+                    overlap=overlap,
+                    metadata={"file_size_mb": row["size_mb"]},
+                    segments=extraction["segments"]
+                )
+                outcome.update(
+                    status="done", num_chunks=num_chunks, seconds=time.time() - file_start
+                )
+            except Exception as e:
+                outcome.update(status="failed", error=str(e))
+
+            checkpoint.record("custom_rag", row["file_path"], outcome)
+            progress.update(
+                file_path.name,
+                outcome["status"],
+                f"{outcome['num_chunks']} chunks" if "num_chunks" in outcome
+                else outcome.get("error", "")
+            )
+            outcomes.append(outcome)
+    finally:
+        # Parent segments of the indexed files, for parent-window expansion
+        rag.save_parents()
+
+    return _summary("custom_rag", outcomes, time.time() - start)
+
+
+def format_summary(summaries: List[Dict]) -> str:
+    """
+    Render ingestion summaries as a text table.
+
+    Args:
+        summaries: Outputs of ingest_gfs() / ingest_custom()
+
+    Returns:
+        Table with one row per backend
+    """
+    lines = [
+        f"{'backend':>12} {'ok':>5} {'skip':>5} {'fail':>5} {'chunks':>8} "
+        f"{'MB':>8} {'sec':>8} {'files/s':>8} {'MB/s':>8}"
+    ]
+    for s in summaries:
+        lines.append(
+            f"{s['backend']:>12} {s['succeeded']:>5} {s['skipped']:>5} {s['failed']:>5} "
+            f"{s['chunks']:>8} {s['megabytes']:>8.2f} {s['seconds']:>8.1f} "
+            f"{s['files_per_second']:>8.2f} {s['mb_per_second']:>8.2f}"
+        )
+    return "\n".join(lines)
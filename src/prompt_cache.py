@@ -0,0 +1,252 @@
+"""Gemini context caching for stable prompt prefixes"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from google import genai
+from google.genai import types
+
+from rate_limit import retry_after, status_code
+
+
+def prefix_key(*parts) -> str:
+    """
+    Content hash identifying a prompt prefix.
+
+    Args:
+        *parts: Strings (or lists of strings) making up the prefix
+
+    Returns:
+        Hex digest of the prefix
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        for text in part if isinstance(part, (list, tuple)) else [part]:
+            digest.update(str(text).encode("utf-8"))
+            digest.update(b"\x00")
+    return digest.hexdigest()[:16]
+
+
+class PromptCache:
+    """Reusable Gemini cached-content handles for prefixes shared by many queries"""
+
+    def __init__(
+        self,
+        client: genai.Client,
+        model: str,
+        ttl_seconds: int = 3600,
+        refresh_margin_seconds: int = 120,
+        failure_backoff_seconds: float = 60.0
+    ):
+        """
+        Initialize the prompt cache.
+
+        Args:
+            client: genai.Client used to create, refresh and delete caches
+            model: Default model of the cached content
+            ttl_seconds: Lifetime of each cached content
+            refresh_margin_seconds: Extend the TTL when a handle is used this
+                close to expiry
+            failure_backoff_seconds: How long a prefix is sent uncached after
+                a transient create failure (429, network) without Retry-After
+        """
+        if refresh_margin_seconds >= ttl_seconds:
+            raise ValueError("refresh_margin_seconds must be smaller than ttl_seconds")
+
+        self.client = client
+        self.model = model
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.failure_backoff_seconds = failure_backoff_seconds
+
+        # (model, key) -> {"name", "version", "expires_at"}
+        self._entries: Dict[Tuple[str, str], Dict] = {}
+        # (model, key, version) the API refused to cache (e.g. below the token minimum)
+        self._uncacheable: set = set()
+        # (model, key, version) -> time before which a failed create is not retried
+        self._retry_at: Dict[Tuple[str, str, Optional[str]], float] = {}
+        # Guards the dictionaries and counters; never held across API calls
+        self._lock = threading.Lock()
+        # One lock per (model, key): a single caller creates or refreshes a handle
+        self._key_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._stats = {"hits": 0, "creates": 0, "refreshes": 0, "invalidations": 0, "failures": 0}
+
+    def _ttl(self) -> str:
+        return f"{self.ttl_seconds}s"
+
+    def _delete(self, name: str) -> None:
+        try:
+            self.client.caches.delete(name=name)
+        except Exception:
+            # Expired caches are already gone
+            pass
+
+    def _fresh(self, entry_key: Tuple[str, str], version: Optional[str]) -> Optional[str]:
+        """Name of a valid handle needing no API call, counted as a hit (lock held)."""
+        entry = self._entries.get(entry_key)
+        if (
+            entry is None
+            or entry["version"] != version
+            or entry["expires_at"] - time.time() <= self.refresh_margin_seconds
+        ):
+            return None
+        self._stats["hits"] += 1
+        return entry["name"]
+
+    def get(
+        self,
+        key: str,
+        system_instruction: Optional[str] = None,
+        contents: Optional[List[str]] = None,
+        tools: Optional[List[types.Tool]] = None,
+        version: Optional[str] = None,
+        model: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Get a cached-content name for a prefix, creating or refreshing it as needed.
+
+        A handle created for a different version of the same key is deleted
+        and rebuilt, so callers invalidate by bumping version. Handles are
+        kept per model, since cached content only works with the model it
+        was created for. Concurrent calls for the same prefix wait for a
+        single create or refresh; other prefixes are not blocked by it.
+
+        Args:
+            key: Identifier of the prefix (e.g. from prefix_key())
+            system_instruction: Instruction stored in the cache
+            contents: Stable context texts stored in the cache
+            tools: Tools stored in the cache
+            version: Version of the underlying data (e.g. collection revision)
+            model: Model the handle is for (defaults to the cache's model)
+
+        Returns:
+            Cached content name for GenerateContentConfig.cached_content, or
+            None if the prefix cannot be cached (callers send it uncached)
+        """
+        model = model or self.model
+        entry_key = (model, key)
+
+        with self._lock:
+            name = self._fresh(entry_key, version)
+            if name is not None:
+                return name
+            key_lock = self._key_locks.setdefault(entry_key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                # Another caller may have created or refreshed it meanwhile
+                name = self._fresh(entry_key, version)
+                if name is not None:
+                    return name
+
+                now = time.time()
+                entry = self._entries.get(entry_key)
+                stale = None
+                if entry is not None and entry["version"] != version:
+                    stale = self._entries.pop(entry_key)["name"]
+                    self._stats["invalidations"] += 1
+                    entry = None
+                if entry is not None and entry["expires_at"] <= now:
+                    del self._entries[entry_key]
+                    entry = None
+                if entry is None and (
+                    (model, key, version) in self._uncacheable
+                    or self._retry_at.get((model, key, version), 0.0) > now
+                ):
+                    return None
+
+            if stale is not None:
+                self._delete(stale)
+
+            if entry is not None:
+                # Close to expiry: extend the TTL
+                try:
+                    self.client.caches.update(
+                        name=entry["name"],
+                        config=types.UpdateCachedContentConfig(ttl=self._ttl())
+                    )
+                    refreshed = True
+                except Exception:
+                    # Let it expire and be recreated on a later call
+                    refreshed = False
+                with self._lock:
+                    if refreshed:
+                        entry["expires_at"] = now + self.ttl_seconds
+                        self._stats["refreshes"] += 1
+                    self._stats["hits"] += 1
+                return entry["name"]
+
+            try:
+                cached = self.client.caches.create(
+                    model=model,
+                    config=types.CreateCachedContentConfig(
+                        display_name=f"prefix-{key}",
+                        system_instruction=system_instruction,
+                        contents=contents or None,
+                        tools=tools,
+                        ttl=self._ttl()
+                    )
+                )
+            except Exception as e:
+                with self._lock:
+                    if status_code(e) == 400:
+                        # INVALID_ARGUMENT, e.g. below the minimum token count
+                        self._uncacheable.add((model, key, version))
+                    else:
+                        # Transient (429, 5xx, network): try again later
+                        delay = retry_after(e)
+                        self._retry_at[(model, key, version)] = now + (
+                            self.failure_backoff_seconds if delay is None else delay
+                        )
+                    self._stats["failures"] += 1
+                return None
+
+            with self._lock:
+                self._retry_at.pop((model, key, version), None)
+                self._entries[entry_key] = {
+                    "name": cached.name,
+                    "version": version,
+                    "expires_at": now + self.ttl_seconds,
+                }
+                self._stats["creates"] += 1
+            return cached.name
+
+    def invalidate(self, key: str) -> None:
+        """
+        Drop and delete the cached content of a prefix, for every model.
+
+        Args:
+            key: Identifier of the prefix
+        """
+        with self._lock:
+            stale = [
+                self._entries.pop(entry_key)["name"]
+                for entry_key in [k for k in self._entries if k[1] == key]
+            ]
+            self._uncacheable = {item for item in self._uncacheable if item[1] != key}
+            self._retry_at = {item: t for item, t in self._retry_at.items() if item[1] != key}
+            self._stats["invalidations"] += len(stale)
+        for name in stale:
+            self._delete(name)
+
+    def clear(self) -> None:
+        """Delete every cached content created by this instance."""
+        with self._lock:
+            stale = [entry["name"] for entry in self._entries.values()]
+            self._entries.clear()
+            self._uncacheable.clear()
+            self._retry_at.clear()
+        for name in stale:
+            self._delete(name)
+
+    def get_stats(self) -> Dict:
+        """
+        Get cache statistics.
+
+        Returns:
+            Dictionary with live handle count and hit/create/refresh counters
+        """
+        with self._lock:
+            return {"entries": len(self._entries), **self._stats}
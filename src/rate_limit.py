@@ -0,0 +1,349 @@
+"""Client-side rate limiting, retries and priority scheduling for Gemini calls"""
+
+import contextvars
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import httpx
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_BULK = 2
+
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+_priority: contextvars.ContextVar = contextvars.ContextVar(
+    "gemini_priority", default=PRIORITY_INTERACTIVE
+)
+
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """
+    Set the default priority of Gemini calls made in this context.
+
+    Example:
+        with priority(PRIORITY_BATCH):
+            evaluate_queries(...)
+
+    Args:
+        level: PRIORITY_INTERACTIVE, PRIORITY_BATCH or PRIORITY_BULK
+    """
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    """Priority of the current context (PRIORITY_INTERACTIVE by default)."""
+    return _priority.get()
+
+
+def estimate_tokens(*texts: str) -> int:
+    """
+    Rough token estimate for budgeting (about 4 characters per token).
+
+    Args:
+        *texts: Prompt texts
+
+    Returns:
+        Estimated token count
+    """
+    return sum(len(text) for text in texts if text) // 4 + 1
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status code carried by an API error, if any."""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Whether a failed call is worth retrying (429, 5xx, timeouts, transport errors).
+
+    Args:
+        error: Exception raised by the call
+
+    Returns:
+        True if the call may succeed when retried
+    """
+    if isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True
+    return status_code(error) in RETRYABLE_STATUS_CODES
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    Server-requested delay from a Retry-After header or a RetryInfo detail.
+
+    Args:
+        error: Exception raised by the call
+
+    Returns:
+        Delay in seconds, or None if the server did not specify one
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is not None:
+        try:
+            return max(float(headers.get("retry-after")), 0.0)
+        except (TypeError, ValueError):
+            pass
+
+    # google.rpc.RetryInfo, e.g. {"retryDelay": "17s"}
+    match = re.search(r"retryDelay['\"]?\s*:\s*['\"]([\d.]+)s", str(getattr(error, "details", "")))
+    return float(match.group(1)) if match else None
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate"""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        """
+        Initialize a full bucket.
+
+        Args:
+            per_minute: Refill rate (requests or tokens per minute)
+            burst: Bucket capacity (defaults to one minute of budget)
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = burst if burst is not None else float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until amount is available (requests above capacity wait for a full bucket)."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(missing / self.rate, 0.0)
+
+    def consume(self, amount: float, now: float) -> None:
+        """Take amount from the bucket; negative levels are debt repaid by refill."""
+        self._refill(now)
+        self.level -= amount
+
+
+class RateLimiter:
+    """Shared per-model RPM/TPM budgets with priority queuing and retries"""
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict[str, float]]] = None,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            limits: Per quota key (usually a model name) budgets, e.g.
+                {"gemini-2.5-flash": {"rpm": 1000, "tpm": 1_000_000}}
+            requests_per_minute: Default RPM for keys not in limits (None = unlimited)
+            tokens_per_minute: Default TPM for keys not in limits (None = unlimited)
+            max_retries: Retries after the first attempt of a retryable failure
+            backoff_base: First backoff ceiling in seconds (doubles per retry)
+            backoff_max: Upper bound of a single backoff in seconds
+        """
+        self.limits = limits or {}
+        self.default_limits = {"rpm": requests_per_minute, "tpm": tokens_per_minute}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._buckets: Dict[str, Dict[str, TokenBucket]] = {}
+        self._blocked_until: Dict[str, float] = {}
+        self._queues: Dict[str, list] = {}
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stats = {"calls": 0, "retries": 0, "throttled": 0, "failures": 0, "wait_seconds": 0.0}
+
+    def _buckets_for(self, key: str) -> Dict[str, TokenBucket]:
+        buckets = self._buckets.get(key)
+        if buckets is None:
+            limits = {**self.default_limits, **self.limits.get(key, {})}
+            buckets = {
+                name: TokenBucket(per_minute)
+                for name, per_minute in limits.items() if per_minute
+            }
+            self._buckets[key] = buckets
+        return buckets
+
+    def acquire(
+        self,
+        key: str,
+        tokens: int = 0,
+        priority: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> None:
+        """
+        Block until one request of `tokens` tokens fits the key's budget.
+
+        Waiting callers are served by priority, then arrival order.
+
+        Args:
+            key: Quota key (usually the model name)
+            tokens: Estimated tokens of the request
+            priority: Request priority (defaults to the context priority)
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Raises:
+            TimeoutError: If the budget is not available in time
+        """
+        ticket = (current_priority() if priority is None else priority, next(self._sequence))
+        start = time.monotonic()
+        deadline = start + timeout if timeout is not None else None
+
+        with self._condition:
+            queue = self._queues.setdefault(key, [])
+            heapq.heappush(queue, ticket)
+            buckets = self._buckets_for(key)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if queue[0] == ticket:
+                        wait = max(
+                            self._blocked_until.get(key, 0.0) - now,
+                            buckets["rpm"].delay(1, now) if "rpm" in buckets else 0.0,
+                            buckets["tpm"].delay(tokens, now) if "tpm" in buckets else 0.0,
+                        )
+                        if wait <= 0:
+                            if "rpm" in buckets:
+                                buckets["rpm"].consume(1, now)
+                            if "tpm" in buckets:
+                                buckets["tpm"].consume(tokens, now)
+                            self._stats["wait_seconds"] += now - start
+                            return
+
+                    if deadline is not None:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            raise TimeoutError(f"Rate limit wait exceeded {timeout}s for {key}")
+                        wait = min(wait, remaining) if wait is not None else remaining
+                    self._condition.wait(wait)
+            finally:
+                queue.remove(ticket)
+                heapq.heapify(queue)
+                self._condition.notify_all()
+
+    def record_usage(self, key: str, estimated: int, actual: Optional[int]) -> None:
+        """
+        Correct the token budget once a call reports its real usage.
+
+        Args:
+            key: Quota key
+            estimated: Tokens reserved by acquire()
+            actual: Tokens reported by the API (ignored if None)
+        """
+        if actual is None:
+            return
+        with self._condition:
+            bucket = self._buckets_for(key).get("tpm")
+            if bucket is not None:
+                bucket.consume(actual - estimated, time.monotonic())
+
+    def pause(self, key: str, seconds: float) -> None:
+        """
+        Hold every caller of a key for a while (e.g. after a 429).
+
+        Args:
+            key: Quota key
+            seconds: Pause duration
+        """
+        with self._condition:
+            until = time.monotonic() + seconds
+            self._blocked_until[key] = max(self._blocked_until.get(key, 0.0), until)
+            self._condition.notify_all()
+
+    def _backoff(self, attempt: int, error: BaseException) -> float:
+        requested = retry_after(error)
+        if requested is not None:
+            return min(requested, self.backoff_max)
+        # Full jitter: uniform in [0, base * 2^attempt]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(
+        self,
+        fn: Callable[..., Any],
+        *args,
+        quota_key: str,
+        tokens: int = 0,
+        priority: Optional[int] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Call fn within the key's budget, retrying retryable failures.
+
+        Retries back off with jitter, honouring Retry-After / RetryInfo. A
+        429 pauses the whole key so concurrent callers do not pile on.
+
+        Args:
+            fn: Function performing the API call
+            *args: Positional arguments for fn
+            quota_key: Quota key (usually the model name)
+            tokens: Estimated tokens of the request
+            priority: Request priority (defaults to the context priority)
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            Result of fn
+        """
+        priority = current_priority() if priority is None else priority
+        for attempt in range(self.max_retries + 1):
+            self.acquire(quota_key, tokens, priority)
+            with self._condition:
+                self._stats["calls"] += 1
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.max_retries:
+                    with self._condition:
+                        self._stats["failures"] += 1
+                    raise
+
+                delay = self._backoff(attempt, e)
+                with self._condition:
+                    self._stats["retries"] += 1
+                if status_code(e) == 429:
+                    with self._condition:
+                        self._stats["throttled"] += 1
+                    self.pause(quota_key, delay)
+                time.sleep(delay)
+                continue
+
+            usage = getattr(result, "usage_metadata", None)
+            self.record_usage(quota_key, tokens, getattr(usage, "total_token_count", None))
+            return result
+
+    def get_stats(self) -> Dict:
+        """
+        Get limiter statistics.
+
+        Returns:
+            Dictionary with call, retry, throttle and failure counts, total
+            queueing time and the number of callers currently waiting
+        """
+        with self._condition:
+            return {
+                **self._stats,
+                "waiting": sum(len(queue) for queue in self._queues.values()),
+            }
@@ -0,0 +1,220 @@
+"""Append-only Parquet store of per-query evaluation runs"""
+
+import hashlib
+import json
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import polars as pl
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# One row per query run; columns missing from a record are stored as null
+RESULTS_SCHEMA = pa.schema([
+    ("run_id", pa.string()),
+    ("timestamp", pa.timestamp("ms", tz="UTC")),
+    ("experiment", pa.string()),
+    ("backend", pa.string()),
+    ("model", pa.string()),
+    ("config_hash", pa.string()),
+    ("config", pa.string()),
+    ("query_id", pa.string()),
+    ("category", pa.string()),
+    ("status", pa.string()),
+    ("error", pa.string()),
+    ("retrieval_time", pa.float64()),
+    ("generation_time", pa.float64()),
+    ("total_time", pa.float64()),
+    ("input_tokens", pa.int64()),
+    ("output_tokens", pa.int64()),
+    ("num_chunks_retrieved", pa.int64()),
+    ("num_citations", pa.int64()),
+    ("has_citations", pa.bool_()),
+    ("response_length", pa.int64()),
+])
+
+
+def config_hash(config: Dict) -> str:
+    """
+    Stable short hash of a configuration dictionary.
+
+    Args:
+        config: JSON-serializable configuration
+
+    Returns:
+        12-character hex digest, identical for equal configs
+    """
+    canonical = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+
+def token_usage(response) -> Dict[str, Optional[int]]:
+    """
+    Read input/output token counts from a GenerateContentResponse.
+
+    Args:
+        response: GenerateContentResponse (or None)
+
+    Returns:
+        Dictionary with input_tokens and output_tokens (None if unavailable)
+    """
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "input_tokens": getattr(usage, "prompt_token_count", None),
+        "output_tokens": getattr(usage, "candidates_token_count", None),
+    }
+
+
+class ResultsStore:
+    """Buffered, append-only Parquet dataset of query runs"""
+
+    def __init__(self, root: Path, buffer_size: int = 1000):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory holding the Parquet part files
+            buffer_size: Records buffered in memory before a part is written
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.buffer_size = buffer_size
+
+        self._buffer: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "ResultsStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.flush()
+
+    def append(
+        self,
+        record: Dict,
+        config: Optional[Dict] = None
+    ) -> None:
+        """
+        Buffer one query run.
+
+        Args:
+            record: Column values (see RESULTS_SCHEMA); unknown keys are ignored
+            config: Configuration of the run, hashed into config_hash
+        """
+        row = {name: record.get(name) for name in RESULTS_SCHEMA.names}
+        if config is not None:
+            row["config"] = json.dumps(config, sort_keys=True, default=str)
+            row["config_hash"] = config_hash(config)
+        row["run_id"] = row["run_id"] or uuid.uuid4().hex
+        row["timestamp"] = row["timestamp"] or int(time.time() * 1000)
+
+        with self._lock:
+            self._buffer.append(row)
+            should_flush = len(self._buffer) >= self.buffer_size
+
+        if should_flush:
+            self.flush()
+
+    def extend(self, records: Iterable[Dict], config: Optional[Dict] = None) -> None:
+        """
+        Buffer many query runs sharing one configuration.
+
+        Args:
+            records: Column value dictionaries
+            config: Configuration shared by all runs
+        """
+        for record in records:
+            self.append(record, config=config)
+
+    def flush(self) -> Optional[Path]:
+        """
+        Write buffered records as a new Parquet part file.
+
+        Returns:
+            Path of the written part, or None if the buffer was empty
+        """
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+
+        if not rows:
+            return None
+
+        table = pa.Table.from_pylist(rows, schema=RESULTS_SCHEMA)
+        part_path = self.root / f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet"
+        tmp_path = part_path.with_suffix(".tmp")
+        pq.write_table(table, tmp_path, compression="zstd")
+        tmp_path.replace(part_path)
+        return part_path
+
+    def scan(self) -> pl.LazyFrame:
+        """
+        Lazily scan every recorded run.
+
+        Returns:
+            LazyFrame over all part files (empty frame if none written yet)
+        """
+        if not any(self.root.glob("*.parquet")):
+            return pl.LazyFrame(schema=pl.from_arrow(RESULTS_SCHEMA.empty_table()).schema)
+        return pl.scan_parquet(self.root / "*.parquet")
+
+    def summary(
+        self,
+        by: Sequence[str] = ("backend", "model", "config_hash")
+    ) -> pl.LazyFrame:
+        """
+        Aggregate latency, token and citation stats per group.
+
+        Args:
+            by: Columns to group on
+
+        Returns:
+            LazyFrame with one row per group; call .collect() to execute
+        """
+        success = pl.col("status") == "success"
+
+        def ok(column: str) -> pl.Expr:
+            """Values of a column from successful queries only."""
+            return pl.col(column).filter(success)
+
+        return (
+            self.scan()
+            .group_by(list(by))
+            .agg(
+                pl.len().alias("total_queries"),
+                success.sum().alias("successful"),
+                (~success).sum().alias("failed"),
+                ok("total_time").mean().alias("mean_latency"),
+                ok("total_time").median().alias("median_latency"),
+                ok("total_time").quantile(0.95).alias("p95_latency"),
+                ok("retrieval_time").mean().alias("mean_retrieval_time"),
+                ok("generation_time").mean().alias("mean_generation_time"),
+                ok("input_tokens").mean().alias("mean_input_tokens"),
+                ok("output_tokens").mean().alias("mean_output_tokens"),
+                ok("has_citations").cast(pl.Float64).mean().alias("citation_rate"),
+            )
+            .sort(list(by))
+        )
+
+    def compact(self) -> Optional[Path]:
+        """
+        Merge all part files into one, bounding the file count for scans.
+
+        Returns:
+            Path of the compacted part, or None if there was nothing to merge
+        """
+        self.flush()
+        parts = sorted(self.root.glob("part-*.parquet"))
+        if len(parts) < 2:
+            return None
+
+        compacted = self.root / f"part-{int(time.time() * 1000)}-compacted.parquet"
+        tmp_path = compacted.with_suffix(".tmp")
+        pl.scan_parquet(parts).sink_parquet(tmp_path, compression="zstd")
+        tmp_path.replace(compacted)
+
+        for part in parts:
+            part.unlink()
+        return compacted
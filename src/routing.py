@@ -0,0 +1,266 @@
+"""Latency-aware routing of queries between GFS and CustomRAG"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from custom_rag import CustomRAG
+from gfs_client import GFSClient
+
+BACKENDS = ("gfs", "custom_rag")
+POLICIES = ("p95", "hedge", "category")
+
+# Histogram bucket edges in seconds (log-spaced, 50 ms to 60 s)
+HISTOGRAM_EDGES = np.concatenate([[0.0], np.geomspace(0.05, 60.0, 24), [np.inf]])
+
+
+class BackendRouter:
+    """Route each query to GFS or CustomRAG by latency, hedging or category"""
+
+    def __init__(
+        self,
+        rag: CustomRAG,
+        gfs: GFSClient,
+        store_names: List[str],
+        policy: str = "p95",
+        hedge_deadline: Optional[float] = None,
+        category_routes: Optional[Dict[str, str]] = None,
+        window: int = 200,
+        min_samples: int = 5,
+        max_error_rate: float = 0.5,
+        default_hedge_deadline: float = 2.0
+    ):
+        """
+        Initialize the router.
+
+        Args:
+            rag: CustomRAG with its collection already created
+            gfs: GFS client
+            store_names: File search stores queried by the GFS backend
+            policy: "p95" (lowest rolling p95), "hedge" (fire the other
+                backend after a deadline, first answer wins) or "category"
+                (fixed backend per query category, p95 otherwise)
+            hedge_deadline: Seconds before hedging (defaults to the primary's
+                rolling p95, or default_hedge_deadline without samples)
+            category_routes: Mapping of query category to backend name
+            window: Latency samples and outcomes kept per backend
+            min_samples: Requests (successful or not) each backend gets
+                before p95 routing kicks in
+            max_error_rate: Backends failing more than this fraction of
+                recent requests are avoided while another one is healthy
+            default_hedge_deadline: Seconds before hedging while the primary
+                has no latency samples yet
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy: {policy} (expected one of {POLICIES})")
+        for category, backend in (category_routes or {}).items():
+            if backend not in BACKENDS:
+                raise ValueError(f"Unknown backend for category {category}: {backend}")
+
+        self.rag = rag
+        self.gfs = gfs
+        self.store_names = store_names
+        self.policy = policy
+        self.hedge_deadline = hedge_deadline
+        self.category_routes = category_routes or {}
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.default_hedge_deadline = default_hedge_deadline
+
+        # Latencies of successful requests, and whether each recent request failed
+        self._recent = {backend: deque(maxlen=window) for backend in BACKENDS}
+        self._outcomes = {backend: deque(maxlen=window) for backend in BACKENDS}
+        self._histograms = {
+            backend: np.zeros(len(HISTOGRAM_EDGES) - 1, dtype=np.int64) for backend in BACKENDS
+        }
+        self._counts = {
+            backend: {"requests": 0, "errors": 0, "wins": 0, "hedges": 0} for backend in BACKENDS
+        }
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="router")
+
+    def _record(self, backend: str, seconds: float, error: bool) -> None:
+        with self._lock:
+            self._counts[backend]["requests"] += 1
+            self._outcomes[backend].append(error)
+            if error:
+                self._counts[backend]["errors"] += 1
+                return
+            self._recent[backend].append(seconds)
+            bucket = np.searchsorted(HISTOGRAM_EDGES, seconds, side="right") - 1
+            self._histograms[backend][bucket] += 1
+
+    def _p95(self, backend: str) -> Optional[float]:
+        with self._lock:
+            samples = list(self._recent[backend])
+        return float(np.percentile(samples, 95)) if samples else None
+
+    def _run(self, backend: str, query: str, kwargs: Dict) -> Dict:
+        """Query one backend and normalize its result."""
+        start = time.perf_counter()
+        try:
+            if backend == "gfs":
+                response = self.gfs.query_with_file_search(
+                    query=query,
+                    store_names=self.store_names,
+                    **kwargs.get("gfs", {})
+                )
+                answer = response.text
+            else:
+                response = self.rag.query(query, **kwargs.get("custom_rag", {}))
+                answer = response["answer"]
+        except Exception:
+            self._record(backend, time.perf_counter() - start, error=True)
+            raise
+
+        latency = time.perf_counter() - start
+        self._record(backend, latency, error=False)
+        return {"backend": backend, "answer": answer, "latency": latency, "response": response}
+
+    def choose(self, category: Optional[str] = None) -> str:
+        """
+        Pick the backend a query would be sent to first.
+
+        Args:
+            category: Query category (used by the "category" policy)
+
+        Returns:
+            Backend name ("gfs" or "custom_rag")
+        """
+        if self.policy == "category" and category in self.category_routes:
+            return self.category_routes[category]
+
+        with self._lock:
+            sizes = {backend: len(self._outcomes[backend]) for backend in BACKENDS}
+            error_rates = {
+                backend: float(np.mean(self._outcomes[backend])) if sizes[backend] else 0.0
+                for backend in BACKENDS
+            }
+        # Warm up: give every backend min_samples requests (failures count too)
+        cold = [backend for backend in BACKENDS if sizes[backend] < self.min_samples]
+        if cold:
+            return min(cold, key=lambda backend: sizes[backend])
+
+        healthy = [backend for backend in BACKENDS if error_rates[backend] <= self.max_error_rate]
+        if not healthy:
+            return min(BACKENDS, key=lambda backend: error_rates[backend])
+
+        def p95(backend: str) -> float:
+            value = self._p95(backend)
+            return np.inf if value is None else value
+
+        return min(healthy, key=p95)
+
+    def _hedged(self, primary: str, query: str, kwargs: Dict) -> Dict:
+        """Run primary; fire the other backend if it misses the deadline."""
+        secondary = BACKENDS[1 - BACKENDS.index(primary)]
+        deadline = self.hedge_deadline
+        if deadline is None:
+            deadline = self._p95(primary)
+        if deadline is None:
+            # No successful samples yet (warm-up)
+            deadline = self.default_hedge_deadline
+
+        futures: Dict[Future, str] = {
+            self._executor.submit(self._run, primary, query, kwargs): primary
+        }
+        done, _ = wait(futures, timeout=deadline)
+        if not done or next(iter(done)).exception() is not None:
+            with self._lock:
+                self._counts[secondary]["hedges"] += 1
+            futures[self._executor.submit(self._run, secondary, query, kwargs)] = secondary
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The slower call keeps running and still feeds the histograms
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def query(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        gfs_kwargs: Optional[Dict] = None,
+        rag_kwargs: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Answer a query with the backend chosen by the routing policy.
+
+        If the chosen backend fails, the other backend is tried once.
+
+        Args:
+            query: User query
+            category: Query category (used by the "category" policy)
+            gfs_kwargs: Additional arguments for GFSClient.query_with_file_search
+            rag_kwargs: Additional arguments for CustomRAG.query
+
+        Returns:
+            Dictionary with backend, answer, latency (seconds) and the
+            backend's raw response
+        """
+        kwargs = {"gfs": gfs_kwargs or {}, "custom_rag": rag_kwargs or {}}
+        primary = self.choose(category)
+
+        if self.policy == "hedge":
+            result = self._hedged(primary, query, kwargs)
+        else:
+            try:
+                result = self._run(primary, query, kwargs)
+            except Exception:
+                result = self._run(BACKENDS[1 - BACKENDS.index(primary)], query, kwargs)
+
+        with self._lock:
+            self._counts[result["backend"]]["wins"] += 1
+        return result
+
+    def histograms(self) -> Dict[str, Dict]:
+        """
+        Export per-backend latency histograms.
+
+        Returns:
+            Mapping of backend to {"edges": bucket edges in seconds,
+            "counts": successful requests per bucket}
+        """
+        with self._lock:
+            return {
+                backend: {
+                    "edges": HISTOGRAM_EDGES.tolist(),
+                    "counts": counts.tolist(),
+                }
+                for backend, counts in self._histograms.items()
+            }
+
+    def get_stats(self) -> Dict:
+        """
+        Get per-backend routing statistics.
+
+        Returns:
+            Mapping of backend to request/error/win/hedge counts, rolling
+            error rate and rolling p50/p95 latency in seconds
+        """
+        stats = {}
+        for backend in BACKENDS:
+            with self._lock:
+                samples = np.array(self._recent[backend])
+                outcomes = np.array(self._outcomes[backend], dtype=bool)
+                counts = dict(self._counts[backend])
+            stats[backend] = {
+                **counts,
+                "error_rate": float(outcomes.mean()) if len(outcomes) else None,
+                "p50": float(np.median(samples)) if len(samples) else None,
+                "p95": float(np.percentile(samples, 95)) if len(samples) else None,
+            }
+        return stats
+
+    def close(self) -> None:
+        """Wait for outstanding hedged calls and stop the worker threads."""
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,351 @@
+"""Async HTTP query service for CustomRAG with micro-batched query embedding"""
+
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import numpy as np
+
+try:
+    import uvicorn
+    from fastapi import FastAPI, HTTPException
+    from fastapi.responses import StreamingResponse
+    from pydantic import BaseModel
+except ImportError as e:
+    raise ImportError("The query service requires fastapi and uvicorn: uv sync --extra serve") from e
+
+from custom_rag import CustomRAG
+from embeddings import QueryEmbeddingCache
+from parents import ParentStore
+from utils import load_api_key
+
+
+class RetrieveRequest(BaseModel):
+    query: str
+    top_k: int = 5
+    mmr: bool = False
+    mmr_lambda: float = 0.5
+    metadata_filter: Optional[Union[str, Dict]] = None
+
+
+class QueryRequest(RetrieveRequest):
+    temperature: float = 0.0
+    stream: bool = False
+
+
+class IndexRequest(BaseModel):
+    file_path: str
+    chunk_size: int = 512
+    overlap: int = 50
+    metadata: Optional[Dict] = None
+
+
+class EmbeddingBatcher:
+    """Coalesce concurrent query embeddings into single encode calls"""
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        executor: ThreadPoolExecutor,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0
+    ):
+        """
+        Initialize the batcher.
+
+        Args:
+            encode: Blocking function embedding a list of texts
+            executor: Executor running the encode calls
+            max_batch_size: Maximum queries per encode call
+            max_wait_ms: How long the first query of a batch waits for company
+        """
+        self.encode_batch = encode
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._stats = {"batches": 0, "queries": 0}
+
+    def start(self) -> None:
+        """Start the batching task on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancel the batching task."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+    async def encode(self, text: str) -> np.ndarray:
+        """
+        Embed one query, batched with queries arriving at the same time.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Embedding vector
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Requests arriving while this batch encodes form the next one
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = await loop.run_in_executor(self.executor, self.encode_batch, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self._stats["batches"] += 1
+            self._stats["queries"] += len(batch)
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+
+    def get_stats(self) -> Dict:
+        """
+        Get batching statistics.
+
+        Returns:
+            Dictionary with batch and query counts and the mean batch size
+        """
+        batches = self._stats["batches"]
+        return {
+            **self._stats,
+            "mean_batch_size": self._stats["queries"] / batches if batches else 0.0,
+        }
+
+
+def create_app(
+    rag: CustomRAG,
+    max_workers: int = 8,
+    max_batch_size: int = 64,
+    max_wait_ms: float = 5.0,
+    data_root: Optional[Path] = None
+) -> FastAPI:
+    """
+    Build the HTTP application serving a CustomRAG instance.
+
+    Endpoints: POST /retrieve, POST /query (NDJSON stream with "stream":
+    true), POST /index, GET /stats.
+
+    Args:
+        rag: CustomRAG with its collection already created
+        max_workers: Threads for blocking encoder, Chroma and Gemini calls
+        max_batch_size: Maximum queries embedded per encode call
+        max_wait_ms: Batching window for query embeddings
+        data_root: Directory POST /index may read from; relative paths are
+            resolved against it (None disables indexing)
+
+    Returns:
+        FastAPI application
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-service")
+    batcher = EmbeddingBatcher(rag.encode_queries, executor, max_batch_size, max_wait_ms)
+    # Chroma writes are serialized; reads run concurrently
+    index_lock = asyncio.Lock()
+    data_root = Path(data_root).resolve() if data_root is not None else None
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        batcher.start()
+        yield
+        await batcher.stop()
+        executor.shutdown(wait=True)
+
+    app = FastAPI(title="CustomRAG query service", lifespan=lifespan)
+
+    async def run_blocking(fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, lambda: fn(*args, **kwargs))
+
+    async def retrieve(request: RetrieveRequest) -> Dict:
+        embedding = await batcher.encode(request.query)
+        return await run_blocking(
+            rag.retrieve,
+            request.query,
+            top_k=request.top_k,
+            mmr=request.mmr,
+            mmr_lambda=request.mmr_lambda,
+            metadata_filter=request.metadata_filter,
+            query_embedding=embedding
+        )
+
+    @app.post("/retrieve")
+    async def retrieve_endpoint(request: RetrieveRequest) -> Dict:
+        try:
+            return await retrieve(request)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+
+    @app.post("/query")
+    async def query_endpoint(request: QueryRequest):
+        start_time = time.time()
+        try:
+            retrieval = await retrieve(request)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        retrieval_time = time.time() - start_time
+
+        if not request.stream:
+            generation_start = time.time()
+            response = await run_blocking(
+                rag.generate_answer,
+                request.query,
+                retrieval["documents"],
+                request.temperature
+            )
+            usage = response.usage_metadata
+            citations = rag.extract_citations(
+                response.text, retrieval["documents"], retrieval["metadatas"]
+            )
+            return {
+                "answer": response.text,
+                **retrieval,
+                "citations": citations.to_records(response.text or ""),
+                "metrics": {
+                    "retrieval_time": retrieval_time,
+                    "generation_time": time.time() - generation_start,
+                    "total_time": time.time() - start_time,
+                    "input_tokens": usage.prompt_token_count if usage else None,
+                    "output_tokens": usage.candidates_token_count if usage else None,
+                },
+            }
+
+        async def stream():
+            yield json.dumps({"type": "context", **retrieval}) + "\n"
+            chunks = rag.stream_answer(request.query, retrieval["documents"], request.temperature)
+            first_token_time = None
+            while True:
+                chunk = await run_blocking(next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk.text:
+                    first_token_time = first_token_time or time.time() - start_time
+                    yield json.dumps({"type": "delta", "text": chunk.text}) + "\n"
+            yield json.dumps({
+                "type": "done",
+                "metrics": {
+                    "retrieval_time": retrieval_time,
+                    "time_to_first_token": first_token_time,
+                    "total_time": time.time() - start_time,
+                },
+            }) + "\n"
+
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    @app.post("/index")
+    async def index_endpoint(request: IndexRequest) -> Dict:
+        if data_root is None:
+            raise HTTPException(status_code=403, detail="Indexing is disabled (no data root)")
+
+        # Only files under data_root may be read, whatever the request says
+        file_path = (data_root / request.file_path).resolve()
+        if not file_path.is_relative_to(data_root):
+            raise HTTPException(status_code=403, detail="Path is outside the data root")
+        if not file_path.is_file():
+            raise HTTPException(status_code=404, detail=f"File not found: {request.file_path}")
+
+        start_time = time.time()
+        try:
+            async with index_lock:
+                num_chunks = await run_blocking(
+                    rag.index_document,
+                    file_path,
+                    chunk_size=request.chunk_size,
+                    overlap=request.overlap,
+                    metadata=request.metadata
+                )
+                await run_blocking(rag.save_parents)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+        return {
+            "file_name": file_path.name,
+            "num_chunks": num_chunks,
+            "indexing_time": time.time() - start_time,
+        }
+
+    @app.get("/stats")
+    async def stats_endpoint() -> Dict:
+        stats = {"collection": rag.get_stats(), "batching": batcher.get_stats()}
+        if rag.query_cache is not None:
+            stats["query_cache"] = rag.query_cache.get_stats()
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a CustomRAG collection over HTTP")
+    parser.add_argument("--collection", default="custom_rag_baseline")
+    parser.add_argument("--persist-dir", type=Path, default=Path("models/custom_rag/chroma_db"))
+    parser.add_argument("--embedding-model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--llm-model", default="gemini-2.5-flash")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=8, help="Threads for blocking calls")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument(
+        "--snapshot", type=Path, default=None,
+        help="Load the collection from a snapshot bundle instead of persist-dir"
+    )
+    parser.add_argument(
+        "--data-root", type=Path, default=Path("data/raw"),
+        help="Directory POST /index may read documents from"
+    )
+    parser.add_argument(
+        "--shards", type=int, default=None,
+        help="Serve a collection hash-partitioned across this many shard processes"
+    )
+    args = parser.parse_args()
+    if args.snapshot and args.shards:
+        parser.error("--shards cannot be combined with --snapshot (snapshots load unsharded)")
+
+    rag = CustomRAG(
+        api_key=load_api_key("GOOGLE_API_KEY"),
+        embedding_model=args.embedding_model,
+        llm_model=args.llm_model,
+        persist_directory=args.persist_dir,
+        query_cache=QueryEmbeddingCache(),
+        parent_store=ParentStore()
+    )
+    if args.snapshot:
+        rag.load_snapshot(args.snapshot, collection_name=args.collection)
+    else:
+        rag.create_collection(args.collection, num_shards=args.shards)
+
+    app = create_app(rag, args.workers, args.max_batch_size, args.max_wait_ms, args.data_root)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
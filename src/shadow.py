@@ -0,0 +1,349 @@
+"""Shadow indexing for swapping CustomRAG embedding models without downtime"""
+
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from custom_rag import CustomRAG
+
+
+class ShadowIndexer:
+    """Build a shadow collection with a new model, compare it live, then cut over"""
+
+    def __init__(
+        self,
+        rag: CustomRAG,
+        embedding_model: str,
+        shadow_collection_name: Optional[str] = None,
+        sample_rate: float = 0.1,
+        encoder: Optional[SentenceTransformer] = None
+    ):
+        """
+        Initialize the shadow indexer.
+
+        Args:
+            rag: Live CustomRAG, with its collection already created
+            embedding_model: HuggingFace model for the shadow index
+            shadow_collection_name: Name of the shadow collection
+                (defaults to "<live>__<model>")
+            sample_rate: Fraction of live queries mirrored to the shadow index
+            encoder: Already-loaded encoder for embedding_model, if available
+        """
+        if rag.collection is None:
+            raise ValueError("Collection not created.")
+
+        self.embedding_model_name = embedding_model
+        self.sample_rate = sample_rate
+
+        slug = re.sub(r"[^a-zA-Z0-9._-]", "_", embedding_model.split("/")[-1])
+        # Chroma names must end with an alphanumeric character, also after truncation
+        self.shadow_collection_name = shadow_collection_name or re.sub(
+            r"[^a-zA-Z0-9]+$", "", f"{rag.collection.name}__{slug}"[:63]
+        )
+
+        # The shadow shares the live clients, caches and settings; only the
+        # encoder and collection differ. Copied chunks keep their parent_id
+        # and word-span metadata, so the live parent store serves both.
+        self.shadow = CustomRAG(
+            api_key=None,
+            embedding_model=embedding_model,
+            llm_model=rag.llm_model,
+            persist_directory=rag.persist_directory,
+            encoder=encoder,
+            chroma_client=rag.chroma_client,
+            llm_client=rag.llm_client,
+            query_cache=rag.query_cache,
+            prompt_cache=rag.prompt_cache,
+            rate_limiter=rag.rate_limiter,
+            parent_store=rag.parent_store
+        )
+        self.shadow.create_collection(
+            self.shadow_collection_name,
+            recreate=True,
+            hnsw=rag.index_params(),
+            num_shards=getattr(rag.collection, "num_shards", None)
+        )
+        self.shadow.pin_context(rag._pinned_filter, rag._pinned_documents)
+
+        # Single reference swapped atomically on switch_over()
+        self.live = rag
+        self.previous: Optional[CustomRAG] = None
+
+        self._build_thread: Optional[threading.Thread] = None
+        self._build_error: Optional[BaseException] = None
+        self._built = threading.Event()
+        self._progress = {"indexed": 0, "total": 0, "synced": 0}
+
+        self._mirror = ThreadPoolExecutor(max_workers=2)
+        self._lock = threading.Lock()
+        self._comparisons: List[Dict] = []
+
+    def _embed_upsert(self, ids: List[str], documents: List[str], metadatas: List[Dict]) -> None:
+        """Embed chunks with the new model and write them to the shadow collection."""
+        embeddings = self.shadow.embedding_model.encode(documents, show_progress_bar=False)
+        self.shadow.collection.upsert(
+            ids=ids,
+            documents=documents,
+            metadatas=metadatas,
+            embeddings=np.asarray(embeddings).tolist()
+        )
+
+    @staticmethod
+    def _read_all(collection, batch_size: int) -> Dict[str, tuple]:
+        """Chunk ID -> (document, metadata) of a whole collection."""
+        chunks = {}
+        offset = 0
+        while True:
+            page = collection.get(
+                limit=batch_size,
+                offset=offset,
+                include=["documents", "metadatas"]
+            )
+            if not page["ids"]:
+                return chunks
+            chunks.update(zip(page["ids"], zip(page["documents"], page["metadatas"])))
+            offset += len(page["ids"])
+
+    def sync(self, batch_size: int = 256) -> Dict:
+        """
+        Catch the shadow collection up with writes made to the live one.
+
+        Chunks added to or changed in the live collection since they were
+        copied are re-embedded; chunks deleted from it are deleted from the
+        shadow.
+
+        Args:
+            batch_size: Chunks read, embedded and written per step
+
+        Returns:
+            Dictionary with the number of upserted and deleted chunks
+        """
+        live = self._read_all(self.live.collection, batch_size)
+        shadow = self._read_all(self.shadow.collection, batch_size)
+
+        changed = [chunk_id for chunk_id, chunk in live.items() if shadow.get(chunk_id) != chunk]
+        deleted = [chunk_id for chunk_id in shadow if chunk_id not in live]
+
+        for start in range(0, len(changed), batch_size):
+            ids = changed[start:start + batch_size]
+            self._embed_upsert(ids, [live[i][0] for i in ids], [live[i][1] for i in ids])
+        for start in range(0, len(deleted), batch_size):
+            self.shadow.collection.delete(ids=deleted[start:start + batch_size])
+
+        self._progress["synced"] += len(changed) + len(deleted)
+        return {"upserted": len(changed), "deleted": len(deleted)}
+
+    def _build(self, batch_size: int) -> None:
+        """Copy chunks from the live collection and re-embed them with the new model."""
+        try:
+            source = self.live.collection
+            self._progress["total"] = source.count()
+
+            offset = 0
+            while True:
+                page = source.get(
+                    limit=batch_size,
+                    offset=offset,
+                    include=["documents", "metadatas"]
+                )
+                if not page["ids"]:
+                    break
+
+                self._embed_upsert(page["ids"], page["documents"], page["metadatas"])
+
+                offset += len(page["ids"])
+                self._progress["indexed"] = offset
+        except BaseException as e:
+            self._build_error = e
+        finally:
+            self._built.set()
+
+    def start(self, batch_size: int = 256) -> None:
+        """
+        Start building the shadow collection in a background thread.
+
+        Args:
+            batch_size: Chunks read, embedded and written per step
+        """
+        if self._build_thread is not None:
+            raise RuntimeError("Shadow build already started")
+
+        self._build_thread = threading.Thread(
+            target=self._build,
+            args=(batch_size,),
+            name="shadow-index-build",
+            daemon=True
+        )
+        self._build_thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the shadow build to finish.
+
+        Args:
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Returns:
+            True if the build finished
+
+        Raises:
+            RuntimeError: If the build failed
+        """
+        finished = self._built.wait(timeout)
+        if self._build_error is not None:
+            raise RuntimeError("Shadow build failed") from self._build_error
+        return finished
+
+    @property
+    def ready(self) -> bool:
+        """Whether the shadow collection is fully built."""
+        return self._built.is_set() and self._build_error is None
+
+    def _compare(self, query: str, top_k: int, live_result: Dict, live_ms: float, kwargs: Dict) -> None:
+        """Run a mirrored query on the shadow and record the comparison."""
+        try:
+            start = time.perf_counter()
+            shadow_result = self.shadow.retrieve(query, top_k, **kwargs)
+            shadow_ms = (time.perf_counter() - start) * 1000
+        except Exception:
+            return
+
+        # Chunks are identified by (source_file, chunk_id) in both collections
+        live_ids = {
+            (m.get("source_file"), m.get("chunk_id")) for m in live_result["metadatas"]
+        }
+        shadow_ids = {
+            (m.get("source_file"), m.get("chunk_id")) for m in shadow_result["metadatas"]
+        }
+        union = live_ids | shadow_ids
+
+        with self._lock:
+            self._comparisons.append({
+                "live_ms": live_ms,
+                "shadow_ms": shadow_ms,
+                "overlap": len(live_ids & shadow_ids) / len(union) if union else 1.0,
+            })
+
+    def retrieve(self, query: str, top_k: int = 5, **kwargs) -> Dict:
+        """
+        Retrieve from the live index, mirroring a sample of queries to the shadow.
+
+        Mirrored queries run in the background and never delay the live result.
+
+        Args:
+            query: User query
+            top_k: Number of chunks to retrieve
+            **kwargs: Additional arguments for CustomRAG.retrieve
+
+        Returns:
+            Live retrieval result
+        """
+        live = self.live
+        start = time.perf_counter()
+        result = live.retrieve(query, top_k, **kwargs)
+        live_ms = (time.perf_counter() - start) * 1000
+
+        if self.previous is None and self.ready and random.random() < self.sample_rate:
+            self._mirror.submit(self._compare, query, top_k, result, live_ms, kwargs)
+
+        return result
+
+    def query(self, query: str, **kwargs) -> Dict:
+        """
+        End-to-end RAG query served by the live index.
+
+        Args:
+            query: User query
+            **kwargs: Additional arguments for CustomRAG.query
+
+        Returns:
+            Dictionary with answer, context, and metrics
+        """
+        return self.live.query(query, **kwargs)
+
+    def report(self) -> Dict:
+        """
+        Summarize mirrored query comparisons and build progress.
+
+        Returns:
+            Dictionary with build progress, latency percentiles and result overlap
+        """
+        with self._lock:
+            comparisons = list(self._comparisons)
+
+        summary = {
+            "shadow_collection": self.shadow_collection_name,
+            "embedding_model": self.embedding_model_name,
+            "ready": self.ready,
+            **self._progress,
+            "mirrored_queries": len(comparisons),
+        }
+        if comparisons:
+            live_ms = np.array([c["live_ms"] for c in comparisons])
+            shadow_ms = np.array([c["shadow_ms"] for c in comparisons])
+            overlap = np.array([c["overlap"] for c in comparisons])
+            summary.update({
+                "live_p50_ms": float(np.median(live_ms)),
+                "live_p95_ms": float(np.percentile(live_ms, 95)),
+                "shadow_p50_ms": float(np.median(shadow_ms)),
+                "shadow_p95_ms": float(np.percentile(shadow_ms, 95)),
+                "mean_overlap": float(overlap.mean()),
+            })
+        return summary
+
+    def switch_over(self, batch_size: int = 256, max_sync_passes: int = 3) -> CustomRAG:
+        """
+        Atomically make the shadow index the live one.
+
+        Live writes made during or after the build are first copied over by
+        sync() passes, repeated until a pass finds nothing left to copy (or
+        max_sync_passes is reached). Writes should be paused for the cutover
+        to be exact.
+
+        Args:
+            batch_size: Chunks read, embedded and written per sync step
+            max_sync_passes: Maximum catch-up passes before cutting over
+
+        Returns:
+            The new live CustomRAG
+
+        Raises:
+            RuntimeError: If the shadow build has not finished successfully
+        """
+        if not self.ready:
+            raise RuntimeError("Shadow index is not ready; call wait() first")
+
+        for _ in range(max_sync_passes):
+            synced = self.sync(batch_size)
+            if not synced["upserted"] and not synced["deleted"]:
+                break
+
+        # Persist the parent store under the shadow collection's name too
+        self.shadow.save_parents()
+
+        with self._lock:
+            self.previous, self.live = self.live, self.shadow
+        return self.live
+
+    def rollback(self) -> CustomRAG:
+        """
+        Restore the index that was live before switch_over().
+
+        Returns:
+            The restored live CustomRAG
+        """
+        with self._lock:
+            if self.previous is None:
+                raise RuntimeError("Nothing to roll back")
+            self.live, self.previous = self.previous, None
+        return self.live
+
+    def close(self) -> None:
+        """Stop mirroring queries."""
+        self._mirror.shutdown(wait=True)
@@ -0,0 +1,344 @@
+"""Hash-partitioned Chroma collections with one worker process per shard"""
+
+import hashlib
+import json
+import multiprocessing
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from hnsw import hnsw_configuration
+
+# Name of the file recording a sharded layout inside its directory
+LAYOUT_FILE = "shards.json"
+
+# Collection of the current shard worker process
+_collection = None
+
+
+def shard_of(chunk_id: str, num_shards: int) -> int:
+    """
+    Stable shard assignment of a chunk ID.
+
+    Args:
+        chunk_id: Chunk ID
+        num_shards: Number of shards
+
+    Returns:
+        Shard index in [0, num_shards)
+    """
+    digest = hashlib.blake2b(chunk_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % num_shards
+
+
+def _open_shard(
+    path: Optional[str],
+    name: str,
+    metadata: Optional[Dict],
+    configuration: Dict,
+    recreate: bool
+) -> None:
+    """Worker initializer: open (or create) this process's shard collection."""
+    global _collection
+    import chromadb
+    from chromadb.config import Settings
+
+    settings = Settings(anonymized_telemetry=False)
+    client = (
+        chromadb.PersistentClient(path=path, settings=settings)
+        if path else chromadb.EphemeralClient(settings=settings)
+    )
+    if recreate:
+        try:
+            client.delete_collection(name=name)
+        except Exception:
+            pass
+    _collection = client.get_or_create_collection(
+        name=name, metadata=metadata, configuration=configuration
+    )
+
+
+def _call(method: str, kwargs: Dict):
+    """Worker task: run one collection method on this process's shard."""
+    result = getattr(_collection, method)(**kwargs)
+    if method in ("get", "query"):
+        # Drop non-picklable / unused fields of Chroma result objects
+        return {key: value for key, value in dict(result).items() if key != "included"}
+    return result
+
+
+def _shard_attributes() -> Dict:
+    return {
+        "metadata": _collection.metadata,
+        "configuration": {"hnsw": (_collection.configuration or {}).get("hnsw")},
+    }
+
+
+class ShardedCollection:
+    """
+    A Chroma collection split across N shards, each owned by a worker process.
+
+    Chunks are assigned to shards by a hash of their ID. Writes are
+    partitioned and applied to all shards in parallel; queries fan out to
+    every shard and the per-shard top-k lists are merged by distance. The
+    class implements the subset of the Chroma Collection interface used by
+    CustomRAG, snapshots and evaluation (add, upsert, query, get, delete,
+    count, modify, name, metadata, configuration).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        num_shards: int,
+        directory: Optional[Path] = None,
+        hnsw: Optional[Dict] = None,
+        metadata: Optional[Dict] = None,
+        recreate: bool = False
+    ):
+        """
+        Start the shard workers and open their collections.
+
+        Args:
+            name: Collection name (the same in every shard)
+            num_shards: Number of shards / worker processes
+            directory: Parent directory of the per-shard persist directories
+                (shard-00, shard-01, ...); None keeps shards in memory
+            hnsw: HNSW parameters of new shard collections
+            metadata: Metadata of new shard collections
+            recreate: Delete existing shard data first
+
+        Raises:
+            ValueError: If directory holds a layout with another shard count
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        self.name = name
+        self.num_shards = num_shards
+        self.directory = Path(directory) if directory else None
+
+        if self.directory is not None:
+            self._check_layout(recreate)
+
+        # One single-process pool per shard pins every shard to its own process
+        context = multiprocessing.get_context("spawn")
+        self._workers = [
+            ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=context,
+                initializer=_open_shard,
+                initargs=(
+                    str(self.directory / f"shard-{shard:02d}") if self.directory else None,
+                    name,
+                    metadata or None,
+                    hnsw_configuration(hnsw),
+                    recreate,
+                )
+            )
+            for shard in range(num_shards)
+        ]
+        attributes = self._broadcast_fn(_shard_attributes)[0]
+        self.metadata = attributes["metadata"]
+        self.configuration = attributes["configuration"]
+
+    def _check_layout(self, recreate: bool) -> None:
+        """Refuse to reopen shards with a different partitioning."""
+        layout_path = self.directory / LAYOUT_FILE
+        if recreate and self.directory.exists():
+            shutil.rmtree(self.directory)
+        if layout_path.exists():
+            with open(layout_path, "r") as f:
+                layout = json.load(f)
+            if layout["num_shards"] != self.num_shards:
+                raise ValueError(
+                    f"{self.directory} holds {layout['num_shards']} shards, "
+                    f"not {self.num_shards}; re-index or reshard from a snapshot"
+                )
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(layout_path, "w") as f:
+            json.dump({"name": self.name, "num_shards": self.num_shards}, f, indent=2)
+
+    def _broadcast_fn(self, fn, *args) -> List:
+        futures = [worker.submit(fn, *args) for worker in self._workers]
+        return [future.result() for future in futures]
+
+    def _broadcast(self, method: str, **kwargs) -> List:
+        return self._broadcast_fn(_call, method, kwargs)
+
+    def _partition(self, ids: Sequence[str]) -> Dict[int, np.ndarray]:
+        """Positions of the given IDs, grouped by owning shard."""
+        shards = np.fromiter((shard_of(i, self.num_shards) for i in ids), np.int64, len(ids))
+        return {
+            shard: np.flatnonzero(shards == shard)
+            for shard in np.unique(shards).tolist()
+        }
+
+    def _routed(self, method: str, ids: Sequence[str], **kwargs) -> List:
+        """Run a method on the shards owning the given IDs, with the same other arguments."""
+        ids = list(ids)
+        futures = [
+            self._workers[shard].submit(
+                _call, method, {"ids": [ids[p] for p in positions], **kwargs}
+            )
+            for shard, positions in self._partition(ids).items()
+        ]
+        return [future.result() for future in futures]
+
+    def _write(self, method: str, ids: Sequence[str], **fields) -> None:
+        ids = list(ids)
+        futures = []
+        for shard, positions in self._partition(ids).items():
+            kwargs = {"ids": [ids[p] for p in positions]}
+            for field, values in fields.items():
+                if values is None:
+                    continue
+                if isinstance(values, np.ndarray):
+                    kwargs[field] = values[positions]
+                else:
+                    kwargs[field] = [values[p] for p in positions]
+            futures.append(self._workers[shard].submit(_call, method, kwargs))
+        for future in futures:
+            future.result()
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None, **kwargs) -> None:
+        """Add chunks, each to the shard owning its ID."""
+        self._write("add", ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None, **kwargs) -> None:
+        """Insert or update chunks, each in the shard owning its ID."""
+        self._write("upsert", ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def count(self) -> int:
+        """Total chunks across shards."""
+        return sum(self._broadcast("count"))
+
+    def query(
+        self,
+        query_embeddings,
+        n_results: int = 10,
+        where: Optional[Dict] = None,
+        include: Sequence[str] = ("metadatas", "documents", "distances"),
+        **kwargs
+    ) -> Dict:
+        """
+        Query every shard in parallel and merge the top-k lists by distance.
+
+        Returns:
+            Chroma-style query result with one list per query
+        """
+        fields = list(include)
+        shard_results = self._broadcast(
+            "query",
+            query_embeddings=np.asarray(query_embeddings, dtype=np.float32),
+            n_results=n_results,
+            where=where,
+            # Distances are needed for the merge even if not requested
+            include=sorted(set(fields) | {"distances"})
+        )
+
+        merged = {"ids": [], **{field: [] for field in fields}}
+        for q in range(len(shard_results[0]["ids"])):
+            distances = np.concatenate([
+                np.asarray(result["distances"][q], dtype=np.float64) for result in shard_results
+            ])
+            order = np.argsort(distances, kind="stable")[:n_results]
+            for field in merged:
+                column = [value for result in shard_results for value in result[field][q]]
+                merged[field].append([column[i] for i in order])
+        return merged
+
+    def get(
+        self,
+        ids: Optional[Sequence[str]] = None,
+        where: Optional[Dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Sequence[str] = ("metadatas", "documents"),
+        **kwargs
+    ) -> Dict:
+        """
+        Get chunks by ID or filter.
+
+        Without IDs or a filter, limit/offset page through the shards in
+        order, so full scans (e.g. snapshot export) stay streaming. Otherwise
+        they apply to the combined matches, in shard order.
+        """
+        fields = list(include)
+        if ids is None and where is None and (limit is not None or offset):
+            return self._concat(self._page(limit, offset or 0, fields), fields)
+
+        if ids is not None:
+            results = self._routed("get", ids, where=where, include=fields)
+        else:
+            results = self._broadcast("get", where=where, include=fields)
+        start = offset or 0
+        end = None if limit is None else start + limit
+        combined = self._concat(results, fields)
+        return {field: values[start:end] for field, values in combined.items()}
+
+    def _page(self, limit: Optional[int], offset: int, fields: List[str]) -> List[Dict]:
+        """Read a global [offset, offset + limit) window, shard by shard."""
+        results = []
+        for worker, count in zip(self._workers, self._broadcast("count")):
+            if limit is not None and limit <= 0:
+                break
+            if offset >= count:
+                offset -= count
+                continue
+            page = worker.submit(
+                _call, "get", {"limit": limit, "offset": offset, "include": fields}
+            ).result()
+            results.append(page)
+            offset = 0
+            if limit is not None:
+                limit -= len(page["ids"])
+        return results
+
+    @staticmethod
+    def _concat(results: List[Dict], fields: List[str]) -> Dict:
+        merged = {"ids": [], **{field: [] for field in fields}}
+        for result in results:
+            for field in merged:
+                merged[field].extend(result[field])
+        if "embeddings" in merged:
+            merged["embeddings"] = np.asarray(merged["embeddings"])
+        return merged
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict] = None) -> None:
+        """Delete chunks by ID (routed to their shards) and/or filter (all shards)."""
+        if ids is not None:
+            self._routed("delete", ids, where=where)
+        else:
+            self._broadcast("delete", where=where)
+
+    def modify(
+        self,
+        metadata: Optional[Dict] = None,
+        configuration: Optional[Dict] = None,
+        name: Optional[str] = None
+    ) -> None:
+        """Apply a metadata, configuration or name change to every shard."""
+        kwargs = {
+            key: value
+            for key, value in (("metadata", metadata), ("configuration", configuration), ("name", name))
+            if value is not None
+        }
+        self._broadcast("modify", **kwargs)
+        attributes = self._broadcast_fn(_shard_attributes)[0]
+        self.metadata = attributes["metadata"]
+        self.configuration = attributes["configuration"]
+        self.name = name or self.name
+
+    def close(self) -> None:
+        """Stop the shard worker processes."""
+        for worker in self._workers:
+            worker.shutdown(wait=True)
+
+    def __enter__(self) -> "ShardedCollection":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,312 @@
+"""Portable snapshots of Chroma collections as single Parquet bundles"""
+
+import hashlib
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from hnsw import hnsw_configuration, hnsw_params
+from parents import ParentStore
+
+SNAPSHOT_FORMAT_VERSION = 1
+# Parquet key-value metadata entry holding the manifest
+MANIFEST_KEY = b"rag_snapshot_manifest"
+
+
+class _Checksums:
+    """Per-column SHA-256 digests, independent of batch boundaries."""
+
+    def __init__(self):
+        self.hashes = {
+            name: hashlib.sha256() for name in ("ids", "documents", "metadatas", "embeddings")
+        }
+
+    def update(self, ids, documents, metadatas, embeddings: np.ndarray) -> None:
+        for name, values in (("ids", ids), ("documents", documents), ("metadatas", metadatas)):
+            digest = self.hashes[name]
+            for value in values:
+                digest.update(value.encode("utf-8"))
+                digest.update(b"\x00")
+        self.hashes["embeddings"].update(np.ascontiguousarray(embeddings, dtype="<f4").tobytes())
+
+    def hexdigests(self) -> Dict[str, str]:
+        return {name: digest.hexdigest() for name, digest in self.hashes.items()}
+
+
+def _schema(dim: int) -> pa.Schema:
+    return pa.schema([
+        ("id", pa.string()),
+        ("document", pa.string()),
+        ("metadata", pa.string()),
+        ("embedding", pa.list_(pa.float32(), dim)),
+    ])
+
+
+def parents_path(bundle_path: Path) -> Path:
+    """Path of the parent store written alongside a bundle."""
+    bundle_path = Path(bundle_path)
+    return bundle_path.with_name(f"{bundle_path.stem}.parents.parquet")
+
+
+def export_collection(
+    collection,
+    output_path: Path,
+    embedding_model: str,
+    batch_size: int = 5000,
+    parent_store: Optional[ParentStore] = None
+) -> Dict:
+    """
+    Write a collection's chunks, metadata and embeddings to one Parquet bundle.
+
+    The bundle is streamed one row group per batch and written atomically.
+    Its manifest (model, dimension, count, HNSW parameters, checksums) is
+    stored in the Parquet footer. A non-empty parent store is written next
+    to the bundle (see parents_path()) and recorded in the manifest.
+
+    Args:
+        collection: Chroma collection to export
+        output_path: Bundle path (e.g. models/custom_rag/snapshots/policies.parquet)
+        embedding_model: Model that produced the embeddings
+        batch_size: Chunks read from Chroma per batch
+        parent_store: Parent segments referenced by the chunks' parent_id
+
+    Returns:
+        The manifest dictionary
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = output_path.with_suffix(".tmp")
+
+    checksums = _Checksums()
+    writer = None
+    dim = None
+    count = 0
+
+    try:
+        offset = 0
+        while True:
+            page = collection.get(
+                limit=batch_size,
+                offset=offset,
+                include=["documents", "metadatas", "embeddings"]
+            )
+            if not len(page["ids"]):
+                break
+
+            ids = list(page["ids"])
+            documents = [document or "" for document in page["documents"]]
+            metadatas = [json.dumps(m or {}, sort_keys=True) for m in page["metadatas"]]
+            embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+
+            if writer is None:
+                dim = embeddings.shape[1]
+                writer = pq.ParquetWriter(tmp_path, _schema(dim), compression="zstd")
+
+            checksums.update(ids, documents, metadatas, embeddings)
+            writer.write_table(pa.table(
+                {
+                    "id": ids,
+                    "document": documents,
+                    "metadata": metadatas,
+                    "embedding": pa.FixedSizeListArray.from_arrays(embeddings.reshape(-1), dim),
+                },
+                schema=_schema(dim)
+            ))
+
+            count += len(ids)
+            offset += len(ids)
+
+        if writer is None:
+            raise ValueError(f"Collection is empty: {collection.name}")
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "collection_name": collection.name,
+            "collection_metadata": collection.metadata or {},
+            "hnsw": hnsw_params(collection),
+            "embedding_model": embedding_model,
+            "embedding_dim": dim,
+            "count": count,
+            "checksums": checksums.hexdigests(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        if parent_store is not None and len(parent_store):
+            parent_store.save(parents_path(output_path))
+            manifest["parents"] = {
+                "file": parents_path(output_path).name,
+                "count": len(parent_store),
+            }
+        writer.add_key_value_metadata({MANIFEST_KEY: json.dumps(manifest).encode("utf-8")})
+        writer.close()
+        writer = None
+        tmp_path.replace(output_path)
+        return manifest
+    finally:
+        if writer is not None:
+            writer.close()
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def read_manifest(bundle_path: Path) -> Dict:
+    """
+    Read a bundle's manifest without loading its rows.
+
+    Args:
+        bundle_path: Path to a snapshot bundle
+
+    Returns:
+        Manifest dictionary
+
+    Raises:
+        ValueError: If the file is not a snapshot bundle
+    """
+    metadata = pq.read_metadata(bundle_path).metadata or {}
+    if MANIFEST_KEY not in metadata:
+        raise ValueError(f"Not a snapshot bundle: {bundle_path}")
+
+    manifest = json.loads(metadata[MANIFEST_KEY])
+    if manifest["format_version"] > SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version: {manifest['format_version']}")
+    return manifest
+
+
+def load_parents(bundle_path: Path) -> Optional[ParentStore]:
+    """
+    Read the parent store exported with a bundle.
+
+    Args:
+        bundle_path: Path to a snapshot bundle
+
+    Returns:
+        ParentStore, or None if the bundle was exported without one
+
+    Raises:
+        ValueError: If the parent store is missing or incomplete
+    """
+    manifest = read_manifest(bundle_path)
+    if "parents" not in manifest:
+        return None
+
+    path = Path(bundle_path).with_name(manifest["parents"]["file"])
+    if not path.exists():
+        raise ValueError(f"Snapshot parent store is missing: {path}")
+    parent_store = ParentStore.load(path)
+    if len(parent_store) != manifest["parents"]["count"]:
+        raise ValueError(f"Snapshot verification failed: {path}")
+    return parent_store
+
+
+def iter_bundle(
+    bundle_path: Path,
+    batch_size: int = 5000
+) -> Iterator[Tuple[list, list, list, np.ndarray]]:
+    """
+    Stream (ids, documents, metadatas, embeddings) batches from a bundle.
+
+    Args:
+        bundle_path: Path to a snapshot bundle
+        batch_size: Rows per batch
+
+    Yields:
+        Tuples of id list, document list, metadata JSON list and an
+        embedding array of shape (batch, dim)
+    """
+    parquet_file = pq.ParquetFile(bundle_path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        embedding_column = batch.column("embedding")
+        # Fixed-size list values are contiguous: reshape without copying row by row
+        embeddings = embedding_column.values.to_numpy(zero_copy_only=False).reshape(
+            len(batch), embedding_column.type.list_size
+        )
+        yield (
+            batch.column("id").to_pylist(),
+            batch.column("document").to_pylist(),
+            batch.column("metadata").to_pylist(),
+            embeddings,
+        )
+
+
+def import_collection(
+    bundle_path: Path,
+    chroma_client,
+    collection_name: Optional[str] = None,
+    batch_size: int = 5000,
+    expected_embedding_model: Optional[str] = None
+):
+    """
+    Bulk-load a bundle into a fresh collection, reusing its stored embeddings.
+
+    The bundle is loaded under a temporary name and verified before it
+    replaces the target collection, so a corrupted bundle leaves the
+    existing collection untouched.
+
+    Args:
+        bundle_path: Path to a snapshot bundle
+        chroma_client: Chroma client to load into
+        collection_name: Target collection (defaults to the exported name);
+            an existing collection with that name is replaced
+        batch_size: Chunks added to Chroma per call
+        expected_embedding_model: Refuse bundles embedded with another model
+
+    Returns:
+        The loaded Chroma collection
+
+    Raises:
+        ValueError: On model mismatch or checksum/count verification failure
+    """
+    manifest = read_manifest(bundle_path)
+    if expected_embedding_model and manifest["embedding_model"] != expected_embedding_model:
+        raise ValueError(
+            f"Snapshot was embedded with {manifest['embedding_model']}, "
+            f"expected {expected_embedding_model}"
+        )
+
+    name = collection_name or manifest["collection_name"]
+    # Load under a temporary name; the existing collection survives a failed import
+    tmp_name = f"{name}-import-{uuid.uuid4().hex[:8]}"
+    if "hnsw" in manifest:
+        collection = chroma_client.create_collection(
+            name=tmp_name,
+            metadata=manifest["collection_metadata"] or None,
+            configuration=hnsw_configuration(manifest["hnsw"])
+        )
+    else:
+        # Bundles written before HNSW parameters were recorded
+        collection = chroma_client.create_collection(
+            name=tmp_name,
+            metadata=manifest["collection_metadata"] or {"hnsw:space": "cosine"}
+        )
+
+    checksums = _Checksums()
+    count = 0
+    try:
+        for ids, documents, metadatas, embeddings in iter_bundle(bundle_path, batch_size):
+            checksums.update(ids, documents, metadatas, embeddings)
+            collection.add(
+                ids=ids,
+                documents=documents,
+                metadatas=[json.loads(m) or None for m in metadatas],
+                embeddings=embeddings
+            )
+            count += len(ids)
+
+        if count != manifest["count"] or checksums.hexdigests() != manifest["checksums"]:
+            raise ValueError(f"Snapshot verification failed: {bundle_path}")
+    except Exception:
+        chroma_client.delete_collection(name=tmp_name)
+        raise
+
+    # Verified: replace the existing collection
+    try:
+        chroma_client.delete_collection(name=name)
+    except Exception:
+        pass
+    collection.modify(name=name)
+    return collection
@@ -0,0 +1,318 @@
+"""Local registry of GFS file search stores and the files uploaded to them"""
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from google.genai import types
+
+from data_loader import compute_file_hash
+from gfs_client import GFSClient
+
+# Custom metadata key tagging uploaded documents with their content hash
+CONTENT_HASH_KEY = "content_hash"
+
+
+class StoreRegistry:
+    """Cached, persisted view of GFS stores with content-hash deduplication"""
+
+    def __init__(
+        self,
+        gfs: GFSClient,
+        registry_path: Path,
+        ttl_seconds: float = 300.0
+    ):
+        """
+        Initialize the registry, loading any persisted state.
+
+        Args:
+            gfs: GFSClient used to list, create and upload to stores
+            registry_path: JSON file where the registry is persisted
+            ttl_seconds: Age after which the cached store listing is refreshed
+        """
+        self.gfs = gfs
+        self.registry_path = Path(registry_path)
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.RLock()
+        self._stores: Dict[str, Dict] = {}
+        self._by_display_name: Dict[str, str] = {}
+        self._refreshed_at = 0.0
+        # (store_name, file_hash) -> event set when an in-flight upload ends
+        self._uploading: Dict[Tuple[str, str], threading.Event] = {}
+        # Persisted hashes are checked against every store on the first refresh,
+        # even within the TTL
+        self._reconciled = False
+
+        self._load()
+
+    def _load(self) -> None:
+        """Load persisted registry state, if any."""
+        if not self.registry_path.exists():
+            return
+
+        with open(self.registry_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        self._stores = data.get("stores", {})
+        self._refreshed_at = data.get("refreshed_at", 0.0)
+        self._reindex()
+
+    def _save(self) -> None:
+        """Persist registry state atomically."""
+        self.registry_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.registry_path.with_suffix(".tmp")
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"refreshed_at": self._refreshed_at, "stores": self._stores},
+                f,
+                indent=2
+            )
+        tmp_path.replace(self.registry_path)
+
+    def _reindex(self) -> None:
+        """Rebuild the display name -> store name index."""
+        self._by_display_name = {
+            entry["display_name"]: store_name
+            for store_name, entry in self._stores.items()
+            if entry.get("display_name")
+        }
+
+    def _update_entry(self, store: types.FileSearchStore) -> Dict:
+        """Insert or refresh the cached entry for a store, keeping its hashes."""
+        entry = self._stores.setdefault(store.name, {"content_hashes": {}})
+        entry.update({
+            "display_name": store.display_name,
+            "active_documents_count": int(store.active_documents_count or 0),
+            "pending_documents_count": int(store.pending_documents_count or 0),
+            "failed_documents_count": int(store.failed_documents_count or 0),
+            "size_bytes": int(store.size_bytes or 0),
+        })
+        return entry
+
+    def reconcile(self, store_name: str) -> None:
+        """
+        Rebuild a store's content hashes from its remote document list.
+
+        Hashes of documents deleted remotely are dropped, and documents
+        tagged with a content hash by upload_if_new() are added. Documents
+        uploaded before tagging keep their hash while a document with the
+        recorded file name still exists.
+
+        Args:
+            store_name: Name of the store
+        """
+        with self._lock:
+            entry = self._stores.get(store_name)
+            if entry is None:
+                return
+
+            hashes: Dict[str, str] = {}
+            untagged = set()
+            for document in self.gfs.iter_store_documents(store_name, prefetch=True):
+                tags = {
+                    metadata.key: metadata.string_value
+                    for metadata in document.custom_metadata or []
+                }
+                if tags.get(CONTENT_HASH_KEY):
+                    hashes[tags[CONTENT_HASH_KEY]] = document.display_name
+                else:
+                    untagged.add(document.display_name)
+
+            for file_hash, file_name in entry.get("content_hashes", {}).items():
+                if file_hash not in hashes and file_name in untagged:
+                    hashes[file_hash] = file_name
+            entry["content_hashes"] = hashes
+            self._save()
+
+    def is_stale(self) -> bool:
+        """Whether the cached store listing is older than the TTL."""
+        return time.time() - self._refreshed_at > self.ttl_seconds
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Refresh cached store metadata from the API when stale.
+
+        Stores that no longer exist remotely are dropped from the registry.
+        The first refresh after loading (and every forced one) reconciles
+        each store's content hashes with its document list (see
+        reconcile()); later ones only reconcile stores whose active
+        document count no longer matches the recorded hashes.
+
+        Args:
+            force: Refresh even if the cache is still within its TTL
+        """
+        with self._lock:
+            if not force and not self.is_stale() and self._reconciled:
+                return
+
+            seen = set()
+            for store in self.gfs.iter_stores(prefetch=True):
+                self._update_entry(store)
+                seen.add(store.name)
+
+            for store_name in list(self._stores):
+                if store_name not in seen:
+                    del self._stores[store_name]
+
+            for store_name, entry in self._stores.items():
+                if (
+                    force
+                    or not self._reconciled
+                    or entry["active_documents_count"] != len(entry.get("content_hashes", {}))
+                ):
+                    self.reconcile(store_name)
+            self._reconciled = True
+
+            self._refreshed_at = time.time()
+            self._reindex()
+            self._save()
+
+    def get(self, display_name: str) -> Optional[Dict]:
+        """
+        Look up a store by display name.
+
+        Args:
+            display_name: Human-readable store name
+
+        Returns:
+            Registry entry including "store_name", or None if unknown
+        """
+        with self._lock:
+            self.refresh()
+            store_name = self._by_display_name.get(display_name)
+            if store_name is None:
+                return None
+            return {"store_name": store_name, **self._stores[store_name]}
+
+    def get_or_create(self, display_name: str) -> str:
+        """
+        Get the store with a display name, creating it if needed.
+
+        Args:
+            display_name: Human-readable store name
+
+        Returns:
+            Store name
+        """
+        with self._lock:
+            self.refresh()
+            store_name = self._by_display_name.get(display_name)
+            if store_name is not None:
+                return store_name
+
+            store = self.gfs.create_file_search_store(display_name=display_name)
+            self._update_entry(store)
+            self._by_display_name[display_name] = store.name
+            self._save()
+            return store.name
+
+    def has_file(self, store_name: str, file_hash: str) -> bool:
+        """
+        Check whether content with a given hash was uploaded to a store.
+
+        Args:
+            store_name: Name of the store
+            file_hash: SHA-256 hash from compute_file_hash()
+
+        Returns:
+            True if the content is already in the store
+        """
+        with self._lock:
+            entry = self._stores.get(store_name, {})
+            return file_hash in entry.get("content_hashes", {})
+
+    def upload_if_new(
+        self,
+        store_name: str,
+        file_path: Path,
+        **kwargs
+    ) -> Optional[types.Operation]:
+        """
+        Upload a file unless identical content is already in the store.
+
+        The content hash is recorded only once the upload has finished
+        indexing without error, and is also stored as the document's
+        "content_hash" custom metadata so reconcile() can recover it.
+
+        Args:
+            store_name: Name of the store
+            file_path: Path to file
+            **kwargs: Additional arguments for GFSClient.upload_to_store
+
+        Returns:
+            Upload operation, or None if the upload was skipped
+        """
+        file_path = Path(file_path)
+        file_hash = compute_file_hash(file_path)
+        key = (store_name, file_hash)
+
+        # Reserve the content hash so concurrent callers upload it only once
+        while True:
+            with self._lock:
+                if self.has_file(store_name, file_hash):
+                    return None
+                pending = self._uploading.get(key)
+                if pending is None:
+                    self._uploading[key] = threading.Event()
+                    break
+            # Another caller is uploading this content; re-check once it ends
+            pending.wait()
+
+        try:
+            custom_metadata = {
+                **(kwargs.pop("custom_metadata", None) or {}),
+                CONTENT_HASH_KEY: file_hash,
+            }
+            operation = self.gfs.upload_to_store(
+                store_name, file_path, custom_metadata=custom_metadata, **kwargs
+            )
+
+            # Only content that finished indexing counts as present; pending or
+            # failed uploads are retried by the next call
+            if operation.done and not getattr(operation, "error", None):
+                with self._lock:
+                    entry = self._stores.setdefault(store_name, {"content_hashes": {}})
+                    entry.setdefault("content_hashes", {})[file_hash] = file_path.name
+                    entry["active_documents_count"] = entry.get("active_documents_count", 0) + 1
+                    self._save()
+        finally:
+            with self._lock:
+                self._uploading.pop(key).set()
+
+        return operation
+
+    def delete_documents(
+        self,
+        store_name: str,
+        document_names: Iterable[str],
+        max_workers: int = 8
+    ) -> Dict[str, Optional[str]]:
+        """
+        Delete documents from a store and forget their content hashes.
+
+        Args:
+            store_name: Name of the store holding the documents
+            document_names: Full document names to delete
+            max_workers: Maximum concurrent delete requests
+
+        Returns:
+            Dictionary mapping document name to error message (None on success)
+        """
+        errors = self.gfs.bulk_delete_documents(document_names, max_workers=max_workers)
+        self.reconcile(store_name)
+        return errors
+
+    def list_entries(self) -> Dict[str, Dict]:
+        """
+        Get all cached store entries.
+
+        Returns:
+            Dictionary mapping store name to its cached metadata
+        """
+        with self._lock:
+            self.refresh()
+            return {name: dict(entry) for name, entry in self._stores.items()}
@@ -0,0 +1,282 @@
+"""Parameter sweeps over chunking, retrieval depth and embedding model"""
+
+import hashlib
+import itertools
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import chromadb
+import numpy as np
+import polars as pl
+from chromadb.config import Settings
+
+from custom_rag import CustomRAG
+from embeddings import CachedEncoder
+from evaluation import evaluate_collection
+from extraction import extract_documents
+from hnsw import hnsw_configuration
+
+# Conservative per-call limit for Chroma add()
+_ADD_BATCH_SIZE = 5000
+
+ChunkSet = Tuple[List[str], List[Dict], List[str]]
+
+
+def chunk_corpus(
+    documents: Dict[str, List[Dict]],
+    chunk_size: int,
+    overlap: int
+) -> ChunkSet:
+    """
+    Chunk every extracted document with one (chunk_size, overlap) setting.
+
+    Args:
+        documents: Mapping of file path to extracted segments
+        chunk_size: Characters per chunk
+        overlap: Overlap between chunks
+
+    Returns:
+        Tuple of (chunk texts, chunk metadatas, chunk IDs)
+    """
+    texts, metadatas, ids = [], [], []
+    for file_path, segments in documents.items():
+        file_name = Path(file_path).name
+        file_hash = hashlib.md5(str(file_path).encode()).hexdigest()[:8]
+        chunk_id = 0
+        for segment in segments:
+            for chunk in CustomRAG.chunk_text(segment["text"], chunk_size, overlap):
+                texts.append(chunk)
+                metadatas.append({
+                    "source_file": file_name,
+                    "file_path": str(file_path),
+                    **segment.get("metadata", {}),
+                    "chunk_id": chunk_id,
+                })
+                ids.append(f"{file_hash}_{chunk_id}")
+                chunk_id += 1
+    return texts, metadatas, ids
+
+
+def pareto_front(latency: np.ndarray, quality: np.ndarray) -> np.ndarray:
+    """
+    Mark configurations not dominated on (lower latency, higher quality).
+
+    Args:
+        latency: Latency per configuration
+        quality: Quality score per configuration
+
+    Returns:
+        Boolean mask of Pareto-optimal configurations
+    """
+    latency = np.asarray(latency, dtype=np.float64)[:, None]
+    quality = np.asarray(quality, dtype=np.float64)[:, None]
+    # dominated[i, j]: configuration j is at least as good as i on both and better on one
+    dominated = (
+        (latency.T <= latency) & (quality.T >= quality) &
+        ((latency.T < latency) | (quality.T > quality))
+    )
+    return ~dominated.any(axis=1)
+
+
+class ParameterSweep:
+    """Grid sweep of CustomRAG indexing and retrieval parameters with shared work"""
+
+    def __init__(
+        self,
+        file_paths: Sequence[Path],
+        query_set: Sequence[Dict],
+        output_dir: Path,
+        chunk_sizes: Sequence[int] = (256, 512, 1024),
+        overlaps: Sequence[int] = (0, 50),
+        top_ks: Sequence[int] = (3, 5, 10),
+        embedding_models: Sequence[str] = ("all-MiniLM-L6-v2",),
+        quality_metric: str = "ndcg",
+        relevance_key: str = "source_file",
+        cache_dir: Optional[Path] = None
+    ):
+        """
+        Initialize the sweep.
+
+        Args:
+            file_paths: Documents to index
+            query_set: Labelled queries with "query_id", "query" and "relevant"
+            output_dir: Directory where results are written
+            chunk_sizes: chunk_size values to try
+            overlaps: overlap values to try
+            top_ks: top_k values to try
+            embedding_models: SentenceTransformer model names to try
+            quality_metric: Metric family ranked on the Pareto front
+                (recall, precision, ndcg or mrr), evaluated at each top_k
+            relevance_key: Metadata field that query labels refer to
+            cache_dir: Directory for extraction and embedding caches
+        """
+        self.file_paths = [Path(p) for p in file_paths]
+        self.query_set = list(query_set)
+        self.output_dir = Path(output_dir)
+        self.chunk_sizes = list(chunk_sizes)
+        self.overlaps = list(overlaps)
+        self.top_ks = sorted(top_ks)
+        self.embedding_models = list(embedding_models)
+        self.quality_metric = quality_metric
+        self.relevance_key = relevance_key
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+
+        self.chroma_client = chromadb.Client(Settings(anonymized_telemetry=False))
+
+    def _chunk_all(self, documents: Dict[str, List[Dict]]) -> Dict[Tuple[int, int], ChunkSet]:
+        """Chunk the corpus once per (chunk_size, overlap)."""
+        # chunk_text() advances chunk_size // 5 - overlap // 5 words per chunk
+        settings = [
+            (chunk_size, overlap)
+            for chunk_size, overlap in itertools.product(self.chunk_sizes, self.overlaps)
+            if chunk_size // 5 - overlap // 5 > 0
+        ]
+        if not settings:
+            raise ValueError(
+                "No (chunk_size, overlap) combination where chunk_size // 5 exceeds overlap // 5"
+            )
+
+        # Serial: chunking is cheap next to embedding, and worker processes would
+        # copy the whole corpus
+        return {
+            (chunk_size, overlap): chunk_corpus(documents, chunk_size, overlap)
+            for chunk_size, overlap in settings
+        }
+
+    def _build_collection(
+        self,
+        name: str,
+        chunk_set: ChunkSet,
+        embeddings: np.ndarray
+    ):
+        """Create a fresh collection and bulk-add precomputed embeddings."""
+        try:
+            self.chroma_client.delete_collection(name=name)
+        except Exception:
+            pass
+        collection = self.chroma_client.create_collection(
+            name=name,
+            configuration=hnsw_configuration()
+        )
+
+        texts, metadatas, ids = chunk_set
+        for start in range(0, len(texts), _ADD_BATCH_SIZE):
+            end = start + _ADD_BATCH_SIZE
+            collection.add(
+                documents=texts[start:end],
+                embeddings=embeddings[start:end].tolist(),
+                metadatas=metadatas[start:end],
+                ids=ids[start:end]
+            )
+        return collection
+
+    def _evaluate(self, collection, encoder: CachedEncoder, top_k: int) -> Dict:
+        """Evaluate one collection at one top_k."""
+        evaluation = evaluate_collection(
+            collection,
+            encoder,
+            self.query_set,
+            top_k=top_k,
+            relevance_key=self.relevance_key,
+            ks=(1, 3, 5, 10, top_k),
+            batch_size=1
+        )
+        metrics = evaluation["metrics"]
+        quality_key = "mrr" if self.quality_metric == "mrr" else f"{self.quality_metric}@{top_k}"
+        return {
+            **evaluation["latency"],
+            "quality": metrics[quality_key],
+            f"recall@{top_k}": metrics[f"recall@{top_k}"],
+            f"ndcg@{top_k}": metrics[f"ndcg@{top_k}"],
+            "mrr": metrics["mrr"],
+        }
+
+    def run(self) -> pl.DataFrame:
+        """
+        Run the sweep and write results.
+
+        Writes sweep_results.parquet (every combination, with a "pareto"
+        column) and pareto_front.json to output_dir.
+
+        Returns:
+            DataFrame with one row per combination
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        # 1. Extract once (in spawned processes, so the running Chroma client is not forked)
+        extracted = extract_documents(
+            self.file_paths,
+            cache_dir=self.cache_dir / "extraction" if self.cache_dir else None
+        )
+        documents = {
+            path: result["segments"] for path, result in extracted.items() if "segments" in result
+        }
+
+        # 2. Chunk once per (chunk_size, overlap)
+        chunk_sets = self._chunk_all(documents)
+
+        rows = []
+        for model_name in self.embedding_models:
+            # 3. Embed each distinct chunk once per model
+            encoder = CachedEncoder(
+                model_name,
+                cache_dir=self.cache_dir / "embeddings" if self.cache_dir else None
+            )
+            # 4. One collection per (chunk_size, overlap, model)
+            collections = {}
+            for (chunk_size, overlap), chunk_set in chunk_sets.items():
+                if not chunk_set[0]:
+                    continue
+                embeddings = encoder.encode(chunk_set[0], show_progress_bar=False)
+                name = f"sweep_{hashlib.md5(f'{model_name}|{chunk_size}|{overlap}'.encode()).hexdigest()[:12]}"
+                collections[(chunk_size, overlap)] = (
+                    self._build_collection(name, chunk_set, embeddings),
+                    len(chunk_set[0])
+                )
+            encoder.save()
+
+            # Embed queries once up front so timed searches only hit the cache
+            encoder.encode([item["query"] for item in self.query_set], show_progress_bar=False)
+
+            # 5. Evaluate every top_k per collection, serially: concurrent
+            # evaluations would inflate the latencies ranked on the Pareto front
+            for (chunk_size, overlap), (collection, num_chunks) in collections.items():
+                for top_k in self.top_ks:
+                    result = self._evaluate(collection, encoder, top_k)
+                    rows.append({
+                        "embedding_model": model_name,
+                        "chunk_size": chunk_size,
+                        "overlap": overlap,
+                        "top_k": top_k,
+                        "num_chunks": num_chunks,
+                        "mean_query_ms": result["mean_query_ms"],
+                        "p95_query_ms": result["p95_query_ms"],
+                        "quality": result["quality"],
+                        "recall": result[f"recall@{top_k}"],
+                        "ndcg": result[f"ndcg@{top_k}"],
+                        "mrr": result["mrr"],
+                    })
+
+            for collection, _ in collections.values():
+                self.chroma_client.delete_collection(name=collection.name)
+
+        df = pl.DataFrame(rows)
+        if df.height:
+            df = df.with_columns(
+                pl.Series("pareto", pareto_front(df["p95_query_ms"].to_numpy(), df["quality"].to_numpy()))
+            ).sort(["pareto", "quality"], descending=True)
+
+        df.write_parquet(self.output_dir / "sweep_results.parquet")
+        with open(self.output_dir / "pareto_front.json", "w") as f:
+            json.dump(
+                {
+                    "quality_metric": self.quality_metric,
+                    "latency_metric": "p95_query_ms",
+                    "configurations": df.filter(pl.col("pareto")).to_dicts() if df.height else [],
+                },
+                f,
+                indent=2
+            )
+
+        return df
@@ -0,0 +1,277 @@
+"""Multi-tenant router sharing one encoder, Chroma client and Gemini client"""
+
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+import chromadb
+import httpx
+from chromadb.config import Settings
+from sentence_transformers import SentenceTransformer
+from google import genai
+from google.genai import types
+
+from custom_rag import CustomRAG
+from embeddings import QueryEmbeddingCache
+from gfs_client import GFSClient
+from rate_limit import RateLimiter
+
+
+def create_pooled_genai_client(
+    api_key: str,
+    max_connections: int = 64,
+    max_keepalive_connections: int = 32,
+    timeout: Optional[float] = None
+) -> genai.Client:
+    """
+    Create a genai.Client whose HTTP connection pool is sized for sharing.
+
+    Args:
+        api_key: Google API key
+        max_connections: Maximum concurrent HTTP connections
+        max_keepalive_connections: Idle connections kept open for reuse
+        timeout: Request timeout in seconds (SDK default if None)
+
+    Returns:
+        genai.Client backed by a pooled HTTP client
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections
+    )
+    return genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(
+            timeout=int(timeout * 1000) if timeout else None,
+            client_args={"limits": limits},
+            async_client_args={"limits": limits}
+        )
+    )
+
+
+class TenantRouter:
+    """Route tenants to their own collection or store over shared clients"""
+
+    def __init__(
+        self,
+        api_key: str,
+        embedding_model: str = "all-MiniLM-L6-v2",
+        llm_model: str = "gemini-2.5-flash",
+        persist_directory: Optional[Path] = None,
+        max_open_collections: int = 128,
+        max_connections: int = 64,
+        query_cache_size: int = 10_000,
+        rate_limiter: Optional[RateLimiter] = None,
+        chroma_memory_limit_bytes: int = 2 * 1024 ** 3
+    ):
+        """
+        Initialize the router and its shared clients.
+
+        Args:
+            api_key: Google API key
+            embedding_model: HuggingFace embedding model shared by all tenants
+            llm_model: Gemini model for generation and file search
+            persist_directory: Directory to persist ChromaDB
+            max_open_collections: Size of the LRU of open collection handles
+            max_connections: HTTP connection pool size of the Gemini client
+            query_cache_size: Query embeddings cached across all tenants
+            rate_limiter: Limiter shared by every tenant (a retrying,
+                unthrottled one if None)
+            chroma_memory_limit_bytes: Memory Chroma may use for loaded
+                collection indexes; least recently used ones are unloaded
+                beyond it
+        """
+        if max_open_collections < 1:
+            raise ValueError("max_open_collections must be at least 1")
+
+        self.embedding_model_name = embedding_model
+        self.llm_model = llm_model
+        self.max_open_collections = max_open_collections
+
+        # Shared, loaded once for every tenant
+        self.encoder = SentenceTransformer(embedding_model)
+        # Closing a handle does not unload its index; Chroma's LRU segment cache does
+        self.chroma_client = chromadb.Client(Settings(
+            persist_directory=str(persist_directory) if persist_directory else None,
+            anonymized_telemetry=False,
+            chroma_segment_cache_policy="LRU",
+            chroma_memory_limit_bytes=chroma_memory_limit_bytes
+        ))
+        self.llm_client = create_pooled_genai_client(
+            api_key,
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections // 2
+        )
+        self.query_cache = QueryEmbeddingCache(max_size=query_cache_size)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.gfs = GFSClient(
+            api_key=None,
+            model_id=llm_model,
+            client=self.llm_client,
+            rate_limiter=self.rate_limiter
+        )
+
+        self._collections: Dict[str, str] = {}
+        self._stores: Dict[str, str] = {}
+        self._open: "OrderedDict[str, CustomRAG]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def default_collection_name(tenant_id: str) -> str:
+        """
+        Derive a valid Chroma collection name for a tenant.
+
+        Args:
+            tenant_id: Tenant identifier
+
+        Returns:
+            Collection name (3-63 chars of [a-zA-Z0-9._-])
+        """
+        slug = re.sub(r"[^a-zA-Z0-9._-]", "_", tenant_id).strip("._-")
+        return f"tenant_{slug}"[:63].rstrip("._-")
+
+    def register_tenant(
+        self,
+        tenant_id: str,
+        collection_name: Optional[str] = None,
+        store_name: Optional[str] = None
+    ) -> None:
+        """
+        Map a tenant to its collection and/or GFS store.
+
+        Args:
+            tenant_id: Tenant identifier
+            collection_name: Chroma collection (defaults to a name derived from tenant_id)
+            store_name: GFS file search store name, if the tenant uses GFS
+        """
+        with self._lock:
+            new_collection = collection_name or self.default_collection_name(tenant_id)
+            if self._collections.get(tenant_id) != new_collection:
+                # Drop a stale handle pointing at the previous collection
+                stale = self._open.pop(tenant_id, None)
+                if stale is not None:
+                    stale.close()
+            self._collections[tenant_id] = new_collection
+            if store_name:
+                self._stores[tenant_id] = store_name
+
+    def get_rag(self, tenant_id: str) -> CustomRAG:
+        """
+        Get a CustomRAG bound to the tenant's collection.
+
+        Unregistered tenants get the default collection name. The least
+        recently used handle is closed once max_open_collections is exceeded.
+
+        Args:
+            tenant_id: Tenant identifier
+
+        Returns:
+            CustomRAG sharing the router's encoder and clients
+        """
+        with self._lock:
+            rag = self._open.get(tenant_id)
+            if rag is not None:
+                self._open.move_to_end(tenant_id)
+                self._stats["hits"] += 1
+                return rag
+
+            self._stats["misses"] += 1
+            collection_name = self._collections.setdefault(
+                tenant_id, self.default_collection_name(tenant_id)
+            )
+
+            rag = CustomRAG(
+                api_key=None,
+                embedding_model=self.embedding_model_name,
+                llm_model=self.llm_model,
+                encoder=self.encoder,
+                chroma_client=self.chroma_client,
+                llm_client=self.llm_client,
+                query_cache=self.query_cache,
+                rate_limiter=self.rate_limiter
+            )
+            rag.create_collection(collection_name)
+
+            self._open[tenant_id] = rag
+            while len(self._open) > self.max_open_collections:
+                _, evicted = self._open.popitem(last=False)
+                evicted.close()
+                self._stats["evictions"] += 1
+
+            return rag
+
+    def get_store_name(self, tenant_id: str) -> str:
+        """
+        Get the GFS store mapped to a tenant.
+
+        Args:
+            tenant_id: Tenant identifier
+
+        Returns:
+            File search store name
+
+        Raises:
+            KeyError: If the tenant has no store registered
+        """
+        with self._lock:
+            if tenant_id not in self._stores:
+                raise KeyError(f"No GFS store registered for tenant: {tenant_id}")
+            return self._stores[tenant_id]
+
+    def query(self, tenant_id: str, query: str, **kwargs) -> Dict:
+        """
+        Run a CustomRAG query scoped to the tenant's collection.
+
+        Args:
+            tenant_id: Tenant identifier
+            query: User query
+            **kwargs: Additional arguments for CustomRAG.query
+
+        Returns:
+            Dictionary with answer, context, and metrics
+        """
+        return self.get_rag(tenant_id).query(query, **kwargs)
+
+    def query_gfs(
+        self,
+        tenant_id: str,
+        query: str,
+        **kwargs
+    ) -> types.GenerateContentResponse:
+        """
+        Run a file search query against the tenant's GFS store.
+
+        Args:
+            tenant_id: Tenant identifier
+            query: User query
+            **kwargs: Additional arguments for GFSClient.query_with_file_search
+
+        Returns:
+            GenerateContentResponse with answer and grounding
+        """
+        return self.gfs.query_with_file_search(
+            query=query,
+            store_names=[self.get_store_name(tenant_id)],
+            **kwargs
+        )
+
+    def get_stats(self) -> Dict:
+        """
+        Get router statistics.
+
+        Returns:
+            Dictionary with tenant counts and handle cache stats
+        """
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                "registered_tenants": len(self._collections),
+                "gfs_tenants": len(self._stores),
+                "open_collections": len(self._open),
+                "max_open_collections": self.max_open_collections,
+                **self._stats,
+                "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+            }
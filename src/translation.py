@@ -0,0 +1,140 @@
+"""Single-pass phrase translation of notebook cells"""
+
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class Translator:
+    """Replaces every phrase of a translation table in one scan of the text"""
+
+    def __init__(self, table: Dict[str, str]):
+        """
+        Compile the table into a single alternation.
+
+        Phrases are tried longest first, so at each position the longest
+        matching phrase wins. Replaced text is never rescanned, so the result
+        does not depend on the table's order.
+
+        Args:
+            table: Source phrase -> translated phrase
+        """
+        self.table = {source: target for source, target in table.items() if source}
+        phrases = sorted(self.table, key=len, reverse=True)
+        self.pattern = re.compile("|".join(map(re.escape, phrases))) if phrases else None
+
+    def translate(self, text: str) -> Tuple[str, int]:
+        """
+        Translate a text.
+
+        Args:
+            text: Text to translate
+
+        Returns:
+            Translated text and number of replacements that changed it
+        """
+        if self.pattern is None:
+            return text, 0
+
+        replacements = 0
+
+        def replace(match: re.Match) -> str:
+            nonlocal replacements
+            target = self.table[match.group()]
+            replacements += target != match.group()
+            return target
+
+        return self.pattern.sub(replace, text), replacements
+
+
+def translate_notebook(
+    notebook_path: Path,
+    table: Dict[str, str],
+    cell_types: Iterable[str] = ("markdown",)
+) -> Dict:
+    """
+    Translate the cells of one notebook, writing it only if something changed.
+
+    Args:
+        notebook_path: Path to the .ipynb file
+        table: Source phrase -> translated phrase
+        cell_types: Cell types to translate
+
+    Returns:
+        Dictionary with path, cells_changed, replacements and written
+    """
+    path = Path(notebook_path)
+    raw = path.read_text(encoding="utf-8")
+    notebook = json.loads(raw)
+    translator = Translator(table)
+    cell_types = set(cell_types)
+
+    cells_changed = replacements = 0
+    for cell in notebook.get("cells", []):
+        if cell.get("cell_type") not in cell_types:
+            continue
+        source = cell.get("source", [])
+        text = source if isinstance(source, str) else "".join(source)
+        translated, count = translator.translate(text)
+        if count:
+            cell["source"] = translated if isinstance(source, str) else translated.splitlines(keepends=True)
+            cells_changed += 1
+            replacements += count
+
+    written = False
+    if replacements:
+        output = json.dumps(notebook, indent=1, ensure_ascii=False)
+        if raw.endswith("\n"):
+            output += "\n"
+        if output != raw:
+            tmp_path = path.with_suffix(".tmp")
+            tmp_path.write_text(output, encoding="utf-8")
+            tmp_path.replace(path)
+            written = True
+
+    return {
+        "path": str(path),
+        "cells_changed": cells_changed,
+        "replacements": replacements,
+        "written": written,
+    }
+
+
+def _translate_job(job: Tuple[str, Dict[str, str], Tuple[str, ...]]) -> Dict:
+    notebook_path, table, cell_types = job
+    return translate_notebook(notebook_path, table, cell_types)
+
+
+def translate_notebooks(
+    tables: Dict[str, Dict[str, str]],
+    cell_types: Iterable[str] = ("markdown",),
+    max_workers: Optional[int] = None
+) -> List[Dict]:
+    """
+    Translate several notebooks in parallel processes.
+
+    Args:
+        tables: Notebook path -> its translation table
+        cell_types: Cell types to translate
+        max_workers: Worker processes (None for CPU count)
+
+    Returns:
+        One translate_notebook() result per existing notebook, in input
+        order; missing notebooks get {"path", "missing": True}
+    """
+    cell_types = tuple(cell_types)
+    jobs = [
+        (str(path), table, cell_types)
+        for path, table in tables.items()
+        if Path(path).exists()
+    ]
+
+    results = {}
+    if jobs:
+        with ProcessPoolExecutor(max_workers=min(max_workers or len(jobs), len(jobs))) as executor:
+            for result in executor.map(_translate_job, jobs):
+                results[result["path"]] = result
+
+    return [results.get(str(path), {"path": str(path), "missing": True}) for path in tables]
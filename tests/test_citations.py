@@ -0,0 +1,95 @@
+"""Tests for CustomRAG citation markers and bulk citation stats"""
+
+import numpy as np
+import pytest
+
+from citations import CitationSet, Source, citation_frame, parse_markers
+
+ANSWER = "Debes ir martes y jueves [1]. La silla cuesta 200€.[2][3] Nada más [9]. Fin."
+CONTEXT = ["passage one", "passage two", "passage three"]
+METADATAS = [
+    {"source_file": "politica.md", "file_path": "/data/politica.md"},
+    None,
+    {"source_file": "compras.md"},
+]
+
+
+def test_markers_become_sentence_spans():
+    citations = parse_markers(ANSWER, CONTEXT, METADATAS)
+
+    # "[9]" is outside the context and ignored; "[2][3]" merge into one span
+    assert len(citations) == 2
+    assert citations.to_records(ANSWER) == [
+        {"text": "Debes ir martes y jueves [1]", "sources": [0], "confidence": None},
+        {"text": "La silla cuesta 200€.[2][3]", "sources": [1, 2], "confidence": None},
+    ]
+
+
+def test_spans_are_utf8_byte_offsets():
+    citations = parse_markers(ANSWER, CONTEXT, METADATAS)
+
+    encoded = ANSWER.encode("utf-8")
+    assert citations.answer_length == len(encoded)
+    assert encoded[citations.starts[1]:citations.ends[1]].decode("utf-8") == "La silla cuesta 200€.[2][3]"
+
+
+def test_sources_carry_chunk_metadata():
+    citations = parse_markers(ANSWER, CONTEXT, METADATAS)
+
+    assert [source.title for source in citations.sources] == ["politica.md", None, "compras.md"]
+    assert citations.sources[0].uri == "/data/politica.md"
+    assert citations.sources[2].text == "passage three"
+    assert len(citations.cited_sources()) == 3
+
+
+def test_comma_separated_markers():
+    answer = "Uno [1]. Dos [2, 1]."
+    citations = parse_markers(answer, ["x", "y"], [{}, {}])
+
+    assert [record["sources"] for record in citations.to_records(answer)] == [[0], [0, 1]]
+    assert [record["text"] for record in citations.to_records(answer)] == ["Uno [1]", "Dos [2, 1]"]
+
+
+def test_answers_without_markers():
+    assert not parse_markers("Sin citas.", ["x"], [{}]).has_citations
+    assert parse_markers(None, [], []).answer_length == 0
+
+
+def test_coverage_counts_covered_bytes():
+    citations = parse_markers(ANSWER, CONTEXT, METADATAS)
+
+    covered = (citations.ends - citations.starts).sum()
+    assert citations.coverage() == pytest.approx(covered / len(ANSWER.encode("utf-8")))
+
+
+def test_citation_frame_merges_overlapping_spans():
+    sources = [Source(title="a"), Source(title="b")]
+    overlapping = CitationSet.from_spans(sources, [(0, 5, [0], 0.9), (3, 8, [0, 1], 0.5)], 10)
+    # A span running past the answer is clipped to it
+    overflowing = CitationSet.from_spans([Source()], [(0, 20, [0], None)], 10)
+
+    frame = citation_frame([overlapping, CitationSet.empty(), overflowing])
+
+    assert frame["has_citations"].to_list() == [True, False, True]
+    assert frame["num_citations"].to_list() == [2, 0, 1]
+    assert frame["num_sources"].to_list() == [2, 0, 1]
+    assert frame["num_cited_sources"].to_list() == [2, 0, 1]
+    # [0, 5) and [3, 8) cover 8 of 10 bytes, not 10
+    np.testing.assert_allclose(frame["coverage"].to_numpy(), [0.8, 0.0, 1.0])
+    mean_confidence = frame["mean_confidence"].to_numpy()
+    assert mean_confidence[0] == pytest.approx(0.7)
+    assert np.isnan(mean_confidence[1]) and np.isnan(mean_confidence[2])
+
+
+def test_citation_frame_of_no_answers():
+    assert citation_frame([]).height == 0
+
+
+def test_sentence_after_adjacent_markers():
+    answer = "Alpha one [1][2] beta two [3]."
+    citations = parse_markers(answer, CONTEXT, METADATAS)
+
+    assert citations.to_records(answer) == [
+        {"text": "Alpha one [1][2]", "sources": [0, 1], "confidence": None},
+        {"text": "beta two [3]", "sources": [2], "confidence": None},
+    ]
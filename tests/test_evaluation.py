@@ -0,0 +1,102 @@
+"""Tests for the vectorized retrieval metrics"""
+
+from types import SimpleNamespace
+
+import chromadb
+import numpy as np
+import pytest
+from chromadb.config import Settings
+
+from evaluation import evaluate_retrieval, per_query_metrics, relevance_matrix, retrieval_metrics
+
+HITS = np.array([
+    [1, 0, 1, 0],
+    [0, 0, 0, 0],
+    [0, 1, 0, 0],
+], dtype=bool)
+N_RELEVANT = np.array([2, 1, 3])
+
+
+def test_recall_and_precision():
+    metrics = per_query_metrics(HITS, N_RELEVANT, ks=(1, 3))
+
+    np.testing.assert_allclose(metrics["recall@1"], [0.5, 0.0, 0.0])
+    np.testing.assert_allclose(metrics["precision@1"], [1.0, 0.0, 0.0])
+    np.testing.assert_allclose(metrics["recall@3"], [1.0, 0.0, 1 / 3])
+    np.testing.assert_allclose(metrics["precision@3"], [2 / 3, 0.0, 1 / 3])
+
+
+def test_ndcg():
+    metrics = per_query_metrics(HITS, N_RELEVANT, ks=(3,))
+
+    # Hits at ranks 1 and 3 against an ideal of ranks 1 and 2
+    expected_0 = (1 + 1 / np.log2(4)) / (1 + 1 / np.log2(3))
+    # One hit at rank 2 against an ideal of ranks 1, 2 and 3
+    expected_2 = (1 / np.log2(3)) / (1 + 1 / np.log2(3) + 1 / np.log2(4))
+    np.testing.assert_allclose(metrics["ndcg@3"], [expected_0, 0.0, expected_2])
+
+
+def test_mrr():
+    metrics = per_query_metrics(HITS, N_RELEVANT)
+    np.testing.assert_allclose(metrics["mrr"], [1.0, 0.0, 0.5])
+
+
+def test_cutoffs_are_clipped_to_matrix_width():
+    metrics = per_query_metrics(HITS, N_RELEVANT, ks=(3, 10))
+
+    assert "recall@4" in metrics and "recall@10" not in metrics
+    np.testing.assert_allclose(metrics["recall@4"], [1.0, 0.0, 1 / 3])
+    np.testing.assert_allclose(metrics["precision@4"], [0.5, 0.0, 0.25])
+
+
+def test_perfect_ranking_scores_one():
+    metrics = per_query_metrics(np.array([[1, 1, 0]]), np.array([2]), ks=(2, 3))
+
+    assert metrics["recall@2"][0] == pytest.approx(1.0)
+    assert metrics["ndcg@2"][0] == pytest.approx(1.0)
+    assert metrics["ndcg@3"][0] == pytest.approx(1.0)
+
+
+def test_relevance_matrix_counts_each_label_once():
+    hits, n_relevant = relevance_matrix(
+        [["a.md", "a.md", "b.md", "c.md"]], [{"a.md", "c.md"}], k=3
+    )
+
+    np.testing.assert_array_equal(hits, [[True, False, False]])
+    np.testing.assert_array_equal(n_relevant, [2])
+
+
+def test_retrieval_metrics_skips_unlabelled_queries():
+    metrics = retrieval_metrics(
+        [["a.md", "b.md"], ["a.md", "b.md"]],
+        [{"b.md"}, set()],
+        ks=(1, 2)
+    )
+
+    assert metrics["recall@1"] == pytest.approx(0.0)
+    assert metrics["recall@2"] == pytest.approx(1.0)
+    assert metrics["mrr"] == pytest.approx(0.5)
+
+
+def test_evaluate_retrieval_uses_given_query_embeddings():
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    collection = client.create_collection("evaluate-retrieval")
+    collection.add(
+        ids=["a", "b"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0]],
+        metadatas=[{"source_file": "a.md"}, {"source_file": "b.md"}]
+    )
+
+    def encode_queries(queries):
+        raise AssertionError("queries should not be encoded")
+
+    rag = SimpleNamespace(collection=collection, embedding_model=None, encode_queries=encode_queries)
+    evaluation = evaluate_retrieval(
+        rag,
+        [{"query_id": "q", "query": "b?", "relevant": ["b.md"]}],
+        top_k=1,
+        ks=(1,),
+        query_embeddings=np.array([[0.0, 1.0]])
+    )
+
+    assert evaluation["metrics"]["recall@1"] == pytest.approx(1.0)
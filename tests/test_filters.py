@@ -0,0 +1,90 @@
+"""Tests for the GFS metadata filter parser"""
+
+import pytest
+
+from filters import parse_metadata_filter, to_chroma_where
+
+
+def test_single_comparison():
+    assert to_chroma_where('department = "hr"') == {"department": {"$eq": "hr"}}
+
+
+@pytest.mark.parametrize(
+    "expression, expected",
+    [
+        ("year != 2023", {"year": {"$ne": 2023}}),
+        ("year < 2023", {"year": {"$lt": 2023}}),
+        ("year <= 2023", {"year": {"$lte": 2023}}),
+        ("year > 2023", {"year": {"$gt": 2023}}),
+        ("year >= 2023", {"year": {"$gte": 2023}}),
+        ("score = -1.5", {"score": {"$eq": -1.5}}),
+        ("active = TRUE", {"active": {"$eq": True}}),
+        ("name = 'it\\'s'", {"name": {"$eq": "it's"}}),
+    ],
+)
+def test_operators_and_values(expression, expected):
+    assert parse_metadata_filter(expression) == expected
+
+
+def test_and_binds_tighter_than_or():
+    assert to_chroma_where("a = 1 AND b = 2 OR c = 3") == {
+        "$or": [
+            {"$and": [{"a": {"$eq": 1}}, {"b": {"$eq": 2}}]},
+            {"c": {"$eq": 3}},
+        ]
+    }
+    assert to_chroma_where("a = 1 OR b = 2 AND c = 3") == {
+        "$or": [
+            {"a": {"$eq": 1}},
+            {"$and": [{"b": {"$eq": 2}}, {"c": {"$eq": 3}}]},
+        ]
+    }
+
+
+def test_parentheses_override_precedence():
+    assert to_chroma_where('department = "hr" AND (year >= 2024 OR source_file = "faq.md")') == {
+        "$and": [
+            {"department": {"$eq": "hr"}},
+            {"$or": [{"year": {"$gte": 2024}}, {"source_file": {"$eq": "faq.md"}}]},
+        ]
+    }
+    assert to_chroma_where("((a = 1))") == {"a": {"$eq": 1}}
+
+
+def test_logic_keywords_are_case_insensitive():
+    assert to_chroma_where("a = 1 and b = 2") == to_chroma_where("a = 1 AND b = 2")
+
+
+def test_chained_operators_are_flattened():
+    assert to_chroma_where("a = 1 OR b = 2 OR c = 3") == {
+        "$or": [{"a": {"$eq": 1}}, {"b": {"$eq": 2}}, {"c": {"$eq": 3}}]
+    }
+
+
+def test_dicts_and_none_pass_through():
+    where = {"year": {"$gte": 2024}}
+    assert to_chroma_where(where) is where
+    assert to_chroma_where(None) is None
+    assert to_chroma_where({}) is None
+
+
+@pytest.mark.parametrize(
+    "expression",
+    [
+        "",
+        "   ",
+        "a =",
+        "a = 1 AND",
+        "a = b",
+        "= 1",
+        "a ~ 1",
+        "(a = 1",
+        "a = 1)",
+        "(a = 1 (",
+        "a = 1 b = 2",
+        'a = "unterminated',
+    ],
+)
+def test_invalid_expressions_raise_value_error(expression):
+    with pytest.raises(ValueError):
+        to_chroma_where(expression)
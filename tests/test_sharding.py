@@ -0,0 +1,114 @@
+"""Tests for hash-partitioned collections"""
+
+import chromadb
+import numpy as np
+import pytest
+from chromadb.config import Settings
+
+from hnsw import hnsw_configuration
+from sharding import ShardedCollection, shard_of
+
+NUM_CHUNKS = 400
+DIM = 16
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(0)
+    return {
+        "ids": [f"chunk_{i}" for i in range(NUM_CHUNKS)],
+        "embeddings": rng.normal(size=(NUM_CHUNKS, DIM)).astype(np.float32),
+        "documents": [f"document {i}" for i in range(NUM_CHUNKS)],
+        "metadatas": [{"position": i, "even": i % 2 == 0} for i in range(NUM_CHUNKS)],
+        "queries": rng.normal(size=(5, DIM)).astype(np.float32),
+    }
+
+
+@pytest.fixture(scope="module")
+def single(corpus):
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    collection = client.create_collection("single-reference", configuration=hnsw_configuration())
+    collection.add(
+        ids=corpus["ids"],
+        embeddings=corpus["embeddings"],
+        documents=corpus["documents"],
+        metadatas=corpus["metadatas"]
+    )
+    return collection
+
+
+@pytest.fixture(scope="module")
+def sharded(corpus):
+    with ShardedCollection("sharded-test", num_shards=3) as collection:
+        collection.add(
+            ids=corpus["ids"],
+            embeddings=corpus["embeddings"],
+            documents=corpus["documents"],
+            metadatas=corpus["metadatas"]
+        )
+        yield collection
+
+
+def test_shard_of_is_stable_and_in_range():
+    assignments = [shard_of(f"chunk_{i}", 3) for i in range(100)]
+    assert assignments == [shard_of(f"chunk_{i}", 3) for i in range(100)]
+    assert set(assignments) == {0, 1, 2}
+
+
+def test_count_spans_all_shards(sharded):
+    assert sharded.count() == NUM_CHUNKS
+
+
+@pytest.mark.parametrize("where", [None, {"even": True}])
+def test_query_matches_single_collection(corpus, single, sharded, where):
+    include = ["documents", "metadatas", "distances"]
+    expected = single.query(
+        query_embeddings=corpus["queries"], n_results=10, where=where, include=include
+    )
+    result = sharded.query(
+        query_embeddings=corpus["queries"], n_results=10, where=where, include=include
+    )
+
+    assert result["ids"] == expected["ids"]
+    assert result["documents"] == expected["documents"]
+    assert result["metadatas"] == expected["metadatas"]
+    np.testing.assert_allclose(
+        np.asarray(result["distances"]), np.asarray(expected["distances"]), rtol=1e-5, atol=1e-6
+    )
+
+
+def test_full_scan_pages_cover_every_chunk_once(sharded):
+    seen = []
+    offset = 0
+    while True:
+        page = sharded.get(limit=150, offset=offset, include=[])
+        if not page["ids"]:
+            break
+        seen.extend(page["ids"])
+        offset += len(page["ids"])
+    assert sorted(seen) == sorted(f"chunk_{i}" for i in range(NUM_CHUNKS))
+
+
+def test_get_by_ids_applies_where_limit_and_offset(sharded):
+    ids = [f"chunk_{i}" for i in range(20)]
+
+    filtered = sharded.get(ids=ids, where={"even": True}, include=["metadatas"])
+    assert sorted(filtered["ids"]) == sorted(ids[::2])
+    assert all(metadata["even"] for metadata in filtered["metadatas"])
+
+    everything = sharded.get(ids=ids, include=[])
+    window = sharded.get(ids=ids, limit=5, offset=3, include=[])
+    assert window["ids"] == everything["ids"][3:8]
+
+
+def test_delete_by_ids_applies_where(corpus):
+    with ShardedCollection("sharded-delete", num_shards=2) as collection:
+        collection.add(
+            ids=corpus["ids"][:10],
+            embeddings=corpus["embeddings"][:10],
+            metadatas=corpus["metadatas"][:10]
+        )
+        collection.delete(ids=corpus["ids"][:6], where={"even": True})
+
+        remaining = sorted(collection.get(include=[])["ids"], key=lambda i: int(i.split("_")[1]))
+        assert remaining == ["chunk_1", "chunk_3", "chunk_5", "chunk_6", "chunk_7", "chunk_8", "chunk_9"]
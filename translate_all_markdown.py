@@ -1,6 +1,11 @@
-import json
+import sys
 from pathlib import Path
 
+# Add src to path
+sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
+
+from translation import translate_notebooks
+
 # Traducciones completas para TODOS los textos en inglés
 translations = {
     # Notebook 03
@@ -63,58 +68,26 @@ translations = {
     "## 5. Save Results": "## 5. Guardar Resultados",
 }
 
-def translate_notebook(notebook_path):
-    """Translate ALL markdown content in a notebook"""
-    path = Path(notebook_path)
-    if not path.exists():
-        print(f"❌ {notebook_path} not found")
-        return False
-    
-    print(f"\n📝 Processing {notebook_path}...")
-    
-    with open(path, 'r', encoding='utf-8') as f:
-        notebook = json.load(f)
-    
-    # Translate markdown cells
-    translated_count = 0
-    for i, cell in enumerate(notebook.get('cells', [])):
-        if cell.get('cell_type') == 'markdown':
-            source = cell.get('source', [])
-            translated_source = []
-            
-            for line in source:
-                translated_line = line
-                # Apply all translations
-                for eng, esp in translations.items():
-                    if eng in translated_line:
-                        translated_line = translated_line.replace(eng, esp)
-                        print(f"  ✓ Cell {i}: '{eng[:50]}...' → '{esp[:50]}...'")
-                translated_source.append(translated_line)
-            
-            cell['source'] = translated_source
-            translated_count += 1
-    
-    # Save translated notebook
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(notebook, f, indent=1, ensure_ascii=False)
-    
-    print(f"✅ Translated {translated_count} markdown cells in {notebook_path}")
-    return True
-
-# Translate all notebooks
-print("=" * 70)
-print("TRADUCIENDO TODOS LOS CUADERNOS A ESPAÑOL FORMAL CHILENO")
-print("=" * 70)
+if __name__ == "__main__":
+    # Translate all notebooks
+    print("=" * 70)
+    print("TRADUCIENDO TODOS LOS CUADERNOS A ESPAÑOL FORMAL CHILENO")
+    print("=" * 70)
 
-notebooks = [
-    "notebooks/03_gfs_experiments.ipynb",
-    "notebooks/04_custom_rag_baseline.ipynb",
-    "notebooks/05_comparison_analysis.ipynb"
-]
+    notebooks = [
+        "notebooks/03_gfs_experiments.ipynb",
+        "notebooks/04_custom_rag_baseline.ipynb",
+        "notebooks/05_comparison_analysis.ipynb"
+    ]
 
-for nb in notebooks:
-    translate_notebook(nb)
+    for result in translate_notebooks({nb: translations for nb in notebooks}):
+        if result.get("missing"):
+            print(f"❌ {result['path']} not found")
+        elif result["written"]:
+            print(f"✅ {result['replacements']} traducciones en {result['cells_changed']} celdas de {result['path']}")
+        else:
+            print(f"= {result['path']} sin cambios")
 
-print("\n" + "=" * 70)
-print("✨ TODOS LOS CUADERNOS HAN SIDO TRADUCIDOS EXITOSAMENTE")
-print("=" * 70)
+    print("\n" + "=" * 70)
+    print("✨ TODOS LOS CUADERNOS HAN SIDO TRADUCIDOS EXITOSAMENTE")
+    print("=" * 70)
@@ -1,6 +1,11 @@
-import json
+import sys
 from pathlib import Path
 
+# Add src to path
+sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
+
+from translation import translate_notebooks
+
 # TODAS las traducciones faltantes para notebook 04
 nb04_complete_translations = {
     # Cell 0
@@ -27,57 +32,29 @@ nb04_complete_translations = {
 def translate_notebook_04():
     """Translate ALL remaining English text in notebook 04"""
     notebook_path = "notebooks/04_custom_rag_baseline.ipynb"
-    path = Path(notebook_path)
-    
-    if not path.exists():
-        print(f"❌ {notebook_path} not found")
-        return False
-    
     print(f"\n📝 Traduciendo {notebook_path}...")
     print("=" * 70)
-    
-    with open(path, 'r', encoding='utf-8') as f:
-        notebook = json.load(f)
-    
-    # Translate markdown cells
-    changes_made = 0
-    for i, cell in enumerate(notebook.get('cells', [])):
-        if cell.get('cell_type') == 'markdown':
-            source = cell.get('source', [])
-            translated_source = []
-            
-            for line in source:
-                original_line = line
-                translated_line = line
-                
-                # Apply all translations
-                for eng, esp in nb04_complete_translations.items():
-                    if eng in translated_line:
-                        translated_line = translated_line.replace(eng, esp)
-                        if original_line != translated_line:
-                            print(f"  ✓ Cell {i}: '{eng[:60]}...'")
-                            print(f"           → '{esp[:60]}...'")
-                            changes_made += 1
-                
-                translated_source.append(translated_line)
-            
-            cell['source'] = translated_source
-    
-    # Save translated notebook
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(notebook, f, indent=1, ensure_ascii=False)
-    
+
+    result = translate_notebooks({notebook_path: nb04_complete_translations}, max_workers=1)[0]
+    if result.get("missing"):
+        print(f"❌ {notebook_path} not found")
+        return False
+
     print("=" * 70)
-    print(f"✅ {changes_made} traducciones aplicadas en {notebook_path}")
+    if result["written"]:
+        print(f"✅ {result['replacements']} traducciones aplicadas en {notebook_path}")
+    else:
+        print(f"= {notebook_path} ya estaba traducido")
     return True
 
-# Execute translation
-print("\n" + "=" * 70)
-print("TRADUCIENDO NOTEBOOK 04 - TODAS LAS FRASES RESTANTES")
-print("=" * 70)
+if __name__ == "__main__":
+    # Execute translation
+    print("\n" + "=" * 70)
+    print("TRADUCIENDO NOTEBOOK 04 - TODAS LAS FRASES RESTANTES")
+    print("=" * 70)
 
-translate_notebook_04()
+    translate_notebook_04()
 
-print("\n" + "=" * 70)
-print("✨ NOTEBOOK 04 COMPLETAMENTE TRADUCIDO")
-print("=" * 70)
+    print("\n" + "=" * 70)
+    print("✨ NOTEBOOK 04 COMPLETAMENTE TRADUCIDO")
+    print("=" * 70)
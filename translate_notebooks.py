@@ -1,6 +1,11 @@
-import json
+import sys
 from pathlib import Path
 
+# Add src to path
+sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
+
+from translation import translate_notebooks
+
 # Translation mappings for common terms
 translations = {
     "# GFS Experiments: RAG Performance Analysis": "# Experimentos GFS: Análisis de Rendimiento RAG",
@@ -34,41 +39,19 @@ translations = {
     "- Compare metrics in `05_comparison_analysis.ipynb`": "- Comparar métricas en `05_comparison_analysis.ipynb`",
 }
 
-notebooks = [
-    "notebooks/03_gfs_experiments.ipynb",
-    "notebooks/04_custom_rag_baseline.ipynb",
-    "notebooks/05_comparison_analysis.ipynb"
-]
+if __name__ == "__main__":
+    notebooks = [
+        "notebooks/03_gfs_experiments.ipynb",
+        "notebooks/04_custom_rag_baseline.ipynb",
+        "notebooks/05_comparison_analysis.ipynb"
+    ]
 
-for notebook_path in notebooks:
-    path = Path(notebook_path)
-    if not path.exists():
-        print(f"Skipping {notebook_path} - not found")
-        continue
-    
-    print(f"Processing {notebook_path}...")
-    
-    with open(path, 'r', encoding='utf-8') as f:
-        notebook = json.load(f)
-    
-    # Translate markdown cells
-    for cell in notebook.get('cells', []):
-        if cell.get('cell_type') == 'markdown':
-            source = cell.get('source', [])
-            translated_source = []
-            
-            for line in source:
-                translated_line = line
-                for eng, esp in translations.items():
-                    translated_line = translated_line.replace(eng, esp)
-                translated_source.append(translated_line)
-            
-            cell['source'] = translated_source
-    
-    # Save translated notebook
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(notebook, f, indent=1, ensure_ascii=False)
-    
-    print(f"✓ Translated {notebook_path}")
+    for result in translate_notebooks({path: translations for path in notebooks}):
+        if result.get("missing"):
+            print(f"Skipping {result['path']} - not found")
+        elif result["written"]:
+            print(f"✓ Translated {result['path']} ({result['replacements']} replacements)")
+        else:
+            print(f"= {result['path']} unchanged")
 
-print("\nAll notebooks translated!")
+    print("\nAll notebooks translated!")
@@ -1,6 +1,11 @@
-import json
+import sys
 from pathlib import Path
 
+# Add src to path
+sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
+
+from translation import translate_notebooks
+
 # Comprehensive translations for notebook 03
 nb03_translations = {
     "# GFS Experiments: RAG Performance Analysis": "# Experimentos GFS: Análisis de Rendimiento RAG",
@@ -83,49 +88,23 @@ nb05_translations = {
     "**Recommendations**:": "**Recomendaciones**:",
 }
 
-def translate_notebook(notebook_path, translations):
-    """Translate markdown cells in a notebook"""
-    path = Path(notebook_path)
-    if not path.exists():
-        print(f"❌ {notebook_path} not found")
-        return False
-    
-    print(f"📝 Processing {notebook_path}...")
-    
-    with open(path, 'r', encoding='utf-8') as f:
-        notebook = json.load(f)
-    
-    # Translate markdown cells
-    translated_count = 0
-    for cell in notebook.get('cells', []):
-        if cell.get('cell_type') == 'markdown':
-            source = cell.get('source', [])
-            translated_source = []
-            
-            for line in source:
-                translated_line = line
-                # Apply all translations
-                for eng, esp in translations.items():
-                    translated_line = translated_line.replace(eng, esp)
-                translated_source.append(translated_line)
-            
-            cell['source'] = translated_source
-            translated_count += 1
-    
-    # Save translated notebook
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(notebook, f, indent=1, ensure_ascii=False)
-    
-    print(f"✅ Translated {translated_count} markdown cells in {notebook_path}")
-    return True
-
-# Translate all notebooks
-print("=" * 60)
-print("Translating notebooks to Formal Chilean Spanish")
-print("=" * 60)
+if __name__ == "__main__":
+    # Translate all notebooks
+    print("=" * 60)
+    print("Translating notebooks to Formal Chilean Spanish")
+    print("=" * 60)
 
-translate_notebook("notebooks/03_gfs_experiments.ipynb", nb03_translations)
-translate_notebook("notebooks/04_custom_rag_baseline.ipynb", nb04_translations)
-translate_notebook("notebooks/05_comparison_analysis.ipynb", nb05_translations)
+    results = translate_notebooks({
+        "notebooks/03_gfs_experiments.ipynb": nb03_translations,
+        "notebooks/04_custom_rag_baseline.ipynb": nb04_translations,
+        "notebooks/05_comparison_analysis.ipynb": nb05_translations,
+    })
+    for result in results:
+        if result.get("missing"):
+            print(f"❌ {result['path']} not found")
+        elif result["written"]:
+            print(f"✅ Translated {result['cells_changed']} markdown cells in {result['path']}")
+        else:
+            print(f"= {result['path']} unchanged")
 
-print("\n✨ All notebooks translated successfully!")
+    print("\n✨ All notebooks translated successfully!")
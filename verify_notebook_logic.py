@@ -9,6 +9,7 @@ project_root = Path.cwd()
 sys.path.insert(0, str(project_root / "src"))
 
 from gfs_client import GFSClient
+from store_registry import StoreRegistry
 from data_loader import scan_documents, check_gfs_compatibility
 from utils import load_api_key
 
@@ -26,25 +27,13 @@ def main():
     print("Initializing GFSClient...")
     gfs = GFSClient(api_key=api_key, model_id="gemini-2.5-flash")
     
-    # List stores
-    print("Listing stores...")
-    stores = gfs.list_stores()
-    print(f"Found {len(stores)} stores.")
-    
+    # Resolve store through the cached registry
+    registry = StoreRegistry(gfs, project_root / "models" / "gfs_stores" / "registry.json")
     store_display_name = "RAG Verification Store"
-    store = None
-    
-    # Check if verification store exists
-    for s in stores:
-        if s.display_name == store_display_name:
-            store = s
-            print(f"Found existing verification store: {store.name}")
-            break
-            
-    if not store:
-        print("Creating new store...")
-        store = gfs.create_file_search_store(display_name=store_display_name)
-        print(f"Created store: {store.name}")
+
+    print("Resolving verification store...")
+    store_name = registry.get_or_create(store_display_name)
+    print(f"Using store: {store_name}")
         
     # Scan documents
     data_dir = project_root / "data" / "raw"
@@ -62,8 +51,11 @@ def main():
         print(f"Uploading {file_path.name}...")
         
         try:
-            gfs.upload_to_store(store.name, file_path, wait_for_completion=True)
-            print("Upload successful.")
+            operation = registry.upload_if_new(store_name, file_path, wait_for_completion=True)
+            if operation is None:
+                print("File already in store, skipping upload.")
+            else:
+                print("Upload successful.")
         except Exception as e:
             print(f"Upload failed: {e}")
             # Continue to query test if possible (maybe file was already there)
@@ -74,7 +66,7 @@ def main():
     try:
         response = gfs.query_with_file_search(
             query=query,
-            store_names=[store.name]
+            store_names=[store_name]
         )
         print("Response received:")
         print(response.text[:200] + "...")
@@ -90,7 +82,7 @@ def main():
 
     # Cleanup (optional, maybe keep it for inspection)
     # print("Deleting store...")
-    # gfs.delete_store(store.name)
+    # gfs.delete_store(store_name)
 
 if __name__ == "__main__":
     main()